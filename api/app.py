@@ -16,11 +16,27 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    # JSON encoding (orjson when available)
+    from api.utils.json_provider import init_json_provider
+    init_json_provider(app)
+
     # Initialize extensions
     db.init_app(app)
     jwt.init_app(app)
     migrate.init_app(app, db)
 
+    # Per-request SQL instrumentation
+    from api.utils.sql_profiler import init_sql_profiler
+    init_sql_profiler(app)
+
+    # Prometheus metrics (/metrics)
+    from api.utils.metrics import init_metrics
+    init_metrics(app, db)
+
+    # Live change events (SSE)
+    from api.utils.events import init_events
+    init_events(app, db)
+
     # CORS configuration
     CORS(app, resources={
         r"/api/*": {
@@ -36,23 +52,35 @@ def create_app(config_class=Config):
     os.makedirs(f"{data_path}/productos/imagenes", exist_ok=True)
     os.makedirs(f"{data_path}/manifiestos/en_proceso", exist_ok=True)
     os.makedirs(f"{data_path}/manifiestos/finalizados", exist_ok=True)
+    os.makedirs(f"{data_path}/manifiestos/archivo", exist_ok=True)
     os.makedirs(f"{data_path}/reportes/movimientos", exist_ok=True)
     os.makedirs(f"{data_path}/reportes/entregas", exist_ok=True)
     os.makedirs(f"{data_path}/respaldos/db", exist_ok=True)
     os.makedirs(f"{data_path}/respaldos/logs", exist_ok=True)
 
     # Register blueprints
-    from api.routes import auth, productos, movimientos, manifiestos, clientes, categorias, reportes, usuarios, files
+    from api.routes import auth, productos, movimientos, transformaciones, manifiestos, clientes, categorias, reportes, usuarios, files, sync, eventos
 
     app.register_blueprint(auth.bp, url_prefix='/api/auth')
     app.register_blueprint(productos.bp, url_prefix='/api/productos')
     app.register_blueprint(movimientos.bp, url_prefix='/api/movimientos')
+    app.register_blueprint(transformaciones.bp, url_prefix='/api/transformaciones')
     app.register_blueprint(manifiestos.bp, url_prefix='/api/manifiestos')
     app.register_blueprint(clientes.bp, url_prefix='/api/clientes')
     app.register_blueprint(categorias.bp, url_prefix='/api/categorias')
     app.register_blueprint(reportes.bp, url_prefix='/api/reportes')
     app.register_blueprint(usuarios.bp, url_prefix='/api/usuarios')
     app.register_blueprint(files.bp, url_prefix='/api/files')
+    app.register_blueprint(sync.bp, url_prefix='/api/sync')
+    app.register_blueprint(eventos.bp, url_prefix='/api/eventos')
+
+    # Maintenance commands (flask --app api.app <command>)
+    from api.cli import init_cli
+    init_cli(app)
+
+    # Periodic maintenance in the background (storage cleanup)
+    from api.utils.maintenance import init_maintenance
+    init_maintenance(app)
 
     # Health check endpoint
     @app.route('/health')
@@ -0,0 +1,315 @@
+"""
+Maintenance commands, run with the Flask CLI:
+
+    flask --app api.app limpiar-idempotencia
+    flask --app api.app snapshot-stock
+    flask --app api.app reconciliar-stock --corregir
+    flask --app api.app crear-particiones
+    flask --app api.app archivar-particiones
+    flask --app api.app archivar-manifiestos
+    flask --app api.app resumir-movimientos
+    flask --app api.app limpiar-almacenamiento
+    flask --app api.app respaldar-db
+    flask --app api.app restaurar-db
+    flask --app api.app publicar-eventos --continuo
+"""
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from api.app import db
+
+
+@click.command('limpiar-idempotencia')
+@with_appcontext
+def limpiar_idempotencia():
+    """Delete expired Idempotency-Key records (schedule it, e.g. hourly with cron)"""
+    from api.models import ClaveIdempotencia
+
+    deleted = ClaveIdempotencia.query.filter(
+        ClaveIdempotencia.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    click.echo(f"{deleted} claves de idempotencia expiradas eliminadas")
+
+
+@click.command('snapshot-stock')
+@click.option('--fecha', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Último día a guardar (por defecto, ayer en UTC)')
+@with_appcontext
+def snapshot_stock(fecha):
+    """
+    Save the closing stock of each day since the last snapshot, up to
+    yesterday (schedule it daily a few minutes after midnight UTC, so that
+    the day's last transactions have committed).
+    """
+    from api.models import StockSnapshot
+    from api.services.ledger_service import take_snapshot, HistoryArchivedError
+
+    hasta = fecha.date() if fecha else datetime.utcnow().date() - timedelta(days=1)
+    ultimo = db.session.query(db.func.max(StockSnapshot.fecha)).scalar()
+
+    # Without snapshots, the first one replays the full ledger once
+    dia = ultimo + timedelta(days=1) if ultimo and ultimo < hasta else hasta
+
+    while dia <= hasta:
+        try:
+            count = take_snapshot(dia)
+        except HistoryArchivedError as e:
+            raise click.ClickException(str(e))
+        db.session.commit()
+        click.echo(f"{dia.isoformat()}: {count} productos")
+        dia += timedelta(days=1)
+
+
+@click.command('reconciliar-stock')
+@click.option('--workers', type=int, default=None, help='Procesos en paralelo (por defecto, uno por CPU)')
+@click.option('--chunk-size', type=int, default=5000, show_default=True, help='Productos por bloque')
+@click.option('--corregir', is_flag=True, help='Ajustar productos.cantidad al valor del historial')
+@click.option('--batch-size', type=int, default=500, show_default=True, help='Productos por UPDATE al corregir')
+@with_appcontext
+def reconciliar_stock(workers, chunk_size, corregir, batch_size):
+    """
+    Compare each product's stock with the one its movements and
+    transformations add up to. Exits with status 1 when drift is found and
+    not corrected, so a nightly cron can alert on it.
+    """
+    from api.services.reconciliation_service import find_drift, fix_drift
+
+    database_uri = db.engine.url.render_as_string(hide_password=False)
+    drifts = find_drift(database_uri, workers=workers, chunk_size=chunk_size)
+
+    for producto_id, cantidad, esperado in drifts:
+        click.echo(
+            f"Producto {producto_id}: cantidad {float(cantidad):.2f}, "
+            f"historial {esperado:.2f} (diferencia {float(cantidad) - esperado:+.2f})"
+        )
+
+    click.echo(f"{len(drifts)} productos con diferencias")
+    if not drifts:
+        return
+
+    if not corregir:
+        raise SystemExit(1)
+
+    with db.engine.connect() as connection:
+        fixed = fix_drift(connection, drifts, batch_size=batch_size)
+    click.echo(f"{fixed} productos corregidos")
+    if fixed < len(drifts):
+        click.echo(f"{len(drifts) - fixed} cambiaron durante la revisión; se verificarán en la próxima ejecución")
+
+
+@click.command('crear-particiones')
+@click.option('--meses', type=int, default=None,
+              help='Meses a crear por adelantado (por defecto, PARTITION_MONTHS_AHEAD)')
+@with_appcontext
+def crear_particiones(meses):
+    """Create the monthly partitions of movimientos and transformaciones (schedule it monthly)"""
+    from flask import current_app
+    from api.services.partition_service import create_partitions, PartitionError
+
+    if meses is None:
+        meses = current_app.config['PARTITION_MONTHS_AHEAD']
+
+    try:
+        created = create_partitions(meses)
+    except PartitionError as e:
+        raise click.ClickException(str(e))
+
+    for nombre in created:
+        click.echo(f"Partición creada: {nombre}")
+    click.echo(f"{len(created)} particiones creadas")
+
+
+@click.command('archivar-particiones')
+@click.option('--meses', type=int, default=None,
+              help='Antigüedad en meses a partir de la cual se archiva (por defecto, PARTITION_ARCHIVE_AFTER_MONTHS)')
+@with_appcontext
+def archivar_particiones(meses):
+    """Move the ledger partitions older than the horizon to the archivo schema"""
+    from flask import current_app
+    from api.services.partition_service import archive_partitions, PartitionError
+
+    if meses is None:
+        meses = current_app.config['PARTITION_ARCHIVE_AFTER_MONTHS']
+
+    try:
+        archived = archive_partitions(meses)
+    except PartitionError as e:
+        raise click.ClickException(str(e))
+
+    for nombre in archived:
+        click.echo(f"Partición archivada: {nombre}")
+    click.echo(f"{len(archived)} particiones archivadas")
+
+
+@click.command('archivar-manifiestos')
+@click.option('--dias', type=click.IntRange(min=1), default=None,
+              help='Días desde la entrega (por defecto, MANIFEST_ARCHIVE_AFTER_DAYS)')
+@click.option('--batch-size', type=int, default=500, show_default=True, help='Manifiestos por transacción')
+@with_appcontext
+def archivar_manifiestos(dias, batch_size):
+    """Move old delivered manifests to the archive tables and their files to monthly bundles"""
+    from flask import current_app
+    from api.services.archive_service import archive_manifests
+
+    if dias is None:
+        dias = current_app.config['MANIFEST_ARCHIVE_AFTER_DAYS']
+
+    archived = archive_manifests(dias, batch_size=batch_size)
+    click.echo(f"{archived} manifiestos archivados")
+
+
+@click.command('resumir-movimientos')
+@click.option('--desde', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Primer día a (re)calcular (por defecto, el siguiente al último resumido)')
+@with_appcontext
+def resumir_movimientos(desde):
+    """Roll up the movimientos of closed days into movimientos_resumen_diario (schedule it daily)"""
+    from api.models import Movimiento
+    from api.services.analytics_service import rolled_up_until, roll_up
+    from api.services.ledger_service import HistoryArchivedError
+
+    # Today is still open
+    hasta = datetime.utcnow().date() - timedelta(days=1)
+
+    last = rolled_up_until()
+    if desde is not None:
+        desde = desde.date()
+        # Aggregates assume the rolled-up days are contiguous
+        if last is not None and desde > last + timedelta(days=1):
+            raise click.ClickException(
+                f"--desde dejaría sin resumir los días {last + timedelta(days=1)} a "
+                f"{desde - timedelta(days=1)}; use --desde {last + timedelta(days=1)} o anterior"
+            )
+    else:
+        if last is not None:
+            desde = last + timedelta(days=1)
+        else:
+            first = db.session.query(db.func.min(Movimiento.created_at)).scalar()
+            if first is None:
+                click.echo("No hay movimientos que resumir")
+                return
+            desde = first.date()
+
+    if desde > hasta:
+        click.echo("El resumen ya está al día")
+        return
+
+    # One day at a time keeps each transaction short during a backfill
+    total = 0
+    fecha = desde
+    while fecha <= hasta:
+        try:
+            total += roll_up(fecha, fecha)
+        except HistoryArchivedError as e:
+            raise click.ClickException(str(e))
+        db.session.commit()
+        fecha += timedelta(days=1)
+
+    click.echo(f"Resumen de {desde} a {hasta}: {total} filas")
+
+
+@click.command('limpiar-almacenamiento')
+@click.option('--dry-run', is_flag=True, help='Mostrar lo que se eliminaría sin borrar nada')
+@with_appcontext
+def limpiar_almacenamiento(dry_run):
+    """Enforce the age and size limits of reports and backups, and delete stale manifest files"""
+    from api.services.storage_service import clean_storage
+
+    summary = clean_storage(dry_run=dry_run)
+    verbo = "se eliminarían" if dry_run else "eliminados"
+    for area, usage in summary.items():
+        click.echo(
+            f"{area}: {usage['eliminados']} archivos {verbo} ({usage['liberados'] / 1048576:.1f} MB), "
+            f"quedan {usage['archivos']} ({usage['bytes'] / 1048576:.1f} MB)"
+        )
+
+
+@click.command('respaldar-db')
+@click.option('--completo', is_flag=True, help='Respaldo completo (inicia una nueva cadena)')
+@with_appcontext
+def respaldar_db(completo):
+    """Write an incremental (or full) backup of the database into respaldos/db (schedule it hourly)"""
+    from flask import current_app
+    from api.services.backup_service import create_backup, prune_backups
+
+    config = current_app.config
+    manifest = create_backup(
+        full=completo,
+        chunk_rows=config['BACKUP_CHUNK_ROWS'],
+        settle_seconds=config['BACKUP_SETTLE_SECONDS'],
+        max_increments=config['BACKUP_MAX_INCREMENTS']
+    )
+    filas = sum(chunk['filas'] for chunk in manifest['archivos'])
+    click.echo(f"Respaldo {manifest['tipo']} {manifest['nombre']}: {filas} filas en {len(manifest['archivos'])} archivos")
+
+    for nombre in prune_backups(config['BACKUP_KEEP_CHAINS']):
+        click.echo(f"Respaldo eliminado: {nombre}")
+
+
+@click.command('restaurar-db')
+@click.option('--hasta', default=None, help='Último respaldo a aplicar (por defecto, el más reciente)')
+@click.option('--forzar', is_flag=True, help='Restaurar aunque la base de datos ya tenga datos')
+@with_appcontext
+def restaurar_db(hasta, forzar):
+    """Restore a full backup and its increments into a database with the schema loaded"""
+    from api.services.backup_service import restore, BackupError
+
+    try:
+        restored = restore(hasta=hasta, force=forzar)
+    except BackupError as e:
+        raise click.ClickException(str(e))
+
+    for nombre, filas in restored:
+        click.echo(f"{nombre}: {filas} filas")
+    click.echo("Restauración completada. Reconstruya los resúmenes con `flask resumir-movimientos --desde AAAA-MM-DD`")
+
+
+@click.command('publicar-eventos')
+@click.option('--continuo', is_flag=True, help='Seguir publicando los eventos nuevos (proceso de larga duración)')
+@click.option('--destino', default=None, help='Destino: file, memory, webhook o modulo:Clase (por defecto, OUTBOX_SINK)')
+@click.option('--batch-size', type=int, default=None, help='Eventos por lote (por defecto, OUTBOX_BATCH_SIZE)')
+@with_appcontext
+def publicar_eventos(continuo, destino, batch_size):
+    """
+    Publish the pending outbox events to the sink. Once, or with
+    --continuo as a relay process (run a single one per sink).
+    """
+    from flask import current_app
+    from api.services.outbox_service import make_sink, relay_pending, run_relay, purge_published
+
+    config = current_app.config
+    try:
+        sink = make_sink(destino)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    batch_size = batch_size or config['OUTBOX_BATCH_SIZE']
+
+    if continuo:
+        click.echo(f"Publicando eventos en {type(sink).__name__} (Ctrl+C para detener)")
+        run_relay(
+            sink,
+            batch_size=batch_size,
+            poll_seconds=config['OUTBOX_POLL_SECONDS'],
+            retention_hours=config['OUTBOX_RETENTION_HOURS']
+        )
+        return
+
+    click.echo(f"{relay_pending(sink, batch_size)} eventos publicados")
+    if config['OUTBOX_RETENTION_HOURS']:
+        click.echo(f"{purge_published(config['OUTBOX_RETENTION_HOURS'])} eventos publicados antiguos eliminados")
+
+
+def init_cli(app):
+    """Register the maintenance commands"""
+    app.cli.add_command(limpiar_idempotencia)
+    app.cli.add_command(snapshot_stock)
+    app.cli.add_command(reconciliar_stock)
+    app.cli.add_command(crear_particiones)
+    app.cli.add_command(archivar_particiones)
+    app.cli.add_command(archivar_manifiestos)
+    app.cli.add_command(resumir_movimientos)
+    app.cli.add_command(limpiar_almacenamiento)
+    app.cli.add_command(respaldar_db)
+    app.cli.add_command(restaurar_db)
+    app.cli.add_command(publicar_eventos)
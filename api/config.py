@@ -22,8 +22,95 @@ class Config:
     # CORS
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
 
+    # JSON provider: 'orjson' (falls back to 'default' if not installed) or 'default'
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'orjson')
+
     # File Storage
     DATA_PATH = os.getenv('DATA_PATH', '/data')
 
     # Upload configuration
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max file size
+
+    # SQL instrumentation (Server-Timing header and N+1 detection)
+    SQL_INSTRUMENTATION = os.getenv('SQL_INSTRUMENTATION', 'true').lower() == 'true'
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv('SQL_N_PLUS_ONE_THRESHOLD', 10))
+    SQL_N_PLUS_ONE_MODE = os.getenv('SQL_N_PLUS_ONE_MODE')  # off, warn, raise (default: raise in tests, warn in debug)
+
+    # Delta sync (/api/sync): rows per entity per response, and how far back
+    # each new token reaches so that rows committed late are not skipped
+    SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', 500))
+    SYNC_OVERLAP_SECONDS = int(os.getenv('SYNC_OVERLAP_SECONDS', 5))
+
+    # Idempotency-Key header on write endpoints: hours a stored response is replayed
+    IDEMPOTENCY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_TTL_HOURS', 24))
+
+    # Live change events (/api/eventos/stream)
+    EVENTS_BACKEND = os.getenv('EVENTS_BACKEND', 'auto')  # auto, postgres (LISTEN/NOTIFY), memory
+    EVENTS_HEARTBEAT_SECONDS = int(os.getenv('EVENTS_HEARTBEAT_SECONDS', 15))
+    EVENTS_STREAM_MAX_SECONDS = int(os.getenv('EVENTS_STREAM_MAX_SECONDS', 300))
+    EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 100))
+    # Open streams per worker process. Each one holds a gunicorn thread for up
+    # to EVENTS_STREAM_MAX_SECONDS, so keep it well below GUNICORN_THREADS
+    # (default 8) to leave threads for the rest of the API; further streams
+    # get 503 with Retry-After
+    EVENTS_MAX_STREAMS = int(os.getenv('EVENTS_MAX_STREAMS', 4))
+
+    # Monthly partitions of movimientos/transformaciones: months created ahead
+    # by `flask crear-particiones`, and age (in months) after which
+    # `flask archivar-particiones` moves a partition to the archive schema
+    PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', 3))
+    PARTITION_ARCHIVE_AFTER_MONTHS = int(os.getenv('PARTITION_ARCHIVE_AFTER_MONTHS', 24))
+
+    # Delivered manifests older than this (days) are moved to the archive
+    # tables by `flask archivar-manifiestos`, their PDFs to monthly bundles
+    MANIFEST_ARCHIVE_AFTER_DAYS = int(os.getenv('MANIFEST_ARCHIVE_AFTER_DAYS', 180))
+
+    # Columnar report exports (?formato=parquet|arrow): rows per record batch
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 50000))
+
+    # Consolidated workbook (/api/reportes/consolidado): rows fetched per batch
+    # by each sheet's query; memory holds about two batches per sheet
+    CONSOLIDATED_BATCH_SIZE = int(os.getenv('CONSOLIDATED_BATCH_SIZE', 5000))
+
+    # Storage manager (`flask limpiar-almacenamiento`, and in the background
+    # every STORAGE_CLEANUP_INTERVAL_MINUTES; 0 disables the background run).
+    # Each area has an age limit (days) and a size quota (MB) enforced by
+    # evicting the least recently used files; 0 disables a limit. BACKUPS_*
+    # apply to respaldos/logs: database backups are pruned by chain (below)
+    STORAGE_CLEANUP_INTERVAL_MINUTES = int(os.getenv('STORAGE_CLEANUP_INTERVAL_MINUTES', 60))
+    REPORTS_RETENTION_DAYS = int(os.getenv('REPORTS_RETENTION_DAYS', 30))
+    REPORTS_MAX_MB = int(os.getenv('REPORTS_MAX_MB', 2048))
+    BACKUPS_RETENTION_DAYS = int(os.getenv('BACKUPS_RETENTION_DAYS', 90))
+    BACKUPS_MAX_MB = int(os.getenv('BACKUPS_MAX_MB', 20480))
+    # In-process manifest PDFs/QRs of cancelled, delivered or missing
+    # manifests are deleted after this many hours
+    STALE_PDF_HOURS = int(os.getenv('STALE_PDF_HOURS', 24))
+
+    # Incremental database backups into DATA_PATH/respaldos/db (`flask
+    # respaldar-db`, and in the background every BACKUP_INTERVAL_MINUTES; 0
+    # leaves it to cron). A chain is a full backup and its increments; a new
+    # chain starts after BACKUP_MAX_INCREMENTS increments, and only the newest
+    # BACKUP_KEEP_CHAINS chains are kept. Rows written less than
+    # BACKUP_SETTLE_SECONDS ago are exported again by the next backup
+    BACKUP_INTERVAL_MINUTES = int(os.getenv('BACKUP_INTERVAL_MINUTES', 0))
+    BACKUP_MAX_INCREMENTS = int(os.getenv('BACKUP_MAX_INCREMENTS', 168))
+    BACKUP_KEEP_CHAINS = int(os.getenv('BACKUP_KEEP_CHAINS', 2))
+    BACKUP_CHUNK_ROWS = int(os.getenv('BACKUP_CHUNK_ROWS', 50000))
+    BACKUP_SETTLE_SECONDS = int(os.getenv('BACKUP_SETTLE_SECONDS', 60))
+
+    # Transactional outbox of inventory events (`flask publicar-eventos`).
+    # OUTBOX_SINK: file (DATA_PATH/outbox/eventos_YYYYMMDD.jsonl), memory,
+    # webhook (POST to OUTBOX_WEBHOOK_URL) or 'module:Class'. The continuous
+    # relay wakes on NOTIFY with PostgreSQL and polls every
+    # OUTBOX_POLL_SECONDS otherwise; published events are deleted after
+    # OUTBOX_RETENTION_HOURS (0 keeps them)
+    OUTBOX_SINK = os.getenv('OUTBOX_SINK', 'file')
+    OUTBOX_WEBHOOK_URL = os.getenv('OUTBOX_WEBHOOK_URL', '')
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 500))
+    OUTBOX_POLL_SECONDS = float(os.getenv('OUTBOX_POLL_SECONDS', 1))
+    OUTBOX_RETENTION_HOURS = int(os.getenv('OUTBOX_RETENTION_HOURS', 168))
+    # Age limit (days) of the sink's files under DATA_PATH/outbox
+    OUTBOX_FILES_RETENTION_DAYS = int(os.getenv('OUTBOX_FILES_RETENTION_DAYS', 14))
+
+    # Prometheus metrics (set PROMETHEUS_MULTIPROC_DIR when running several workers)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
@@ -11,6 +11,15 @@ from api.models.transformacion import Transformacion
 from api.models.manifiesto import Manifiesto
 from api.models.detalle_manifiesto import DetalleManifiesto
 from api.models.etiqueta import Etiqueta
+from api.models.tabla_version import TablaVersion
+from api.models.eliminacion import Eliminacion
+from api.models.clave_idempotencia import ClaveIdempotencia
+from api.models.reserva_stock import ReservaStock
+from api.models.stock_snapshot import StockSnapshot
+from api.models.particion_archivada import ParticionArchivada
+from api.models.manifiesto_archivado import ManifiestoArchivado, DetalleManifiestoArchivado
+from api.models.movimiento_resumen import MovimientoResumenDiario
+from api.models.evento_outbox import EventoOutbox
 
 __all__ = [
     'db',
@@ -23,5 +32,15 @@ __all__ = [
     'Transformacion',
     'Manifiesto',
     'DetalleManifiesto',
-    'Etiqueta'
+    'Etiqueta',
+    'TablaVersion',
+    'Eliminacion',
+    'ClaveIdempotencia',
+    'ReservaStock',
+    'StockSnapshot',
+    'ParticionArchivada',
+    'ManifiestoArchivado',
+    'DetalleManifiestoArchivado',
+    'MovimientoResumenDiario',
+    'EventoOutbox'
 ]
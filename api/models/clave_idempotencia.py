@@ -0,0 +1,20 @@
+from api.app import db
+from datetime import datetime
+
+class ClaveIdempotencia(db.Model):
+    """Stored outcome of a write request sent with an Idempotency-Key header"""
+    __tablename__ = 'claves_idempotencia'
+    __table_args__ = (db.UniqueConstraint('usuario_id', 'clave'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    clave = db.Column(db.String(255), nullable=False)
+    huella = db.Column(db.String(64), nullable=False)  # SHA-256 of method, path and body
+    estado = db.Column(db.String(20), nullable=False, default='en_proceso')  # en_proceso, completado
+    status_code = db.Column(db.Integer)
+    respuesta = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<ClaveIdempotencia {self.usuario_id}:{self.clave}>'
@@ -0,0 +1,14 @@
+from api.app import db
+from datetime import datetime
+
+class Eliminacion(db.Model):
+    """Tombstone of a deleted row, served by the delta-sync API"""
+    __tablename__ = 'eliminaciones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tabla = db.Column(db.String(50), nullable=False)  # productos, clientes, manifiestos
+    registro_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Eliminacion {self.tabla}:{self.registro_id}>'
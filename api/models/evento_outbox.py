@@ -0,0 +1,19 @@
+from api.app import db
+from datetime import datetime
+
+class EventoOutbox(db.Model):
+    """Inventory change event, written in the transaction of the change and published by the relay"""
+    __tablename__ = 'eventos_outbox'
+
+    # BIGSERIAL on PostgreSQL; SQLite only autoincrements INTEGER keys
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    tipo = db.Column(db.String(20), nullable=False)  # stock, reserva, manifiesto
+    clave = db.Column(db.String(50), nullable=False)  # producto:<id>, manifiesto:<id>
+    datos = db.Column(db.Text, nullable=False)  # Compact JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    publicado_at = db.Column(db.DateTime)
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    ultimo_error = db.Column(db.Text)
+
+    def __repr__(self):
+        return f'<EventoOutbox {self.id} {self.tipo} {self.clave}>'
@@ -0,0 +1,64 @@
+from api.app import db
+from api.models.manifiesto import Manifiesto
+from api.models.detalle_manifiesto import DetalleManifiesto
+
+class ManifiestoArchivado(db.Model):
+    """Delivered manifest moved out of manifiestos by `flask archivar-manifiestos`"""
+    __tablename__ = 'manifiestos_archivo'
+
+    # Same columns (and ids) as manifiestos
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    numero_manifiesto = db.Column(db.String(50), unique=True, nullable=False)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
+    estado = db.Column(db.String(20), nullable=False)
+    fecha_creacion = db.Column(db.DateTime)
+    fecha_entrega = db.Column(db.DateTime)
+    codigo_qr = db.Column(db.String(255), unique=True)
+    firma_operador = db.Column(db.Text)
+    firma_cliente = db.Column(db.Text)
+    pdf_path_proceso = db.Column(db.String(500))
+    pdf_path_final = db.Column(db.String(500))
+    usuario_creador_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    usuario_entrega_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+
+    # Compressed monthly bundle holding the manifest's PDFs
+    paquete = db.Column(db.String(500))
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    # Relationships
+    cliente = db.relationship('Cliente')
+    creator = db.relationship('Usuario', foreign_keys=[usuario_creador_id])
+    delivery_user = db.relationship('Usuario', foreign_keys=[usuario_entrega_id])
+    detalles = db.relationship('DetalleManifiestoArchivado', lazy='dynamic')
+
+    def to_dict(self, include_relations=True):
+        # Same shape as a live manifest
+        result = Manifiesto.to_dict(self, include_relations)
+        result['archivado'] = True
+        result['archived_at'] = self.archived_at.isoformat() if self.archived_at else None
+        return result
+
+    def __repr__(self):
+        return f'<ManifiestoArchivado {self.numero_manifiesto}>'
+
+
+class DetalleManifiestoArchivado(db.Model):
+    """Line of an archived manifest"""
+    __tablename__ = 'detalle_manifiesto_archivo'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    manifiesto_id = db.Column(db.Integer, db.ForeignKey('manifiestos_archivo.id'), nullable=False)
+    producto_id = db.Column(db.Integer, db.ForeignKey('productos.id'), nullable=False)
+    cantidad = db.Column(db.Numeric(10, 2), nullable=False)
+    precio_unitario = db.Column(db.Numeric(10, 2))
+    subtotal = db.Column(db.Numeric(10, 2))
+
+    producto = db.relationship('Producto')
+
+    def to_dict(self, include_relations=True):
+        return DetalleManifiesto.to_dict(self, include_relations)
+
+    def __repr__(self):
+        return f'<DetalleManifiestoArchivado Manifiesto:{self.manifiesto_id} Producto:{self.producto_id}>'
@@ -0,0 +1,15 @@
+from api.app import db
+
+class MovimientoResumenDiario(db.Model):
+    """Daily totals of movimientos per product, type and user (closed days only)"""
+    __tablename__ = 'movimientos_resumen_diario'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    producto_id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(20), primary_key=True)
+    usuario_id = db.Column(db.Integer, primary_key=True)
+    cantidad = db.Column(db.Numeric(14, 2), nullable=False)
+    movimientos = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<MovimientoResumenDiario {self.fecha} Producto:{self.producto_id} {self.tipo}>'
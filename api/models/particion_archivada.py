@@ -0,0 +1,16 @@
+from api.app import db
+from datetime import datetime
+
+class ParticionArchivada(db.Model):
+    """Monthly ledger partition detached to the archive schema"""
+    __tablename__ = 'particiones_archivadas'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tabla = db.Column(db.String(50), nullable=False)  # movimientos, transformaciones
+    nombre = db.Column(db.String(100), nullable=False)
+    desde = db.Column(db.Date, nullable=False)
+    hasta = db.Column(db.Date, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ParticionArchivada {self.nombre}>'
@@ -0,0 +1,28 @@
+from api.app import db
+from datetime import datetime
+
+class ReservaStock(db.Model):
+    """Hold on a product's stock placed by an in-process manifest"""
+    __tablename__ = 'reservas_stock'
+
+    id = db.Column(db.Integer, primary_key=True)
+    producto_id = db.Column(db.Integer, db.ForeignKey('productos.id'), nullable=False)
+    manifiesto_id = db.Column(db.Integer, db.ForeignKey('manifiestos.id'), nullable=False)
+    cantidad = db.Column(db.Numeric(10, 2), nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default='activa')  # activa, confirmada, liberada
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'producto_id': self.producto_id,
+            'manifiesto_id': self.manifiesto_id,
+            'cantidad': float(self.cantidad) if self.cantidad else 0.0,
+            'estado': self.estado,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<ReservaStock Producto:{self.producto_id} Manifiesto:{self.manifiesto_id} {self.estado}>'
@@ -0,0 +1,19 @@
+from api.app import db
+from datetime import datetime
+
+class StockSnapshot(db.Model):
+    """Closing stock of a product on a day (UTC), checkpoint for point-in-time queries"""
+    __tablename__ = 'stock_snapshots'
+
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.Date, nullable=False)
+    producto_id = db.Column(db.Integer, db.ForeignKey('productos.id', ondelete='CASCADE'), nullable=False)
+    cantidad = db.Column(db.Numeric(10, 2), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('fecha', 'producto_id', name='uq_stock_snapshots_fecha_producto'),
+    )
+
+    def __repr__(self):
+        return f'<StockSnapshot {self.fecha} Producto:{self.producto_id} {self.cantidad}>'
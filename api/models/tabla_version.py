@@ -0,0 +1,10 @@
+from api.app import db
+
+class TablaVersion(db.Model):
+    __tablename__ = 'tabla_versiones'
+
+    tabla = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<TablaVersion {self.tabla}:{self.version}>'
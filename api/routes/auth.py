@@ -3,6 +3,7 @@ from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identi
 from api.models import db, Usuario, Role
 from api.utils.validators import validate_required_fields, validate_email
 from api.utils.decorators import role_required
+from api.utils.http_cache import cached_reference, conditional_json
 
 bp = Blueprint('auth', __name__)
 
@@ -119,5 +120,5 @@ def get_roles():
     Get all roles.
     Only accessible by Administrador.
     """
-    roles = Role.query.all()
-    return jsonify([role.to_dict() for role in roles]), 200
+    roles, etag = cached_reference('roles', lambda: [role.to_dict() for role in Role.query.all()])
+    return conditional_json(etag, roles)
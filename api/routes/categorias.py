@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required
 from api.models import db, Categoria
 from api.utils.decorators import role_required
 from api.utils.validators import validate_required_fields
+from api.utils.http_cache import cached_reference, bump_version, conditional_json
 
 bp = Blueprint('categorias', __name__)
 
@@ -10,18 +11,23 @@ bp = Blueprint('categorias', __name__)
 @jwt_required()
 def list_categories():
     """List all categories (accessible by all authenticated users)"""
+    categorias, etag = cached_reference('categorias', _load_categories)
+    return conditional_json(etag, categorias)
+
+def _load_categories():
     categorias = Categoria.query.order_by(Categoria.nombre.asc()).all()
-    return jsonify([categoria.to_dict() for categoria in categorias]), 200
+    return [categoria.to_dict() for categoria in categorias]
 
 @bp.route('/<int:id>', methods=['GET'])
 @jwt_required()
 def get_category(id):
     """Get single category"""
-    categoria = Categoria.query.get(id)
+    categorias, etag = cached_reference('categorias', _load_categories)
+    categoria = next((categoria for categoria in categorias if categoria['id'] == id), None)
     if not categoria:
         return jsonify({"error": "Categoría no encontrada"}), 404
 
-    return jsonify(categoria.to_dict()), 200
+    return conditional_json(f"{etag}-{id}", categoria)
 
 @bp.route('', methods=['POST'])
 @jwt_required()
@@ -46,6 +52,7 @@ def create_category():
             descripcion=data.get('descripcion')
         )
         db.session.add(categoria)
+        bump_version('categorias')
         db.session.commit()
 
         return jsonify({
@@ -79,6 +86,7 @@ def update_category(id):
         if 'descripcion' in data:
             categoria.descripcion = data['descripcion']
 
+        bump_version('categorias')
         db.session.commit()
 
         return jsonify({
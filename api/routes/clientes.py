@@ -3,6 +3,8 @@ from flask_jwt_extended import jwt_required
 from api.models import db, Cliente
 from api.utils.decorators import role_required
 from api.utils.validators import validate_required_fields, validate_email
+from api.utils.http_cache import etag_from, conditional_json
+from api.utils.row_serializers import CLIENTE_ROW, project_from_request, paginate_rows, count_of
 
 bp = Blueprint('clientes', __name__)
 
@@ -17,22 +19,30 @@ def list_clients():
 
     search = request.args.get('search')
 
-    query = Cliente.query
+    # Sparse fieldsets: ?fields=nombre,ruc_dni
+    try:
+        serializer = project_from_request(CLIENTE_ROW)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conditions = []
 
     if search:
-        query = query.filter(Cliente.nombre.ilike(f'%{search}%'))
+        conditions.append(Cliente.nombre.ilike(f'%{search}%'))
 
-    query = query.order_by(Cliente.nombre.asc())
+    stmt = serializer.select(Cliente).where(*conditions).order_by(Cliente.nombre.asc())
 
-    paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    items, total, pages = paginate_rows(
+        count_of(Cliente, conditions), stmt, page, per_page, serializer
+    )
 
     return jsonify({
-        "items": [cliente.to_dict() for cliente in paginated.items],
+        "items": items,
         "pagination": {
             "page": page,
             "per_page": per_page,
-            "total": paginated.total,
-            "pages": paginated.pages
+            "total": total,
+            "pages": pages
         }
     }), 200
 
@@ -41,11 +51,12 @@ def list_clients():
 @role_required(1, 2, 4)  # Administrador, Oficina, Delivery
 def get_client(id):
     """Get single client details"""
-    cliente = Cliente.query.get(id)
-    if not cliente:
+    updated_at = db.session.query(Cliente.updated_at).filter(Cliente.id == id).first()
+    if not updated_at:
         return jsonify({"error": "Cliente no encontrado"}), 404
 
-    return jsonify(cliente.to_dict()), 200
+    etag = etag_from('cliente', id, *updated_at)
+    return conditional_json(etag, lambda: Cliente.query.get(id).to_dict())
 
 @bp.route('', methods=['POST'])
 @jwt_required()
@@ -0,0 +1,98 @@
+import json
+import os
+import queue
+import threading
+import time
+from flask import Blueprint, Response, current_app, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from api.app import db
+from api.utils.events import bus, ensure_listener
+
+bp = Blueprint('eventos', __name__)
+
+# Event types each role may receive, matching the endpoints that expose the data
+ROLE_EVENTS = {
+    1: {'stock', 'manifiesto'},  # Administrador
+    2: {'stock', 'manifiesto'},  # Oficina
+    3: {'stock', 'manifiesto'},  # Operario
+    4: {'manifiesto'},           # Delivery
+}
+
+
+_slots = None
+_slots_pid = None
+_slots_lock = threading.Lock()
+
+
+def _stream_slots():
+    """This worker's semaphore of open streams (created after gunicorn forks)"""
+    global _slots, _slots_pid
+
+    with _slots_lock:
+        if _slots is None or _slots_pid != os.getpid():
+            _slots = threading.BoundedSemaphore(current_app.config['EVENTS_MAX_STREAMS'])
+            _slots_pid = os.getpid()
+        return _slots
+
+
+# EventSource cannot send an Authorization header, so the token may also be
+# passed as ?jwt=<token>
+@bp.route('/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream():
+    """
+    Server-sent events stream of stock and manifest state changes.
+
+    Events:
+        stock: {"producto_id", "cantidad"}
+        manifiesto: {"manifiesto_id", "estado", "estado_anterior"}
+        resync: events may have been lost, reload the data
+
+    Each open stream holds a worker thread; past EVENTS_MAX_STREAMS per
+    worker, the request is answered 503 with Retry-After.
+    """
+    current_user = get_jwt_identity()
+    allowed = ROLE_EVENTS.get(current_user.get('role_id') if current_user else None)
+    if not allowed:
+        return jsonify({"error": "Sin permisos"}), 403
+
+    heartbeat = current_app.config['EVENTS_HEARTBEAT_SECONDS']
+    max_seconds = current_app.config['EVENTS_STREAM_MAX_SECONDS']
+
+    slots = _stream_slots()
+    if not slots.acquire(blocking=False):
+        response = jsonify({"error": "Demasiadas conexiones de eventos abiertas; reintente más tarde"})
+        response.headers['Retry-After'] = str(heartbeat)
+        return response, 503
+
+    ensure_listener(current_app._get_current_object(), db)
+    subscriber = bus.subscribe()
+
+    def generate():
+        # Streams are closed after max_seconds; EventSource reconnects after `retry` ms
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield 'retry: 3000\n\n'
+            while time.monotonic() < deadline:
+                try:
+                    evento = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+
+                tipo = evento.get('tipo')
+                if tipo != 'resync' and tipo not in allowed:
+                    continue
+                data = {key: value for key, value in evento.items() if key != 'tipo'}
+                yield f"event: {tipo}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+        finally:
+            bus.unsubscribe(subscriber)
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Disable response buffering in nginx
+    })
+    # Called by the server when the response ends, even if the client left
+    # before the generator started
+    response.call_on_close(slots.release)
+    return response
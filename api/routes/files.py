@@ -1,5 +1,7 @@
 from flask import Blueprint, send_file, jsonify
 from flask_jwt_extended import jwt_required
+from api.services.archive_service import read_archived_document
+import io
 import os
 
 bp = Blueprint('files', __name__)
@@ -28,6 +30,10 @@ def serve_manifest_pdf(filename):
         file_path = f"/data/manifiestos/en_proceso/{filename}"
 
     if not os.path.exists(file_path):
-        return jsonify({"error": "Archivo no encontrado"}), 404
+        # Archived manifests keep their PDFs in the monthly bundles
+        document = read_archived_document(filename)
+        if document is None:
+            return jsonify({"error": "Archivo no encontrado"}), 404
+        return send_file(io.BytesIO(document), mimetype='application/pdf', download_name=filename)
 
     return send_file(file_path, mimetype='application/pdf')
@@ -1,10 +1,19 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from api.models import db, Manifiesto, DetalleManifiesto, Cliente, Producto, Movimiento
+from api.models import db, Manifiesto, DetalleManifiesto, Cliente, ReservaStock, ManifiestoArchivado
 from api.utils.decorators import role_required
+from api.utils.idempotency import idempotent
 from api.utils.validators import validate_required_fields, validate_positive_number
 from api.services.qr_service import generate_codigo_qr, generate_manifest_qr
 from api.services.pdf_service import generate_manifest_pdf
+from api.services import outbox_service
+from api.services.stock_service import (
+    lock_products, lock_manifest, reserve_stock, confirm_reservations, change_manifest_status,
+    InsufficientStockError, InvalidTransitionError
+)
+from api.utils.row_serializers import (
+    MANIFIESTO_ROW, project_from_request, attach_detalles, attach_detalle_counts, paginate_rows, count_of
+)
 from datetime import datetime
 
 bp = Blueprint('manifiestos', __name__)
@@ -24,36 +33,49 @@ def list_manifests():
     fecha_desde = request.args.get('fecha_desde')
     fecha_hasta = request.args.get('fecha_hasta')
 
-    query = Manifiesto.query
+    conditions = []
 
     if estado:
         # Support multiple estados separated by comma
         if ',' in estado:
             estados = estado.split(',')
-            query = query.filter(Manifiesto.estado.in_(estados))
+            conditions.append(Manifiesto.estado.in_(estados))
         else:
-            query = query.filter_by(estado=estado)
+            conditions.append(Manifiesto.estado == estado)
 
     if cliente_id:
-        query = query.filter_by(cliente_id=cliente_id)
+        conditions.append(Manifiesto.cliente_id == cliente_id)
 
     if fecha_desde:
-        query = query.filter(Manifiesto.fecha_creacion >= fecha_desde)
+        conditions.append(Manifiesto.fecha_creacion >= fecha_desde)
 
     if fecha_hasta:
-        query = query.filter(Manifiesto.fecha_creacion <= fecha_hasta)
+        conditions.append(Manifiesto.fecha_creacion <= fecha_hasta)
 
-    query = query.order_by(Manifiesto.fecha_creacion.desc())
+    # Sparse fieldsets: ?fields=numero_manifiesto,estado,total_productos&expand=cliente
+    try:
+        serializer = project_from_request(MANIFIESTO_ROW)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Read-only path: projected columns only, detalles batch-loaded per page
+    stmt = serializer.select(Manifiesto).where(*conditions).order_by(Manifiesto.fecha_creacion.desc())
 
-    paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    items, total, pages = paginate_rows(
+        count_of(Manifiesto, conditions), stmt, page, per_page, serializer
+    )
+    if serializer.wants('detalles'):
+        attach_detalles(items, count=serializer.wants('total_productos'))
+    elif serializer.wants('total_productos'):
+        attach_detalle_counts(items)
 
     return jsonify({
-        "items": [m.to_dict(include_relations=True) for m in paginated.items],
+        "items": items,
         "pagination": {
             "page": page,
             "per_page": per_page,
-            "total": paginated.total,
-            "pages": paginated.pages
+            "total": total,
+            "pages": pages
         }
     }), 200
 
@@ -65,7 +87,8 @@ def get_manifest(id):
     """
     codigo_qr = request.args.get('codigo_qr')
 
-    manifiesto = Manifiesto.query.get(id)
+    # Delivered manifests may have been moved to the archive tables
+    manifiesto = Manifiesto.query.get(id) or ManifiestoArchivado.query.get(id)
     if not manifiesto:
         return jsonify({"error": "Manifiesto no encontrado"}), 404
 
@@ -86,10 +109,14 @@ def get_manifest(id):
 @bp.route('', methods=['POST'])
 @jwt_required()
 @role_required(1, 2)  # Administrador, Oficina
+@idempotent
 def create_manifest():
     """
     Create delivery manifest with PDF generation.
     Implements full specification from planning.md
+
+    Stock is held (reservas_stock), not decremented: it leaves the warehouse
+    when the manifest goes to en_transito or entregado.
     """
     data = request.get_json()
     current_user = get_jwt_identity()
@@ -119,34 +146,24 @@ def create_manifest():
     if not cliente:
         return jsonify({"error": "Cliente no encontrado"}), 404
 
-    # Verify all products exist and have sufficient stock
-    stock_errors = []
-    productos_data = []
-
-    for detalle in data['detalles']:
-        producto = Producto.query.get(detalle['producto_id'])
-        if not producto:
-            return jsonify({"error": f"Producto {detalle['producto_id']} no encontrado"}), 404
-
-        cantidad = float(detalle['cantidad'])
-        if float(producto.cantidad) < cantidad:
-            stock_errors.append(
-                f"{producto.nombre} (disponible: {producto.cantidad}, requerido: {cantidad})"
-            )
-
-        productos_data.append({
-            'producto': producto,
-            'cantidad': cantidad,
-            'precio_unitario': detalle.get('precio_unitario'),
-            'subtotal': detalle.get('subtotal')
-        })
-
-    if stock_errors:
-        return jsonify({
-            "error": f"Stock insuficiente para: {', '.join(stock_errors)}"
-        }), 409
-
     try:
+        # SHORT TRANSACTION: lock the products, check available stock and place holds
+        productos = lock_products(detalle['producto_id'] for detalle in data['detalles'])
+
+        productos_data = []
+        for detalle in data['detalles']:
+            producto = productos.get(detalle['producto_id'])
+            if not producto:
+                db.session.rollback()
+                return jsonify({"error": f"Producto {detalle['producto_id']} no encontrado"}), 404
+
+            productos_data.append({
+                'producto': producto,
+                'cantidad': float(detalle['cantidad']),
+                'precio_unitario': detalle.get('precio_unitario'),
+                'subtotal': detalle.get('subtotal')
+            })
+
         # Generate numero_manifiesto (MAN-YYYYMMDD-XXXX)
         today = datetime.now().strftime('%Y%m%d')
         count_today = Manifiesto.query.filter(
@@ -158,7 +175,6 @@ def create_manifest():
         # Generate codigo_qr
         codigo_qr = generate_codigo_qr(prefix="MAN-QR")
 
-        # BEGIN TRANSACTION
         # Create manifiesto
         manifiesto = Manifiesto(
             numero_manifiesto=numero_manifiesto,
@@ -170,16 +186,14 @@ def create_manifest():
         )
         db.session.add(manifiesto)
         db.session.flush()  # Get manifiesto.id
+        outbox_service.manifest_changed(manifiesto, None)
 
-        # Create detalles and update stock
+        # Create detalles
         detalles_objs = []
         for prod_data in productos_data:
-            producto = prod_data['producto']
-
-            # Create detalle
             detalle = DetalleManifiesto(
                 manifiesto_id=manifiesto.id,
-                producto_id=producto.id,
+                producto_id=prod_data['producto'].id,
                 cantidad=prod_data['cantidad'],
                 precio_unitario=prod_data['precio_unitario'],
                 subtotal=prod_data['subtotal']
@@ -187,27 +201,30 @@ def create_manifest():
             db.session.add(detalle)
             detalles_objs.append(detalle)
 
-            # Decrease product stock
-            producto.cantidad = float(producto.cantidad) - prod_data['cantidad']
+        # Hold the stock
+        reserve_stock(manifiesto, [(prod_data['producto'], prod_data['cantidad']) for prod_data in productos_data])
 
-            # Create movimiento
-            movimiento = Movimiento(
-                producto_id=producto.id,
-                tipo='salida',
-                cantidad=prod_data['cantidad'],
-                observaciones=f"Manifiesto {numero_manifiesto}",
-                usuario_id=user_id
-            )
-            db.session.add(movimiento)
+        # COMMIT: holds are visible to other requests and the row locks are released
+        db.session.commit()
 
-        db.session.flush()  # Ensure all objects have IDs
+    except InsufficientStockError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 409
+
+    except Exception as e:
+        db.session.rollback()
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
+    # Documents are built outside the stock transaction
+    try:
         # Generate manifest QR code
         frontend_url = current_app.config.get('FRONTEND_URL', 'http://localhost:5173')
         success, qr_file_path = generate_manifest_qr(numero_manifiesto, codigo_qr, frontend_url)
 
         if not success:
-            db.session.rollback()
+            _discard_manifest(manifiesto)
             return jsonify({"error": "Error generando código QR del manifiesto"}), 500
 
         # Generate PDF
@@ -222,13 +239,11 @@ def create_manifest():
         )
 
         if not pdf_success:
-            db.session.rollback()
+            _discard_manifest(manifiesto)
             return jsonify({"error": "Error generando PDF del manifiesto"}), 500
 
         # Update manifiesto with PDF path
         manifiesto.pdf_path_proceso = pdf_path
-
-        # COMMIT TRANSACTION
         db.session.commit()
 
         # Return complete manifest
@@ -239,10 +254,22 @@ def create_manifest():
 
     except Exception as e:
         db.session.rollback()
+        _discard_manifest(manifiesto)
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+def _discard_manifest(manifiesto):
+    """Delete a manifest whose documents could not be built, releasing its holds"""
+    db.session.rollback()
+    for reserva in ReservaStock.query.filter_by(manifiesto_id=manifiesto.id, estado='activa'):
+        outbox_service.reservation_changed(reserva, 'liberada')
+    outbox_service.manifest_changed(manifiesto, manifiesto.estado, estado='descartado')
+    ReservaStock.query.filter_by(manifiesto_id=manifiesto.id).delete(synchronize_session=False)
+    DetalleManifiesto.query.filter_by(manifiesto_id=manifiesto.id).delete(synchronize_session=False)
+    Manifiesto.query.filter_by(id=manifiesto.id).delete(synchronize_session=False)
+    db.session.commit()
+
 @bp.route('/<int:id>/firma-cliente', methods=['PUT'])
 def add_client_signature(id):
     """
@@ -260,27 +287,33 @@ def add_client_signature(id):
     if not data or 'firma_cliente' not in data or not data['firma_cliente']:
         return jsonify({"error": "Firma del cliente es requerida"}), 400
 
-    # Get manifiesto
-    manifiesto = Manifiesto.query.get(id)
+    # Get manifiesto, locked until commit: a concurrent signature or status
+    # change waits here and then sees the new estado
+    manifiesto = lock_manifest(id)
     if not manifiesto:
+        db.session.rollback()
         return jsonify({"error": "Manifiesto no encontrado"}), 404
 
     # Verify codigo_qr matches
     if manifiesto.codigo_qr != codigo_qr:
+        db.session.rollback()
         return jsonify({"error": "Código QR inválido para este manifiesto"}), 400
 
     # Verify estado
     if manifiesto.estado == 'entregado':
+        db.session.rollback()
         return jsonify({"error": "Este manifiesto ya fue entregado"}), 400
 
     if manifiesto.estado not in ['en_transito', 'en_proceso']:
+        db.session.rollback()
         return jsonify({"error": "Solo se pueden firmar manifiestos en tránsito o en proceso"}), 400
 
     try:
         # Update manifiesto
         manifiesto.firma_cliente = data['firma_cliente']
-        manifiesto.estado = 'entregado'
         manifiesto.fecha_entrega = datetime.utcnow()
+        estado_anterior = manifiesto.estado
+        manifiesto.estado = 'entregado'
 
         db.session.flush()
 
@@ -310,6 +343,11 @@ def add_client_signature(id):
         # Update pdf_path_final
         manifiesto.pdf_path_final = pdf_final_path
 
+        # Held stock leaves the warehouse; product rows are locked only from
+        # here to the commit, after the PDF is built
+        confirm_reservations(manifiesto, manifiesto.usuario_entrega_id or manifiesto.usuario_creador_id)
+        outbox_service.manifest_changed(manifiesto, estado_anterior)
+
         db.session.commit()
 
         return jsonify({
@@ -338,17 +376,22 @@ def update_manifest_status(id):
     if data['estado'] not in valid_estados:
         return jsonify({"error": f"Estado inválido. Debe ser: {', '.join(valid_estados)}"}), 400
 
-    manifiesto = Manifiesto.query.get(id)
+    # Locked until commit, so concurrent changes apply one after the other
+    manifiesto = lock_manifest(id)
     if not manifiesto:
+        db.session.rollback()
         return jsonify({"error": "Manifiesto no encontrado"}), 404
 
-    try:
-        manifiesto.estado = data['estado']
+    user_id = get_jwt_identity()['user_id']
 
+    try:
         # If marking as en_transito, optionally set delivery user
         if data['estado'] == 'en_transito' and data.get('usuario_entrega_id'):
             manifiesto.usuario_entrega_id = data['usuario_entrega_id']
 
+        # Confirms held stock on en_transito/entregado, releases it on cancelado
+        change_manifest_status(manifiesto, data['estado'], user_id)
+
         db.session.commit()
 
         return jsonify({
@@ -356,6 +399,10 @@ def update_manifest_status(id):
             "manifiesto": manifiesto.to_dict(include_relations=True)
         }), 200
 
+    except InvalidTransitionError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 409
+
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
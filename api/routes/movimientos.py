@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from api.models import db, Movimiento, Producto
+from api.models import db, Movimiento
 from api.utils.decorators import role_required
-from api.utils.validators import validate_required_fields, validate_positive_number
+from api.utils.idempotency import idempotent
+from api.utils.validators import validate_required_fields, validate_positive_number, parse_date_filter
+from api.services.stock_service import lock_products, available_quantity
+from api.utils.row_serializers import MOVIMIENTO_ROW, project_from_request, paginate_rows, count_of
+from api.services import analytics_service, outbox_service
 
 bp = Blueprint('movimientos', __name__)
 
@@ -22,37 +26,113 @@ def list_movements():
     fecha_desde = request.args.get('fecha_desde')
     fecha_hasta = request.args.get('fecha_hasta')
 
-    # Build query
-    query = Movimiento.query
+    # Build filter conditions
+    conditions = []
 
     if producto_id:
-        query = query.filter_by(producto_id=producto_id)
+        conditions.append(Movimiento.producto_id == producto_id)
 
     if tipo:
-        query = query.filter_by(tipo=tipo)
+        conditions.append(Movimiento.tipo == tipo)
 
+    # Typed bounds on created_at, the partition key: only the partitions of
+    # the range are scanned
     if fecha_desde:
-        query = query.filter(Movimiento.created_at >= fecha_desde)
+        desde, error = parse_date_filter(fecha_desde, "fecha_desde")
+        if error:
+            return jsonify({"error": error}), 400
+        conditions.append(Movimiento.created_at >= desde)
 
     if fecha_hasta:
-        query = query.filter(Movimiento.created_at <= fecha_hasta)
+        hasta, error = parse_date_filter(fecha_hasta, "fecha_hasta", end=True)
+        if error:
+            return jsonify({"error": error}), 400
+        conditions.append(Movimiento.created_at < hasta)
 
+    # Sparse fieldsets: ?fields=id,cantidad&expand=producto
+    try:
+        serializer = project_from_request(MOVIMIENTO_ROW)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Read-only path: projected columns only, no ORM entities
     # Order by most recent first
-    query = query.order_by(Movimiento.created_at.desc())
+    stmt = serializer.select(Movimiento).where(*conditions).order_by(Movimiento.created_at.desc())
 
-    # Paginate
-    paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    items, total, pages = paginate_rows(
+        count_of(Movimiento, conditions), stmt, page, per_page, serializer
+    )
 
     return jsonify({
-        "items": [mov.to_dict(include_relations=True) for mov in paginated.items],
+        "items": items,
         "pagination": {
             "page": page,
             "per_page": per_page,
-            "total": paginated.total,
-            "pages": paginated.pages
+            "total": total,
+            "pages": pages
         }
     }), 200
 
+@bp.route('/aggregate', methods=['GET'])
+@jwt_required()
+@role_required(1, 2)  # Administrador, Oficina
+def aggregate_movements():
+    """
+    Movement totals per period for charts:
+    ?group_by=day|week|month&dimensiones=producto,categoria,tipo,usuario
+
+    The result is columnar: "datos" holds one array per column, all the
+    same length, and "etiquetas" the names of the ids present.
+    """
+    group_by = request.args.get('group_by', 'day')
+    if group_by not in analytics_service.PERIODS:
+        return jsonify({"error": f"group_by debe ser uno de: {', '.join(analytics_service.PERIODS)}"}), 400
+
+    dimensiones = [d.strip() for d in request.args.get('dimensiones', '').split(',') if d.strip()]
+    invalid = [d for d in dimensiones if d not in analytics_service.DIMENSIONS]
+    if invalid:
+        return jsonify({
+            "error": f"Dimensiones no válidas: {', '.join(invalid)}. "
+                     f"Disponibles: {', '.join(analytics_service.DIMENSIONS)}"
+        }), 400
+    dimensiones = list(dict.fromkeys(dimensiones))
+
+    desde = hasta = None
+    if request.args.get('fecha_desde'):
+        desde, error = parse_date_filter(request.args['fecha_desde'], "fecha_desde")
+        if error:
+            return jsonify({"error": error}), 400
+
+    if request.args.get('fecha_hasta'):
+        hasta, error = parse_date_filter(request.args['fecha_hasta'], "fecha_hasta", end=True)
+        if error:
+            return jsonify({"error": error}), 400
+
+    columnas, rows = analytics_service.aggregate(
+        group_by, dimensiones, desde=desde, hasta=hasta,
+        producto_id=request.args.get('producto_id', type=int),
+        categoria_id=request.args.get('categoria_id', type=int),
+        tipo=request.args.get('tipo')
+    )
+
+    datos = {columna: [] for columna in columnas}
+    for row in rows:
+        for columna, value in zip(columnas, row):
+            datos[columna].append(value)
+
+    # Periods come back as dates (PostgreSQL) or ISO strings (SQLite)
+    datos['periodo'] = [str(value)[:10] for value in datos['periodo']]
+    datos['cantidad'] = [float(value) if value is not None else 0.0 for value in datos['cantidad']]
+    datos['movimientos'] = [int(value) for value in datos['movimientos']]
+
+    return jsonify({
+        "group_by": group_by,
+        "dimensiones": dimensiones,
+        "columnas": columnas,
+        "datos": datos,
+        "etiquetas": analytics_service.labels(dimensiones, columnas, rows)
+    }), 200
+
 @bp.route('/<int:id>', methods=['GET'])
 @jwt_required()
 @role_required(1, 2)  # Administrador, Oficina
@@ -67,6 +147,7 @@ def get_movement(id):
 @bp.route('', methods=['POST'])
 @jwt_required()
 @role_required(1, 2)  # Administrador, Oficina
+@idempotent
 def create_movement():
     """
     Register manual movement (entrada, salida, ajuste).
@@ -90,17 +171,19 @@ def create_movement():
     if not is_valid:
         return jsonify({"error": error}), 400
 
-    # Verify producto exists
-    producto = Producto.query.get(data['producto_id'])
+    # Verify producto exists (row locked until commit)
+    producto = lock_products([data['producto_id']]).get(data['producto_id'])
     if not producto:
         return jsonify({"error": "Producto no encontrado"}), 404
 
-    # For salida, verify sufficient stock
+    # For salida, verify sufficient stock not held by manifests
     cantidad = float(data['cantidad'])
     if data['tipo'] == 'salida':
-        if float(producto.cantidad) < cantidad:
+        disponible = available_quantity(producto)
+        if disponible < cantidad:
+            db.session.rollback()
             return jsonify({
-                "error": f"Stock insuficiente (disponible: {producto.cantidad}, requerido: {cantidad})"
+                "error": f"Stock insuficiente (disponible: {disponible:.2f}, requerido: {cantidad})"
             }), 409
 
     try:
@@ -115,6 +198,7 @@ def create_movement():
         db.session.add(movimiento)
 
         # Update product stock
+        anterior = float(producto.cantidad)
         if data['tipo'] == 'entrada':
             producto.cantidad = float(producto.cantidad) + cantidad
         elif data['tipo'] == 'salida':
@@ -123,6 +207,9 @@ def create_movement():
             # For ajuste, cantidad represents the new stock level
             producto.cantidad = cantidad
 
+        db.session.flush()  # Get movimiento.id
+        outbox_service.stock_changed(producto, float(producto.cantidad) - anterior, 'movimiento', movimiento.id)
+
         db.session.commit()
 
         return jsonify({
@@ -1,9 +1,19 @@
+from datetime import date, datetime, timezone
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from api.models import db, Producto, Categoria, Cliente, Etiqueta, Movimiento, Transformacion
 from api.utils.decorators import role_required
+from api.utils.idempotency import idempotent
 from api.utils.validators import validate_required_fields, validate_length, validate_non_negative_number, validate_positive_number
 from api.services.qr_service import generate_codigo_qr, generate_product_qr
+from api.services.stock_service import lock_products, available_quantity, reserved_quantities
+from api.services.ledger_service import stock_at, closing_time, HistoryArchivedError
+from api.services.genealogy_service import genealogy, MAX_DEPTH
+from api.services import outbox_service
+from api.utils.http_cache import etag_from, table_version, conditional_json
+from api.utils.row_serializers import (
+    PRODUCTO_ROW, RESERVA_FIELDS, project_from_request, attach_reservas, paginate_rows, count_of
+)
 
 bp = Blueprint('productos', __name__)
 
@@ -22,44 +32,161 @@ def list_products():
     estado = request.args.get('estado')
     search = request.args.get('search')  # Search by name
 
-    # Build query
-    query = Producto.query
+    # Sparse fieldsets: ?fields=nombre,cantidad&expand=categoria
+    try:
+        serializer = project_from_request(PRODUCTO_ROW)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Build filter conditions
+    conditions = []
 
     if categoria_id:
-        query = query.filter_by(categoria_id=categoria_id)
+        conditions.append(Producto.categoria_id == categoria_id)
 
     if estado:
-        query = query.filter_by(estado=estado)
+        conditions.append(Producto.estado == estado)
 
     if search:
-        query = query.filter(Producto.nombre.ilike(f'%{search}%'))
+        conditions.append(Producto.nombre.ilike(f'%{search}%'))
 
+    # Read-only path: projected columns only, no ORM entities
     # Order by most recent first
-    query = query.order_by(Producto.created_at.desc())
+    stmt = serializer.select(Producto).where(*conditions).order_by(Producto.created_at.desc())
 
-    # Paginate
-    paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    items, total, pages = paginate_rows(
+        count_of(Producto, conditions), stmt, page, per_page, serializer
+    )
+    attach_reservas(items, [name for name in RESERVA_FIELDS if serializer.wants(name)])
 
     return jsonify({
-        "items": [producto.to_dict(include_relations=True) for producto in paginated.items],
+        "items": items,
         "pagination": {
             "page": page,
             "per_page": per_page,
-            "total": paginated.total,
-            "pages": paginated.pages
+            "total": total,
+            "pages": pages
         }
     }), 200
 
+@bp.route('/stock', methods=['GET'])
+@jwt_required()
+@role_required(1, 2)  # Administrador, Oficina
+def stock_history():
+    """
+    Stock per product at a past instant, rebuilt from the latest daily
+    snapshot and the ledger since then.
+
+    `fecha` is an ISO timestamp (UTC unless it carries an offset) or a date,
+    meaning the closing stock of that day.
+    """
+    fecha = request.args.get('fecha')
+    if not fecha:
+        return jsonify({"error": "El parámetro fecha es requerido"}), 400
+
+    try:
+        hasta = _parse_instant(fecha)
+    except ValueError:
+        return jsonify({"error": "Fecha inválida, use el formato ISO (AAAA-MM-DD o AAAA-MM-DDTHH:MM:SS)"}), 400
+
+    categoria_id = request.args.get('categoria_id', type=int)
+    producto_id = request.args.get('producto_id', type=int)
+
+    # Products that existed at that instant
+    query = db.session.query(
+        Producto.id, Producto.nombre, Producto.medida, Producto.categoria_id
+    ).filter(Producto.created_at <= hasta)
+
+    if categoria_id:
+        query = query.filter(Producto.categoria_id == categoria_id)
+
+    if producto_id:
+        query = query.filter(Producto.id == producto_id)
+
+    productos = query.order_by(Producto.nombre, Producto.id).all()
+
+    filtered = bool(categoria_id or producto_id)
+    try:
+        stock, checkpoint = stock_at(hasta, [producto.id for producto in productos] if filtered else None)
+    except HistoryArchivedError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        "fecha": hasta.isoformat(),
+        "checkpoint": closing_time(checkpoint).isoformat() if checkpoint else None,
+        "items": [{
+            'id': producto.id,
+            'nombre': producto.nombre,
+            'medida': producto.medida,
+            'categoria_id': producto.categoria_id,
+            'cantidad': float(stock.get(producto.id, 0))
+        } for producto in productos]
+    }), 200
+
+
+def _parse_instant(value):
+    """
+    Naive UTC datetime from an ISO date (end of that day) or timestamp
+
+    Raises:
+        ValueError: If the value is not ISO formatted
+    """
+    if len(value) == 10:
+        return closing_time(date.fromisoformat(value))
+
+    instant = datetime.fromisoformat(value)
+    if instant.tzinfo is not None:
+        instant = instant.astimezone(timezone.utc).replace(tzinfo=None)
+    return instant
+
+
 @bp.route('/<int:id>', methods=['GET'])
 @jwt_required()
 @role_required(1, 2, 3)  # Administrador, Oficina, Operario
 def get_product(id):
     """Get single product details"""
+    # Conditional GET: the ETag covers the product, every row to_dict() embeds
+    # and the stock held by reservations
+    version = db.session.query(
+        Producto.updated_at, Cliente.updated_at, Etiqueta.id, Etiqueta.created_at
+    ).outerjoin(
+        Cliente, Producto.cliente_id == Cliente.id
+    ).outerjoin(
+        Etiqueta, Etiqueta.producto_id == Producto.id
+    ).filter(Producto.id == id).first()
+
+    if not version:
+        return jsonify({"error": "Producto no encontrado"}), 404
+
+    reservada = reserved_quantities([id]).get(id, 0.0)
+    etag = etag_from('producto', id, *version, table_version('categorias'), reservada)
+
+    def build():
+        producto = Producto.query.get(id).to_dict(include_relations=True)
+        producto['cantidad_reservada'] = reservada
+        producto['cantidad_disponible'] = producto['cantidad'] - reservada
+        return producto
+
+    return conditional_json(etag, build)
+
+@bp.route('/<int:id>/genealogy', methods=['GET'])
+@jwt_required()
+@role_required(1, 2, 3)  # Administrador, Oficina, Operario
+def get_product_genealogy(id):
+    """
+    Transformations upstream (ascendencia) and downstream (descendencia)
+    of a product, up to `profundidad` hops (default 10).
+    """
     producto = Producto.query.get(id)
     if not producto:
         return jsonify({"error": "Producto no encontrado"}), 404
 
-    return jsonify(producto.to_dict(include_relations=True)), 200
+    depth = request.args.get('profundidad', 10, type=int)
+    if depth < 1 or depth > MAX_DEPTH:
+        return jsonify({"error": f"profundidad debe estar entre 1 y {MAX_DEPTH}"}), 400
+
+    payload, version = genealogy(producto, depth)
+    return conditional_json(etag_from('genealogia', id, depth, *version), payload)
 
 @bp.route('', methods=['POST'])
 @jwt_required()
@@ -152,6 +279,8 @@ def create_product():
             usuario_id=user_id
         )
         db.session.add(movimiento)
+        db.session.flush()  # Get movimiento.id
+        outbox_service.stock_changed(producto, producto.cantidad, 'alta', movimiento.id)
 
         # COMMIT TRANSACTION
         db.session.commit()
@@ -236,6 +365,7 @@ def delete_product(id):
 @bp.route('/transformar', methods=['POST'])
 @jwt_required()
 @role_required(1, 3)  # Administrador, Operario
+@idempotent
 def transform_product():
     """
     Transform product state (e.g., Untreated → Treated).
@@ -258,26 +388,23 @@ def transform_product():
         return jsonify({"error": error}), 400
 
     try:
-        # Query products with row locks (FOR UPDATE)
-        producto_origen = db.session.query(Producto).filter_by(
-            id=data['producto_origen_id']
-        ).with_for_update().first()
+        # Query products with row locks (FOR UPDATE), in id order
+        productos = lock_products([data['producto_origen_id'], data['producto_destino_id']])
+        producto_origen = productos.get(data['producto_origen_id'])
+        producto_destino = productos.get(data['producto_destino_id'])
 
         if not producto_origen:
             return jsonify({"error": "Producto origen no encontrado"}), 404
 
-        producto_destino = db.session.query(Producto).filter_by(
-            id=data['producto_destino_id']
-        ).with_for_update().first()
-
         if not producto_destino:
             return jsonify({"error": "Producto destino no encontrado"}), 404
 
-        # Verify sufficient stock
+        # Verify sufficient stock not held by manifests
         cantidad = float(data['cantidad'])
-        if float(producto_origen.cantidad) < cantidad:
+        disponible = available_quantity(producto_origen)
+        if disponible < cantidad:
             return jsonify({
-                "error": f"Stock insuficiente en producto origen (disponible: {producto_origen.cantidad}, requerido: {cantidad})"
+                "error": f"Stock insuficiente en producto origen (disponible: {disponible:.2f}, requerido: {cantidad})"
             }), 409
 
         # BEGIN TRANSACTION (already started by with_for_update)
@@ -297,6 +424,10 @@ def transform_product():
             usuario_id=user_id
         )
         db.session.add(transformacion)
+        db.session.flush()  # Get transformacion.id
+
+        outbox_service.stock_changed(producto_origen, -cantidad, 'transformacion', transformacion.id)
+        outbox_service.stock_changed(producto_destino, cantidad, 'transformacion', transformacion.id)
 
         # COMMIT TRANSACTION
         db.session.commit()
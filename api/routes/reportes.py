@@ -1,18 +1,49 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, current_app
 from flask_jwt_extended import jwt_required
-from api.models import db, Movimiento, Manifiesto, Producto, Categoria, Usuario
+from api.models import db, Movimiento, Manifiesto, Producto, Categoria, Usuario, Cliente
 from api.utils.decorators import role_required
-from api.services.excel_service import generate_movements_excel, generate_deliveries_excel
+from api.utils.validators import parse_date_filter
+from api.services.excel_service import (
+    generate_movements_excel, generate_deliveries_excel, generate_consolidated_excel
+)
+from api.services.columnar_service import (
+    FORMATS, MOVIMIENTOS_COLUMNS, INVENTARIO_COLUMNS, ColumnarUnavailableError, write_columnar
+)
 from datetime import datetime
+from sqlalchemy import select, func, literal, cast, null, union_all, Numeric
 import os
 
 bp = Blueprint('reportes', __name__)
 
+def _formato():
+    """Requested ?formato= (xlsx, parquet or arrow), or None if invalid"""
+    formato = request.args.get('formato', 'xlsx')
+    return formato if formato == 'xlsx' or formato in FORMATS else None
+
+def _send_columnar(stmt, columns, nombre, formato):
+    """Write a columnar export of `stmt` and return it as an attachment"""
+    extension, mimetype = FORMATS[formato]
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"{nombre}_{timestamp}.{extension}"
+    output_path = os.path.join(current_app.config['DATA_PATH'], 'reportes', nombre, filename)
+
+    try:
+        write_columnar(stmt, columns, output_path, formato, batch_size=current_app.config['EXPORT_BATCH_SIZE'])
+    except ColumnarUnavailableError as e:
+        return jsonify({"error": str(e)}), 501
+
+    return send_file(output_path, as_attachment=True, download_name=filename, mimetype=mimetype)
+
+
 @bp.route('/movimientos', methods=['GET'])
 @jwt_required()
 @role_required(1, 2)  # Administrador, Oficina
 def generate_movements_report():
-    """Generate movements report in Excel format"""
+    """Generate movements report in Excel format (or ?formato=parquet|arrow)"""
+    formato = _formato()
+    if formato is None:
+        return jsonify({"error": "formato debe ser xlsx, parquet o arrow"}), 400
+
     # Get filters
     fecha_desde = request.args.get('fecha_desde')
     fecha_hasta = request.args.get('fecha_hasta')
@@ -23,10 +54,12 @@ def generate_movements_report():
     query = db.session.query(
         Movimiento.id,
         Movimiento.created_at,
+        Movimiento.producto_id,
         Producto.nombre.label('producto'),
         Categoria.nombre.label('categoria'),
         Movimiento.tipo,
         Movimiento.cantidad,
+        Movimiento.usuario_id,
         Usuario.nombre.label('usuario'),
         Movimiento.observaciones
     ).join(
@@ -37,12 +70,18 @@ def generate_movements_report():
         Usuario, Movimiento.usuario_id == Usuario.id
     )
 
-    # Apply filters
+    # Apply filters (typed bounds on the partition key prune partitions)
     if fecha_desde:
-        query = query.filter(Movimiento.created_at >= fecha_desde)
+        desde, error = parse_date_filter(fecha_desde, "fecha_desde")
+        if error:
+            return jsonify({"error": error}), 400
+        query = query.filter(Movimiento.created_at >= desde)
 
     if fecha_hasta:
-        query = query.filter(Movimiento.created_at <= fecha_hasta)
+        hasta, error = parse_date_filter(fecha_hasta, "fecha_hasta", end=True)
+        if error:
+            return jsonify({"error": error}), 400
+        query = query.filter(Movimiento.created_at < hasta)
 
     if producto_id:
         query = query.filter(Movimiento.producto_id == producto_id)
@@ -53,6 +92,10 @@ def generate_movements_report():
     # Order by date descending
     query = query.order_by(Movimiento.created_at.desc())
 
+    # Columnar export: streamed in record batches, types kept
+    if formato != 'xlsx':
+        return _send_columnar(query.statement, MOVIMIENTOS_COLUMNS, 'movimientos', formato)
+
     # Execute query
     results = query.all()
 
@@ -100,8 +143,6 @@ def generate_deliveries_report():
     estado = request.args.get('estado')
 
     # Build query
-    from api.models import Cliente
-
     query = db.session.query(
         Manifiesto.numero_manifiesto,
         Cliente.nombre.label('cliente'),
@@ -169,14 +210,20 @@ def generate_deliveries_report():
 @jwt_required()
 @role_required(1, 2)  # Administrador, Oficina
 def generate_inventory_report():
-    """Generate current inventory snapshot report"""
+    """Generate current inventory snapshot report (Excel, or ?formato=parquet|arrow)"""
+    formato = _formato()
+    if formato is None:
+        return jsonify({"error": "formato debe ser xlsx, parquet o arrow"}), 400
+
     # Get all products with their categories
     query = db.session.query(
+        Producto.id,
         Producto.nombre,
         Categoria.nombre.label('categoria'),
         Producto.estado,
         Producto.cantidad,
-        Producto.medida
+        Producto.medida,
+        Producto.updated_at
     ).join(
         Categoria, Producto.categoria_id == Categoria.id
     ).order_by(
@@ -184,6 +231,9 @@ def generate_inventory_report():
         Producto.nombre.asc()
     )
 
+    if formato != 'xlsx':
+        return _send_columnar(query.statement, INVENTARIO_COLUMNS, 'inventario', formato)
+
     results = query.all()
 
     # Convert to list of dictionaries
@@ -215,3 +265,116 @@ def generate_inventory_report():
         download_name=filename,
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
+
+@bp.route('/consolidado', methods=['GET'])
+@jwt_required()
+@role_required(1, 2)  # Administrador, Oficina
+def generate_consolidated_report():
+    """
+    Month-end workbook: summary, movements, deliveries and inventory sheets
+    in one file. The four queries run concurrently on separate connections.
+    """
+    fecha_desde = request.args.get('fecha_desde')
+    fecha_hasta = request.args.get('fecha_hasta')
+
+    # Date range of movements (created_at) and deliveries (fecha_creacion)
+    movimiento_conditions = []
+    manifiesto_conditions = []
+
+    if fecha_desde:
+        desde, error = parse_date_filter(fecha_desde, "fecha_desde")
+        if error:
+            return jsonify({"error": error}), 400
+        movimiento_conditions.append(Movimiento.created_at >= desde)
+        manifiesto_conditions.append(Manifiesto.fecha_creacion >= desde)
+
+    if fecha_hasta:
+        hasta, error = parse_date_filter(fecha_hasta, "fecha_hasta", end=True)
+        if error:
+            return jsonify({"error": error}), 400
+        movimiento_conditions.append(Movimiento.created_at < hasta)
+        manifiesto_conditions.append(Manifiesto.fecha_creacion < hasta)
+
+    movimientos = select(
+        Movimiento.created_at,
+        Producto.nombre,
+        Categoria.nombre,
+        Movimiento.tipo,
+        Movimiento.cantidad,
+        Usuario.nombre,
+        Movimiento.observaciones
+    ).join(
+        Producto, Movimiento.producto_id == Producto.id
+    ).join(
+        Categoria, Producto.categoria_id == Categoria.id
+    ).join(
+        Usuario, Movimiento.usuario_id == Usuario.id
+    ).where(*movimiento_conditions).order_by(Movimiento.created_at.desc())
+
+    entregas = select(
+        Manifiesto.numero_manifiesto,
+        Cliente.nombre,
+        Manifiesto.estado,
+        Manifiesto.fecha_creacion,
+        Manifiesto.fecha_entrega,
+        Usuario.nombre
+    ).join(
+        Cliente, Manifiesto.cliente_id == Cliente.id
+    ).join(
+        Usuario, Manifiesto.usuario_creador_id == Usuario.id
+    ).where(*manifiesto_conditions).order_by(Manifiesto.fecha_creacion.desc())
+
+    inventario = select(
+        Producto.nombre,
+        Categoria.nombre,
+        Producto.estado,
+        Producto.cantidad,
+        func.coalesce(Producto.medida, 'unidades')
+    ).join(
+        Categoria, Producto.categoria_id == Categoria.id
+    ).order_by(Categoria.nombre.asc(), Producto.nombre.asc())
+
+    # Summary aggregated in SQL: movements per type, deliveries per state,
+    # stock per category
+    resumen = union_all(
+        select(
+            literal(1).label('orden'), literal('Movimientos').label('seccion'),
+            Movimiento.tipo.label('concepto'), func.count().label('registros'),
+            func.sum(Movimiento.cantidad).label('cantidad')
+        ).where(*movimiento_conditions).group_by(Movimiento.tipo),
+        select(
+            literal(2), literal('Entregas'), Manifiesto.estado, func.count(), cast(null(), Numeric(14, 2))
+        ).where(*manifiesto_conditions).group_by(Manifiesto.estado),
+        select(
+            literal(3), literal('Inventario'), Categoria.nombre, func.count(Producto.id), func.sum(Producto.cantidad)
+        ).join(Producto, Producto.categoria_id == Categoria.id).group_by(Categoria.nombre)
+    ).subquery('resumen')
+    resumen = select(
+        resumen.c.seccion, resumen.c.concepto, resumen.c.registros, resumen.c.cantidad
+    ).order_by(resumen.c.orden, resumen.c.concepto)
+
+    sheets = [
+        ('Resumen', ['Sección', 'Concepto', 'Registros', 'Cantidad'], resumen),
+        ('Movimientos', ['Fecha', 'Producto', 'Categoría', 'Tipo', 'Cantidad', 'Usuario', 'Observaciones'], movimientos),
+        ('Entregas', ['Número Manifiesto', 'Cliente', 'Estado', 'Fecha Creación', 'Fecha Entrega', 'Creado Por'], entregas),
+        ('Inventario', ['Producto', 'Categoría', 'Estado', 'Cantidad', 'Medida'], inventario),
+    ]
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"consolidado_{timestamp}.xlsx"
+    output_path = os.path.join(current_app.config['DATA_PATH'], 'reportes', 'consolidado', filename)
+
+    try:
+        generate_consolidated_excel(
+            db.engine, sheets, output_path, batch_size=current_app.config['CONSOLIDATED_BATCH_SIZE']
+        )
+    except Exception:
+        current_app.logger.exception("Error generando reporte consolidado")
+        return jsonify({"error": "Error generando reporte"}), 500
+
+    return send_file(
+        output_path,
+        as_attachment=True,
+        download_name=filename,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
@@ -0,0 +1,137 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import tuple_
+from api.models import db, Producto, Cliente, Manifiesto, Eliminacion
+from api.utils.decorators import role_required
+from api.utils.row_serializers import PRODUCTO_ROW, CLIENTE_ROW, MANIFIESTO_ROW, attach_detalles
+
+bp = Blueprint('sync', __name__)
+
+# Synced entities: (model, serializer, roles allowed to read them), the
+# same roles as the matching list endpoints
+ENTITIES = {
+    'manifiestos': (Manifiesto, MANIFIESTO_ROW, (1, 2, 3, 4)),
+    'clientes': (Cliente, CLIENTE_ROW, (1, 2, 4)),
+    'productos': (Producto, PRODUCTO_ROW, (1, 2, 3)),
+}
+
+# Cursor key of the tombstone stream in the sync token
+TOMBSTONES = 'eliminaciones'
+
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+@role_required(1, 2, 3, 4)  # Administrador, Oficina, Operario, Delivery
+def sync():
+    """
+    Delta sync for offline clients.
+
+    Without `since` it returns every row (in pages, see has_more) and a token;
+    with `since=<token>` only the rows changed and deleted after that token.
+    Clients upsert by id and must tolerate receiving the same row twice.
+    """
+    current_user = get_jwt_identity()
+    entities = [name for name, (_, _, roles) in ENTITIES.items() if current_user['role_id'] in roles]
+
+    page_size = current_app.config['SYNC_PAGE_SIZE']
+    now = datetime.utcnow()
+    # Rows committed by transactions that started before `now` can carry an
+    # older updated_at, so every token reaches back SYNC_OVERLAP_SECONDS
+    horizon = now - timedelta(seconds=current_app.config['SYNC_OVERLAP_SECONDS'])
+
+    since = request.args.get('since')
+    if since:
+        try:
+            cursors = _decode_token(since)
+        except ValueError:
+            return jsonify({"error": "Token de sincronización inválido"}), 400
+    else:
+        # Full sync: every row, and no deletions before this moment
+        cursors = {TOMBSTONES: (horizon, 0)}
+
+    result = {}
+    new_cursors = {}
+    has_more = False
+
+    for name in entities:
+        model, serializer, _ = ENTITIES[name]
+        cursor = cursors.get(name, (datetime.min, 0))
+
+        stmt = serializer.select(model).where(
+            _after(model.updated_at, model.id, cursor)
+        ).order_by(model.updated_at, model.id).limit(page_size + 1)
+
+        items = [serializer(row) for row in db.session.execute(stmt)]
+        if name == 'manifiestos':
+            attach_detalles(items)
+
+        if len(items) > page_size:
+            items = items[:page_size]
+            has_more = True
+            new_cursors[name] = (_parse_datetime(items[-1]['updated_at']), items[-1]['id'])
+        else:
+            new_cursors[name] = max(cursor, (horizon, 0))
+
+        result[name] = items
+
+    # Tombstones of the entities this user syncs
+    cursor = cursors.get(TOMBSTONES, (horizon, 0))
+    tombstones = db.session.query(
+        Eliminacion.id, Eliminacion.tabla, Eliminacion.registro_id, Eliminacion.deleted_at
+    ).filter(
+        Eliminacion.tabla.in_(entities),
+        _after(Eliminacion.deleted_at, Eliminacion.id, cursor)
+    ).order_by(Eliminacion.deleted_at, Eliminacion.id).limit(page_size + 1).all()
+
+    if len(tombstones) > page_size:
+        tombstones = tombstones[:page_size]
+        has_more = True
+        new_cursors[TOMBSTONES] = (tombstones[-1].deleted_at, tombstones[-1].id)
+    else:
+        new_cursors[TOMBSTONES] = max(cursor, (horizon, 0))
+
+    eliminados = {name: [] for name in entities}
+    for tombstone in tombstones:
+        eliminados[tombstone.tabla].append(tombstone.registro_id)
+
+    return jsonify({
+        **result,
+        "eliminados": eliminados,
+        "sync_token": _encode_token(new_cursors),
+        "has_more": has_more,
+        "server_time": now.isoformat()
+    }), 200
+
+
+def _after(timestamp_column, id_column, cursor):
+    """Keyset condition (timestamp, id) > cursor, a range scan on the (updated_at, id) indexes"""
+    return tuple_(timestamp_column, id_column) > tuple_(*cursor)
+
+
+def _parse_datetime(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def _encode_token(cursors):
+    payload = {name: [timestamp.isoformat(), last_id] for name, (timestamp, last_id) in cursors.items()}
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_token(token):
+    """
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        return {
+            name: (datetime.fromisoformat(timestamp), int(last_id))
+            for name, (timestamp, last_id) in payload.items()
+        }
+    except (TypeError, AttributeError, ValueError) as e:
+        raise ValueError(str(e))
@@ -0,0 +1,116 @@
+import base64
+import json
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from sqlalchemy import or_, tuple_
+from api.models import db, Transformacion
+from api.utils.decorators import role_required
+from api.utils.validators import parse_date_filter
+from api.utils.row_serializers import TRANSFORMACION_ROW, project_from_request
+
+bp = Blueprint('transformaciones', __name__)
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+@role_required(1, 2)  # Administrador, Oficina
+def list_transformations():
+    """
+    Transformation history, newest first, with cursor pagination: pass the
+    returned next_cursor as ?cursor= to get the following page.
+    """
+    per_page = request.args.get('per_page', 20, type=int)
+    per_page = min(100, max(1, per_page))
+
+    # Filters
+    producto_id = request.args.get('producto_id', type=int)  # Origin or destination
+    producto_origen_id = request.args.get('producto_origen_id', type=int)
+    producto_destino_id = request.args.get('producto_destino_id', type=int)
+    tipo = request.args.get('tipo_transformacion')
+    usuario_id = request.args.get('usuario_id', type=int)
+    fecha_desde = request.args.get('fecha_desde')
+    fecha_hasta = request.args.get('fecha_hasta')
+    cursor = request.args.get('cursor')
+
+    conditions = []
+
+    # Product filters use the (producto_*_id, created_at) indexes, which
+    # also return the rows in page order
+    if producto_id:
+        conditions.append(or_(
+            Transformacion.producto_origen_id == producto_id,
+            Transformacion.producto_destino_id == producto_id
+        ))
+
+    if producto_origen_id:
+        conditions.append(Transformacion.producto_origen_id == producto_origen_id)
+
+    if producto_destino_id:
+        conditions.append(Transformacion.producto_destino_id == producto_destino_id)
+
+    if tipo:
+        conditions.append(Transformacion.tipo_transformacion == tipo)
+
+    if usuario_id:
+        conditions.append(Transformacion.usuario_id == usuario_id)
+
+    if fecha_desde:
+        desde, error = parse_date_filter(fecha_desde, "fecha_desde")
+        if error:
+            return jsonify({"error": error}), 400
+        conditions.append(Transformacion.created_at >= desde)
+
+    if fecha_hasta:
+        hasta, error = parse_date_filter(fecha_hasta, "fecha_hasta", end=True)
+        if error:
+            return jsonify({"error": error}), 400
+        conditions.append(Transformacion.created_at < hasta)
+
+    if cursor:
+        try:
+            conditions.append(
+                tuple_(Transformacion.created_at, Transformacion.id) < tuple_(*_decode_cursor(cursor))
+            )
+        except ValueError:
+            return jsonify({"error": "Cursor inválido"}), 400
+
+    # Sparse fieldsets: ?fields=id,cantidad&expand=producto_origen
+    try:
+        serializer = project_from_request(TRANSFORMACION_ROW)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Read-only path: products and user come from joins in the same query.
+    # The keyset columns lead the row, whatever fields were requested
+    stmt = serializer.select(
+        Transformacion, Transformacion.created_at, Transformacion.id
+    ).where(*conditions).order_by(
+        Transformacion.created_at.desc(), Transformacion.id.desc()
+    ).limit(per_page + 1)
+
+    rows = db.session.execute(stmt).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    return jsonify({
+        "items": [serializer(row, 2) for row in rows],
+        "next_cursor": _encode_cursor(rows[-1][0], rows[-1][1]) if has_more else None
+    }), 200
+
+
+def _encode_cursor(created_at, last_id):
+    raw = json.dumps([created_at.isoformat(), last_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor):
+    """
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, last_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(last_id)
+    except (TypeError, AttributeError, ValueError) as e:
+        raise ValueError(str(e))
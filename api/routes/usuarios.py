@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from api.models import db, Usuario, Role
 from api.utils.decorators import role_required
+from api.utils.row_serializers import USUARIO_ROW, paginate_rows, count_of
 
 bp = Blueprint('usuarios', __name__)
 
@@ -14,17 +15,18 @@ def list_users():
     per_page = request.args.get('per_page', 20, type=int)
     per_page = min(100, max(1, per_page))
 
-    query = Usuario.query.order_by(Usuario.created_at.desc())
+    # Read-only path: projected columns only, no ORM entities
+    stmt = USUARIO_ROW.select(Usuario).order_by(Usuario.created_at.desc())
 
-    paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    items, total, pages = paginate_rows(count_of(Usuario, []), stmt, page, per_page, USUARIO_ROW)
 
     return jsonify({
-        "items": [user.to_dict(include_role=True) for user in paginated.items],
+        "items": items,
         "pagination": {
             "page": page,
             "per_page": per_page,
-            "total": paginated.total,
-            "pages": paginated.pages
+            "total": total,
+            "pages": pages
         }
     }), 200
 
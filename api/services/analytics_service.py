@@ -0,0 +1,199 @@
+"""
+Movement aggregates computed in SQL (GROUP BY over time buckets and dimensions).
+
+Closed days can be pre-aggregated into movimientos_resumen_diario by
+`flask resumir-movimientos`. A query reads whole days between the first and
+the last rolled up ones from that table and everything else (earlier days,
+partial days, today) from movimientos, then groups both sources together.
+Rolled-up days also keep their totals after their partition is archived,
+so they cannot be rebuilt once archived.
+"""
+from datetime import datetime, time, timedelta
+from sqlalchemy import select, func, cast, or_, union_all, Date, delete, insert
+from api.app import db
+from api.models import Movimiento, MovimientoResumenDiario, Producto, Categoria, Usuario
+from api.services.ledger_service import HistoryArchivedError
+from api.services.partition_service import archived_until
+
+PERIODS = ('day', 'week', 'month')
+DIMENSIONS = ('producto', 'categoria', 'tipo', 'usuario')
+
+# Dimension -> (column key in the result, label model)
+_DIMENSION_KEYS = {
+    'producto': ('producto_id', Producto),
+    'categoria': ('categoria_id', Categoria),
+    'tipo': ('tipo', None),
+    'usuario': ('usuario_id', Usuario),
+}
+
+
+def _sqlite():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def _day(column):
+    """Calendar day of a timestamp"""
+    return func.date(column) if _sqlite() else cast(column, Date)
+
+
+def _bucket(period, column):
+    """Start of the day, week (Monday) or month containing a date or timestamp"""
+    if _sqlite():
+        if period == 'day':
+            return func.date(column)
+        if period == 'week':
+            return func.date(column, '-6 days', 'weekday 1')
+        return func.strftime('%Y-%m-01', column)
+    return cast(func.date_trunc(period, column), Date)
+
+
+def rolled_up_until():
+    """Last day stored in the rollup table, or None"""
+    return db.session.query(func.max(MovimientoResumenDiario.fecha)).scalar()
+
+
+def rolled_up_range():
+    """(first, last) days stored in the rollup table, or (None, None)"""
+    return db.session.query(
+        func.min(MovimientoResumenDiario.fecha), func.max(MovimientoResumenDiario.fecha)
+    ).one()
+
+
+def _ceil_day(instant):
+    day = instant.date()
+    return day if instant.time() == time.min else day + timedelta(days=1)
+
+
+def _source(desde, hasta, filters):
+    """
+    Movements at the (fecha, producto, tipo, usuario) grain: rollup rows
+    for the rolled-up days in [desde, hasta), live rows for the rest. The
+    rolled-up days are contiguous (resumir-movimientos leaves no gaps)
+    """
+    m = Movimiento
+    r = MovimientoResumenDiario
+    live_conditions = list(filters(m))
+    if desde:
+        live_conditions.append(m.created_at >= desde)
+    if hasta:
+        live_conditions.append(m.created_at < hasta)
+
+    selects = []
+    start, until = rolled_up_range()
+
+    if until is not None:
+        # Days [first, end) come from the rollup; days before its start are live
+        first = max(start, _ceil_day(desde)) if desde else start
+        end = until + timedelta(days=1)
+        if hasta:
+            end = min(end, hasta.date())
+
+        if first < end:
+            selects.append(select(
+                r.fecha.label('fecha'), r.producto_id, r.tipo, r.usuario_id,
+                r.cantidad.label('cantidad'), r.movimientos.label('movimientos')
+            ).where(r.fecha >= first, r.fecha < end, *filters(r)))
+
+            live_conditions.append(or_(
+                m.created_at < datetime.combine(first, time.min),
+                m.created_at >= datetime.combine(end, time.min)
+            ))
+
+    selects.append(select(
+        _day(m.created_at).label('fecha'), m.producto_id, m.tipo, m.usuario_id,
+        func.sum(m.cantidad).label('cantidad'), func.count().label('movimientos')
+    ).where(*live_conditions).group_by(_day(m.created_at), m.producto_id, m.tipo, m.usuario_id))
+
+    return (union_all(*selects) if len(selects) > 1 else selects[0]).subquery('fuente')
+
+
+def aggregate(period, dimensions, desde=None, hasta=None, producto_id=None, categoria_id=None, tipo=None):
+    """
+    Totals of movimientos per time bucket and dimensions.
+
+    Args:
+        period: 'day', 'week' or 'month'
+        dimensions: Subset of DIMENSIONS to group by
+        desde, hasta: Optional naive UTC range [desde, hasta)
+
+    Returns:
+        Tuple (columns, rows): column names and result rows ordered by period
+    """
+    def filters(model):
+        conditions = []
+        if producto_id:
+            conditions.append(model.producto_id == producto_id)
+        if tipo:
+            conditions.append(model.tipo == tipo)
+        return conditions
+
+    source = _source(desde, hasta, filters)
+    periodo = _bucket(period, source.c.fecha).label('periodo')
+
+    keys = []
+    for dimension in dimensions:
+        if dimension == 'categoria':
+            keys.append(Producto.categoria_id.label('categoria_id'))
+        else:
+            keys.append(source.c[_DIMENSION_KEYS[dimension][0]])
+
+    stmt = select(
+        periodo, *keys,
+        func.sum(source.c.cantidad).label('cantidad'),
+        func.sum(source.c.movimientos).label('movimientos')
+    )
+    if 'categoria' in dimensions or categoria_id:
+        stmt = stmt.join(Producto, Producto.id == source.c.producto_id)
+        if categoria_id:
+            stmt = stmt.where(Producto.categoria_id == categoria_id)
+
+    stmt = stmt.group_by(periodo, *keys).order_by(periodo, *keys)
+
+    columns = ['periodo'] + [_DIMENSION_KEYS[dimension][0] for dimension in dimensions] + ['cantidad', 'movimientos']
+    return columns, db.session.execute(stmt).all()
+
+
+def labels(dimensions, columns, rows):
+    """Names of the products, categories and users present in the result"""
+    result = {}
+    for dimension in dimensions:
+        key, model = _DIMENSION_KEYS[dimension]
+        if model is None:
+            continue
+        index = columns.index(key)
+        ids = {row[index] for row in rows if row[index] is not None}
+        names = db.session.query(model.id, model.nombre).filter(model.id.in_(ids)) if ids else []
+        result[dimension] = {str(id_): nombre for id_, nombre in names}
+    return result
+
+
+def roll_up(desde, hasta):
+    """
+    (Re)build the rollup rows of the days [desde, hasta]. The caller commits.
+
+    Returns:
+        Number of rollup rows written
+
+    Raises:
+        HistoryArchivedError: If a day's movements are archived (its rollup
+            rows are the only totals left and are kept)
+    """
+    archivado = archived_until()
+    if archivado is not None and desde < archivado:
+        raise HistoryArchivedError(archivado)
+
+    m = Movimiento
+    day = _day(m.created_at)
+    db.session.execute(delete(MovimientoResumenDiario).where(
+        MovimientoResumenDiario.fecha >= desde, MovimientoResumenDiario.fecha <= hasta
+    ))
+    result = db.session.execute(insert(MovimientoResumenDiario).from_select(
+        ['fecha', 'producto_id', 'tipo', 'usuario_id', 'cantidad', 'movimientos'],
+        select(
+            day, m.producto_id, m.tipo, m.usuario_id, func.sum(m.cantidad), func.count()
+        ).where(
+            m.created_at >= datetime.combine(desde, time.min),
+            m.created_at < datetime.combine(hasta + timedelta(days=1), time.min)
+        ).group_by(day, m.producto_id, m.tipo, m.usuario_id)
+    ))
+    return result.rowcount
@@ -0,0 +1,141 @@
+"""
+Archival of delivered manifests.
+
+Manifests delivered more than MANIFEST_ARCHIVE_AFTER_DAYS ago leave the hot
+tables: their rows move to manifiestos_archivo / detalle_manifiesto_archivo
+(same ids) and their files (PDFs and QR image) to one compressed ZIP bundle
+per delivery month under DATA_PATH/manifiestos/archivo.
+
+Order of the steps, so that a crash never loses a document: the bundle is
+rewritten first (to a temporary file, then renamed), then the rows move in
+one transaction per batch, and only then are the original files deleted.
+"""
+import os
+import zipfile
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import insert, select, literal
+from api.app import db
+from api.models import (
+    Manifiesto, DetalleManifiesto, ReservaStock, ManifiestoArchivado, DetalleManifiestoArchivado
+)
+
+
+def bundle_path(month):
+    """Bundle of the manifests delivered in `month` (YYYY_MM)"""
+    return os.path.join(current_app.config['DATA_PATH'], 'manifiestos', 'archivo', f"manifiestos_{month}.zip")
+
+
+def _document_paths(manifiesto):
+    """Files of a manifest that still exist on disk"""
+    qr_path = os.path.join(
+        current_app.config['DATA_PATH'], 'manifiestos', 'en_proceso', f"qr_{manifiesto.numero_manifiesto}.png"
+    )
+    paths = [manifiesto.pdf_path_proceso, manifiesto.pdf_path_final, qr_path]
+    return [path for path in paths if path and os.path.exists(path)]
+
+
+def _add_to_bundle(bundle, paths):
+    """
+    Add files to a ZIP bundle by name, keeping the members already in it.
+    The bundle is replaced atomically, so a crash leaves the previous one.
+    """
+    tmp_path = f"{bundle}.tmp"
+
+    with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as new_bundle:
+        names = set()
+        if os.path.exists(bundle):
+            with zipfile.ZipFile(bundle) as old_bundle:
+                for member in old_bundle.infolist():
+                    new_bundle.writestr(member, old_bundle.read(member))
+                    names.add(member.filename)
+
+        for path in paths:
+            name = os.path.basename(path)
+            # Already packed by a run that stopped before moving the rows
+            if name not in names:
+                new_bundle.write(path, arcname=name)
+                names.add(name)
+
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, bundle)
+
+
+def _move_rows(ids, bundle):
+    """Copy manifests and detalles to the archive tables and delete them. The caller commits."""
+    now = datetime.utcnow()
+
+    columns = [column.name for column in Manifiesto.__table__.columns]
+    db.session.execute(insert(ManifiestoArchivado).from_select(
+        columns + ['paquete', 'archived_at'],
+        select(
+            *[Manifiesto.__table__.c[name] for name in columns], literal(bundle), literal(now)
+        ).where(Manifiesto.id.in_(ids))
+    ))
+
+    columns = [column.name for column in DetalleManifiesto.__table__.columns]
+    db.session.execute(insert(DetalleManifiestoArchivado).from_select(
+        columns,
+        select(*[DetalleManifiesto.__table__.c[name] for name in columns]).where(
+            DetalleManifiesto.manifiesto_id.in_(ids)
+        )
+    ))
+
+    # Confirmed holds of delivered manifests have no further use
+    ReservaStock.query.filter(ReservaStock.manifiesto_id.in_(ids)).delete(synchronize_session=False)
+    DetalleManifiesto.query.filter(DetalleManifiesto.manifiesto_id.in_(ids)).delete(synchronize_session=False)
+    Manifiesto.query.filter(Manifiesto.id.in_(ids)).delete(synchronize_session=False)
+
+
+def archive_manifests(days, batch_size=500):
+    """
+    Archive the manifests delivered more than `days` days ago.
+
+    Returns:
+        Number of manifests archived
+    """
+    limit = datetime.utcnow() - timedelta(days=days)
+    manifiestos = db.session.query(
+        Manifiesto.id, Manifiesto.numero_manifiesto, Manifiesto.fecha_entrega,
+        Manifiesto.pdf_path_proceso, Manifiesto.pdf_path_final
+    ).filter(
+        Manifiesto.estado == 'entregado',
+        Manifiesto.fecha_entrega < limit
+    ).order_by(Manifiesto.fecha_entrega, Manifiesto.id).all()
+
+    by_month = defaultdict(list)
+    for manifiesto in manifiestos:
+        by_month[manifiesto.fecha_entrega.strftime('%Y_%m')].append(manifiesto)
+
+    for month, items in by_month.items():
+        bundle = bundle_path(month)
+        paths = [path for manifiesto in items for path in _document_paths(manifiesto)]
+        _add_to_bundle(bundle, paths)
+
+        for start in range(0, len(items), batch_size):
+            _move_rows([manifiesto.id for manifiesto in items[start:start + batch_size]], bundle)
+            db.session.commit()
+
+        for path in paths:
+            os.remove(path)
+
+    return len(manifiestos)
+
+
+def read_archived_document(filename):
+    """
+    Contents of an archived manifest file (e.g. MAN-20250101-0001_final.pdf),
+    or None if no archived manifest has it.
+    """
+    numero = filename.removesuffix('.pdf').removesuffix('_final')
+    paquete = db.session.query(ManifiestoArchivado.paquete).filter_by(numero_manifiesto=numero).scalar()
+    if not paquete or not os.path.exists(paquete):
+        return None
+
+    with zipfile.ZipFile(paquete) as bundle:
+        try:
+            return bundle.read(filename)
+        except KeyError:
+            return None
@@ -0,0 +1,522 @@
+"""
+Incremental logical backups of the database under DATA_PATH/respaldos/db.
+
+A backup is a directory with gzip-compressed JSON-lines chunks per table
+and a respaldo.json manifest (written last, so a directory without it is an
+unfinished run) listing each chunk with its row count and SHA-256. A full
+backup starts a chain; each incremental backup only holds the rows changed
+since the previous backup of the chain, found with a watermark per table:
+
+- id: append-only tables (ledgers, labels, tombstones) export the rows above
+  the last id.
+- tiempo: mutable tables export the rows whose updated_at (archived_at for
+  the manifest archive) is past the last watermark.
+- padre: detail rows are exported with their parent manifest.
+- completa: small reference tables are exported whole every time.
+- archivado: rows of archived months (the archivo partitions, and the
+  rollup rows of those days, which cannot be rebuilt) never change, so each
+  month is exported once, by the first backup that sees it archived.
+
+Rows are only considered settled BACKUP_SETTLE_SECONDS after they were
+written, so a transaction still open while the backup runs is picked up by
+the next one; rows newer than that are exported anyway and simply exported
+again next time (restore upserts).
+
+Derived data is not backed up: the rollup rows of live days (rebuild with
+`flask resumir-movimientos --desde`), tabla_versiones, claves_idempotencia
+and eventos_outbox (a restore publishes no events).
+
+Restore verifies every checksum of the chain first, then replays the full
+backup and its increments in order, in one transaction: rows are upserted
+and the tombstones in eliminaciones are applied as deletes. The archivo
+partitions are recreated from particiones_archivadas, and rows of archived
+months exported from the live tables by older backups are removed from
+them. A chain with archived months can only be restored into PostgreSQL.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from collections import namedtuple
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import select, func, delete, text, MetaData, Table, Column, Date, DateTime, Numeric, Float
+from api.app import db
+from api.services.partition_service import PARTITIONED_TABLES, ARCHIVE_SCHEMA
+
+MANIFEST = 'respaldo.json'
+
+Tabla = namedtuple('Tabla', ['nombre', 'estrategia', 'columna', 'padre', 'clave'])
+
+# In restore order (parents before children)
+TABLES = (
+    Tabla('roles', 'completa', None, None, None),
+    Tabla('usuarios', 'tiempo', 'updated_at', None, None),
+    Tabla('categorias', 'completa', None, None, None),
+    Tabla('clientes', 'tiempo', 'updated_at', None, None),
+    Tabla('productos', 'tiempo', 'updated_at', None, None),
+    Tabla('etiquetas', 'id', 'created_at', None, None),
+    Tabla('movimientos', 'id', 'created_at', None, None),
+    Tabla('transformaciones', 'id', 'created_at', None, None),
+    Tabla('particiones_archivadas', 'completa', None, None, None),
+    Tabla('archivo.movimientos', 'archivado', 'created_at', None, None),
+    Tabla('archivo.transformaciones', 'archivado', 'created_at', None, None),
+    Tabla('movimientos_resumen_diario', 'archivado', 'fecha', None, None),
+    Tabla('manifiestos', 'tiempo', 'updated_at', None, None),
+    Tabla('detalle_manifiesto', 'padre', 'manifiesto_id', 'manifiestos', None),
+    Tabla('reservas_stock', 'tiempo', 'updated_at', None, None),
+    Tabla('manifiestos_archivo', 'tiempo', 'archived_at', None, None),
+    Tabla('detalle_manifiesto_archivo', 'padre', 'manifiesto_id', 'manifiestos_archivo', None),
+    Tabla('stock_snapshots', 'id', 'created_at', None, ('fecha', 'producto_id')),
+    Tabla('eliminaciones', 'id', 'deleted_at', None, None),
+)
+
+# Rows referencing a tombstoned row, deleted with it on restore
+_DEPENDENTS = {
+    'manifiestos': (('reservas_stock', 'manifiesto_id'), ('detalle_manifiesto', 'manifiesto_id')),
+    'productos': (('etiquetas', 'producto_id'), ('stock_snapshots', 'producto_id')),
+}
+
+
+class BackupError(Exception):
+    """Raised when a backup chain is missing, incomplete or corrupt"""
+
+
+def backup_root():
+    return os.path.join(current_app.config['DATA_PATH'], 'respaldos', 'db')
+
+
+def list_backups():
+    """Manifests of the finished backups, oldest first"""
+    root = backup_root()
+    if not os.path.isdir(root):
+        return []
+
+    backups = []
+    for nombre in sorted(os.listdir(root)):
+        path = os.path.join(root, nombre, MANIFEST)
+        if os.path.exists(path):
+            with open(path) as f:
+                backups.append(json.load(f))
+    return backups
+
+
+_archive_metadata = MetaData()
+
+
+def _table(nombre):
+    if nombre in db.metadata.tables:
+        return db.metadata.tables[nombre]
+
+    # archivo.movimientos, archivo.transformaciones: columns of the live table
+    if nombre not in _archive_metadata.tables:
+        schema, _, base = nombre.partition('.')
+        Table(base, _archive_metadata, *[
+            Column(column.name, column.type, primary_key=column.primary_key)
+            for column in db.metadata.tables[base].columns
+        ], schema=schema)
+    return _archive_metadata.tables[nombre]
+
+
+def _archived_until(connection):
+    table = _table('particiones_archivadas')
+    return connection.execute(select(func.max(table.c.hasta))).scalar()
+
+
+def _encode(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def _decoder(column):
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat
+    if isinstance(column.type, Date):
+        return date.fromisoformat
+    if isinstance(column.type, Numeric) and not isinstance(column.type, Float):
+        return Decimal
+    return None
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _window(connection, tabla, previous, full, cutoff):
+    """
+    Conditions selecting the rows of `tabla` to export, and its new watermark
+
+    Returns:
+        Tuple (conditions, watermark); conditions is None when there is
+        nothing to export
+    """
+    table = _table(tabla.nombre)
+
+    if tabla.estrategia == 'completa':
+        return [], None
+
+    if tabla.estrategia == 'archivado':
+        last = None if full else previous.get(tabla.nombre)
+        hasta = _archived_until(connection)
+        if hasta is None or (last is not None and hasta.isoformat() <= last):
+            return None, last
+        if tabla.nombre.startswith(f"{ARCHIVE_SCHEMA}.") and connection.dialect.name != 'postgresql':
+            return None, last
+
+        column = table.c[tabla.columna]
+        bound = (lambda day: datetime.combine(day, time.min)) if isinstance(column.type, DateTime) else (lambda day: day)
+        conditions = [column < bound(hasta)]
+        if last is not None:
+            conditions.append(column >= bound(date.fromisoformat(last)))
+        return conditions, hasta.isoformat()
+
+    if tabla.estrategia == 'padre':
+        parent = next(t for t in TABLES if t.nombre == tabla.padre)
+        parent_conditions, _ = _window(connection, parent, previous, full, cutoff)
+        if not parent_conditions:
+            return [], None
+        parent_table = _table(parent.nombre)
+        return [table.c[tabla.columna].in_(select(parent_table.c.id).where(*parent_conditions))], None
+
+    last = None if full else previous.get(tabla.nombre)
+
+    if tabla.estrategia == 'id':
+        settled = connection.execute(
+            select(func.max(table.c.id)).where(table.c[tabla.columna] <= cutoff)
+        ).scalar()
+        watermark = max(filter(None, (settled, last)), default=None)
+        return ([table.c.id > last] if last is not None else []), watermark
+
+    # tiempo
+    if last is None:
+        return [], cutoff.isoformat()
+    last = datetime.fromisoformat(last)
+    return [table.c[tabla.columna] > last], max(cutoff, last).isoformat()
+
+
+def _write_chunks(connection, tabla, conditions, directory, chunk_rows):
+    """Export the selected rows in gzip chunks. Returns the chunk entries."""
+    table = _table(tabla.nombre)
+    columns = [column.name for column in table.columns]
+    stmt = select(table).where(*conditions).order_by(*table.primary_key.columns)
+    result = connection.execute(stmt.execution_options(yield_per=chunk_rows))
+
+    chunks = []
+    for number, rows in enumerate(result.partitions(), start=1):
+        archivo = f"{tabla.nombre}_{number:05d}.jsonl.gz"
+        path = os.path.join(directory, archivo)
+        with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as f:
+            f.write(json.dumps({'columnas': columns}) + '\n')
+            for row in rows:
+                f.write(json.dumps(list(row), default=_encode, separators=(',', ':')) + '\n')
+        chunks.append({'tabla': tabla.nombre, 'archivo': archivo, 'filas': len(rows), 'sha256': _sha256(path)})
+    return chunks
+
+
+def create_backup(full=False, chunk_rows=50000, settle_seconds=60, max_increments=168):
+    """
+    Write a backup: incremental after the last backup of the current chain,
+    full if there is none, if `full` is set or if the chain already has
+    `max_increments` increments.
+
+    Returns:
+        The manifest of the new backup
+    """
+    backups = list_backups()
+    previous = backups[-1] if backups else None
+    if previous is not None and not full:
+        increments = sum(1 for backup in backups if backup['base'] == previous['base']) - 1
+        full = increments >= max_increments
+    full = full or previous is None
+
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=settle_seconds)
+    tipo = 'completo' if full else 'incremental'
+    nombre = f"{now:%Y%m%d_%H%M%S}_{tipo}"
+    directory = os.path.join(backup_root(), nombre)
+    os.makedirs(directory)
+
+    previous_watermarks = {} if full else previous['marcas']
+    watermarks = {}
+    chunks = []
+
+    try:
+        with db.engine.connect() as connection:
+            if connection.dialect.name == 'postgresql':
+                # One snapshot for every table
+                connection.execution_options(isolation_level='REPEATABLE READ')
+
+            for tabla in TABLES:
+                conditions, watermark = _window(connection, tabla, previous_watermarks, full, cutoff)
+                if watermark is not None:
+                    watermarks[tabla.nombre] = watermark
+                if conditions is None:
+                    continue
+                chunks.extend(_write_chunks(connection, tabla, conditions, directory, chunk_rows))
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    manifest = {
+        'nombre': nombre,
+        'tipo': tipo,
+        'base': nombre if full else previous['base'],
+        'anterior': None if full else previous['nombre'],
+        'creado': now.isoformat(),
+        'marcas': watermarks,
+        'archivos': chunks,
+    }
+    tmp_path = os.path.join(directory, f"{MANIFEST}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(directory, MANIFEST))
+    return manifest
+
+
+def run_scheduled_backup():
+    """Backup and prune with the configured settings"""
+    config = current_app.config
+    manifest = create_backup(
+        chunk_rows=config['BACKUP_CHUNK_ROWS'],
+        settle_seconds=config['BACKUP_SETTLE_SECONDS'],
+        max_increments=config['BACKUP_MAX_INCREMENTS']
+    )
+    prune_backups(config['BACKUP_KEEP_CHAINS'])
+    return manifest
+
+
+def prune_backups(keep_chains):
+    """
+    Delete the chains older than the newest `keep_chains`, and unfinished
+    backup directories other than the newest one.
+
+    Returns:
+        Names of the directories deleted
+    """
+    root = backup_root()
+    backups = list_backups()
+    bases = sorted({backup['base'] for backup in backups})
+    keep = set(bases[-keep_chains:]) if keep_chains else set(bases)
+    finished = {backup['nombre'] for backup in backups}
+
+    removed = []
+    names = sorted(os.listdir(root)) if os.path.isdir(root) else []
+    for nombre in names:
+        if nombre in finished:
+            backup = next(b for b in backups if b['nombre'] == nombre)
+            if backup['base'] in keep:
+                continue
+        elif nombre == names[-1]:
+            continue  # Possibly still being written
+        shutil.rmtree(os.path.join(root, nombre), ignore_errors=True)
+        removed.append(nombre)
+    return removed
+
+
+def chain(hasta=None):
+    """
+    Backups to replay to restore up to `hasta` (default: the newest), full
+    backup first.
+
+    Raises:
+        BackupError: If there is no backup or the chain has a gap
+    """
+    backups = list_backups()
+    if hasta is not None:
+        backups = backups[:next((i + 1 for i, b in enumerate(backups) if b['nombre'] == hasta), 0)]
+    if not backups:
+        raise BackupError(f"No existe el respaldo {hasta}" if hasta else "No hay respaldos")
+
+    target = backups[-1]
+    by_name = {backup['nombre']: backup for backup in backups}
+    result = [target]
+    while result[0]['anterior'] is not None:
+        anterior = by_name.get(result[0]['anterior'])
+        if anterior is None:
+            raise BackupError(f"Falta el respaldo {result[0]['anterior']} de la cadena")
+        result.insert(0, anterior)
+    return result
+
+
+def verify(backups):
+    """
+    Raises:
+        BackupError: If a chunk is missing or its checksum does not match
+    """
+    for backup in backups:
+        directory = os.path.join(backup_root(), backup['nombre'])
+        for chunk in backup['archivos']:
+            path = os.path.join(directory, chunk['archivo'])
+            if not os.path.exists(path):
+                raise BackupError(f"Falta {backup['nombre']}/{chunk['archivo']}")
+            if _sha256(path) != chunk['sha256']:
+                raise BackupError(f"Suma de verificación incorrecta en {backup['nombre']}/{chunk['archivo']}")
+
+
+def _conflict_columns(connection, tabla):
+    if tabla.clave:
+        return list(tabla.clave)
+    if connection.dialect.name == 'postgresql' and tabla.nombre.rpartition('.')[2] in PARTITIONED_TABLES:
+        # The primary key of a partitioned table includes the partition key
+        return ['id', 'created_at']
+    return [column.name for column in _table(tabla.nombre).primary_key.columns]
+
+
+def _upsert(connection, tabla, rows):
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    table = _table(tabla.nombre)
+    keys = _conflict_columns(connection, tabla)
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={column.name: stmt.excluded[column.name] for column in table.columns if column.name not in keys}
+    )
+    connection.execute(stmt, rows)
+
+
+def _read_chunk(path, table):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        columns = json.loads(f.readline())['columnas']
+        decoders = [_decoder(table.c[name]) for name in columns]
+        for line in f:
+            values = json.loads(line)
+            yield {
+                name: decoder(value) if decoder and value is not None else value
+                for name, decoder, value in zip(columns, decoders, values)
+            }
+
+
+def _create_archive_partitions(connection, nombre):
+    """Recreate the archivo partitions of a table listed in particiones_archivadas"""
+    tabla = nombre.partition('.')[2]
+    particiones = _table('particiones_archivadas')
+    rows = connection.execute(select(
+        particiones.c.nombre, particiones.c.desde, particiones.c.hasta
+    ).where(particiones.c.tabla == tabla)).all()
+    for particion, desde, hasta in rows:
+        # Names and bounds come from particiones_archivadas, written by partition_service
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.{particion} PARTITION OF {nombre} "
+            f"FOR VALUES FROM ('{desde}') TO ('{hasta}')"
+        ))
+
+
+def _replay(connection, backup, batch_size):
+    directory = os.path.join(backup_root(), backup['nombre'])
+    exported = {}
+    tombstones = []
+    restored = 0
+
+    for tabla in TABLES:
+        table = _table(tabla.nombre)
+
+        if tabla.estrategia == 'padre':
+            # The detail of an exported parent is replaced whole
+            parents = list(exported.get(tabla.padre, ()))
+            for start in range(0, len(parents), batch_size):
+                connection.execute(delete(table).where(
+                    table.c[tabla.columna].in_(parents[start:start + batch_size])
+                ))
+
+        if tabla.nombre.startswith(f"{ARCHIVE_SCHEMA}.") and any(
+            chunk['tabla'] == tabla.nombre for chunk in backup['archivos']
+        ):
+            _create_archive_partitions(connection, tabla.nombre)
+
+        ids = exported.setdefault(tabla.nombre, set())
+        for chunk in (c for c in backup['archivos'] if c['tabla'] == tabla.nombre):
+            rows = list(_read_chunk(os.path.join(directory, chunk['archivo']), table))
+            if 'id' in table.c:
+                ids.update(row['id'] for row in rows)
+
+            for start in range(0, len(rows), batch_size):
+                _upsert(connection, tabla, rows[start:start + batch_size])
+            restored += len(rows)
+
+            if tabla.nombre == 'eliminaciones':
+                tombstones.extend((row['tabla'], row['registro_id']) for row in rows)
+
+    tombstoned = {tabla.nombre for tabla in TABLES}
+    for nombre, registro_id in tombstones:
+        if nombre not in tombstoned:
+            continue
+        for dependent, column in _DEPENDENTS.get(nombre, ()):
+            dependent_table = _table(dependent)
+            connection.execute(delete(dependent_table).where(dependent_table.c[column] == registro_id))
+        table = _table(nombre)
+        connection.execute(delete(table).where(table.c.id == registro_id))
+
+    return restored
+
+
+def _reset_sequences(connection):
+    """Move the id sequences past the restored rows (PostgreSQL)"""
+    if connection.dialect.name != 'postgresql':
+        return
+    for tabla in TABLES:
+        if '.' in tabla.nombre or 'id' not in _table(tabla.nombre).c:
+            continue
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{tabla.nombre}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {tabla.nombre}), 0) + 1, false) "
+            f"WHERE pg_get_serial_sequence('{tabla.nombre}', 'id') IS NOT NULL"
+        ))
+
+
+def restore(hasta=None, force=False, batch_size=1000):
+    """
+    Restore the chain ending at `hasta` (default: the newest backup) into
+    the current database, which must have the schema loaded and no ledger
+    rows unless `force` is set.
+
+    Returns:
+        List of (backup name, rows restored)
+
+    Raises:
+        BackupError: If the chain is incomplete or corrupt, or the database is not empty
+    """
+    backups = chain(hasta)
+    verify(backups)
+
+    result = []
+    with db.engine.begin() as connection:
+        archived = any(
+            chunk['tabla'].startswith(f"{ARCHIVE_SCHEMA}.") for backup in backups for chunk in backup['archivos']
+        )
+        if archived and connection.dialect.name != 'postgresql':
+            raise BackupError("La cadena incluye meses archivados; solo puede restaurarse en PostgreSQL")
+
+        if not force:
+            for nombre in ('productos', 'movimientos'):
+                table = _table(nombre)
+                if connection.execute(select(select(table.c.id).limit(1).exists())).scalar():
+                    raise BackupError(f"La base de datos no está vacía ({nombre}); use --forzar para restaurar encima")
+
+        for backup in backups:
+            result.append((backup['nombre'], _replay(connection, backup, batch_size)))
+
+        # Archived months exported from the live tables before they were archived
+        hasta = _archived_until(connection)
+        if hasta is not None and connection.dialect.name == 'postgresql':
+            for nombre in PARTITIONED_TABLES:
+                table = _table(nombre)
+                connection.execute(delete(table).where(table.c.created_at < datetime.combine(hasta, time.min)))
+
+        _reset_sequences(connection)
+
+    return result
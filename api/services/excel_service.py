@@ -1,7 +1,8 @@
-import pandas as pd
 import os
 from datetime import datetime
+from api.utils.metrics import timed
 
+@timed('excel')
 def generate_movements_excel(movimientos_data, output_path):
     """
     Generate Excel report for movements.
@@ -13,6 +14,9 @@ def generate_movements_excel(movimientos_data, output_path):
     Returns:
         Boolean indicating success
     """
+    # Imported on first use to keep worker startup light
+    import pandas as pd
+
     try:
         # Ensure directory exists
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -56,6 +60,7 @@ def generate_movements_excel(movimientos_data, output_path):
         print(f"Error generating Excel report: {e}")
         return False
 
+@timed('excel')
 def generate_deliveries_excel(manifiestos_data, output_path):
     """
     Generate Excel report for deliveries (manifests).
@@ -67,6 +72,9 @@ def generate_deliveries_excel(manifiestos_data, output_path):
     Returns:
         Boolean indicating success
     """
+    # Imported on first use to keep worker startup light
+    import pandas as pd
+
     try:
         # Ensure directory exists
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -109,3 +117,128 @@ def generate_deliveries_excel(manifiestos_data, output_path):
     except Exception as e:
         print(f"Error generating deliveries Excel: {e}")
         return False
+
+def _stream_sheet(engine, index, stmt, batch_size, out, stop, snapshot):
+    """
+    Worker thread: run one sheet's query on its own connection and pass its
+    rows to the writer in batches. Sends (index, None) when done, or
+    (index, exception) if the query fails.
+    """
+    import queue
+
+    def put(item):
+        # Wait for room in the queue, unless the writer gave up
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    try:
+        with engine.connect() as connection:
+            if snapshot:
+                # Same view of the data as the other sheets
+                connection.execution_options(isolation_level='REPEATABLE READ')
+                connection.exec_driver_sql(f"SET TRANSACTION SNAPSHOT '{snapshot}'")
+
+            # yield_per streams from a server-side cursor on PostgreSQL
+            result = connection.execute(stmt.execution_options(yield_per=batch_size))
+            for rows in result.partitions():
+                if not put((index, rows)):
+                    return
+        put((index, None))
+    except Exception as e:
+        put((index, e))
+
+
+@timed('excel')
+def generate_consolidated_excel(engine, sheets, output_path, batch_size=5000):
+    """
+    Generate one workbook with a sheet per query, running the queries
+    concurrently on separate connections.
+
+    Rows are written as they arrive through a bounded queue into a
+    write-only workbook, so memory stays around a few batches per sheet
+    whatever the size of the reports. On PostgreSQL all the queries read
+    the same exported snapshot, so the sheets agree with each other.
+
+    Args:
+        engine: SQLAlchemy engine to open the connections from
+        sheets: List of (title, headers, statement) in sheet order
+        output_path: Path where to save the Excel file
+        batch_size: Rows fetched per batch
+
+    Raises:
+        Exception: The first error raised by a query
+    """
+    import queue
+    import threading
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    workbook = Workbook(write_only=True)
+    worksheets = []
+    for title, headers, _ in sheets:
+        worksheet = workbook.create_sheet(title)
+        worksheet.freeze_panes = 'A2'
+        for position, header in enumerate(headers, start=1):
+            worksheet.column_dimensions[get_column_letter(position)].width = min(max(len(header) + 2, 14), 50)
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(worksheet, value=header)
+            cell.font = Font(bold=True)
+            cell.fill = PatternFill('solid', fgColor='DBEAFE')
+            header_cells.append(cell)
+        worksheet.append(header_cells)
+        worksheets.append(worksheet)
+
+    out = queue.Queue(maxsize=2 * len(sheets))
+    stop = threading.Event()
+
+    snapshot_connection = None
+    snapshot = None
+    if engine.dialect.name == 'postgresql':
+        # Held open until every worker has imported the snapshot
+        snapshot_connection = engine.connect()
+        snapshot_connection.execution_options(isolation_level='REPEATABLE READ')
+        snapshot = snapshot_connection.exec_driver_sql("SELECT pg_export_snapshot()").scalar()
+
+    workers = [
+        threading.Thread(
+            target=_stream_sheet, args=(engine, index, stmt, batch_size, out, stop, snapshot), daemon=True
+        )
+        for index, (_, _, stmt) in enumerate(sheets)
+    ]
+    tmp_path = f"{output_path}.tmp"
+
+    try:
+        for worker in workers:
+            worker.start()
+
+        pending = len(sheets)
+        while pending:
+            index, payload = out.get()
+            if payload is None:
+                pending -= 1
+            elif isinstance(payload, Exception):
+                raise payload
+            else:
+                for row in payload:
+                    worksheets[index].append(tuple(row))
+
+        workbook.save(tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+        if snapshot_connection is not None:
+            snapshot_connection.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,152 @@
+"""
+Product genealogy: the transformations a product came from (ascendencia)
+and the ones it went into (descendencia), walked with recursive CTEs in a
+single statement.
+
+Graphs are cached per (producto, depth) and keyed by the newest
+transformation id touching the cached subgraph: a new transformation on any
+of its products raises that id and invalidates the entry, and checking it
+is one indexed MAX() instead of the walk.
+"""
+import threading
+from collections import OrderedDict
+from sqlalchemy import select, literal, union_all, or_, func, table, column
+from api.app import db
+from api.models import Producto, Transformacion
+
+MAX_DEPTH = 50
+CACHE_SIZE = 256
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _transformations():
+    """
+    Source of the walk: the live table, plus the months moved to the
+    archivo schema on PostgreSQL (see partition_service)
+    """
+    t = Transformacion.__table__
+    columns = ('id', 'producto_origen_id', 'producto_destino_id', 'cantidad', 'tipo_transformacion', 'created_at')
+    live = select(*[t.c[name] for name in columns])
+    if db.engine.dialect.name != 'postgresql':
+        return live.cte('transformaciones_todas')
+
+    archived = table('transformaciones', *[column(name) for name in columns], schema='archivo')
+    return union_all(live, select(archived)).cte('transformaciones_todas')
+
+
+def _walk(producto_id, depth):
+    """
+    Statement returning (direccion, nivel, transformation columns...) for the
+    transformations up to `depth` hops away, in both directions
+    """
+    t = _transformations()
+
+    # UNION (not UNION ALL) drops repeated (edge, level) rows, which keeps
+    # diamonds and cycles bounded by edges x depth
+    up = select(
+        t.c.id, t.c.producto_origen_id.label('producto_id'), literal(1).label('nivel')
+    ).where(t.c.producto_destino_id == producto_id).cte('ascendencia', recursive=True)
+    up = up.union(select(
+        t.c.id, t.c.producto_origen_id, up.c.nivel + 1
+    ).join(up, t.c.producto_destino_id == up.c.producto_id).where(up.c.nivel < depth))
+
+    down = select(
+        t.c.id, t.c.producto_destino_id.label('producto_id'), literal(1).label('nivel')
+    ).where(t.c.producto_origen_id == producto_id).cte('descendencia', recursive=True)
+    down = down.union(select(
+        t.c.id, t.c.producto_destino_id, down.c.nivel + 1
+    ).join(down, t.c.producto_origen_id == down.c.producto_id).where(down.c.nivel < depth))
+
+    edges = union_all(
+        select(literal('ascendencia').label('direccion'), up.c.id, func.min(up.c.nivel).label('nivel')).group_by(up.c.id),
+        select(literal('descendencia').label('direccion'), down.c.id, func.min(down.c.nivel).label('nivel')).group_by(down.c.id),
+    ).subquery('aristas')
+
+    return select(
+        edges.c.direccion, edges.c.nivel, t.c.id, t.c.producto_origen_id, t.c.producto_destino_id,
+        t.c.cantidad, t.c.tipo_transformacion, t.c.created_at
+    ).join(t, t.c.id == edges.c.id).order_by(edges.c.nivel, t.c.id)
+
+
+def _latest_transformation(producto_ids):
+    """Newest live transformation id touching any of the products"""
+    return db.session.query(func.max(Transformacion.id)).filter(or_(
+        Transformacion.producto_origen_id.in_(producto_ids),
+        Transformacion.producto_destino_id.in_(producto_ids)
+    )).scalar()
+
+
+def _build(producto, depth):
+    # One level more than requested tells whether the graph was cut
+    rows = db.session.execute(_walk(producto.id, depth + 1)).all()
+
+    producto_ids = {producto.id}
+    truncado = False
+    result = {'ascendencia': [], 'descendencia': []}
+
+    for row in rows:
+        if row.nivel > depth:
+            truncado = True
+            continue
+        producto_ids.update((row.producto_origen_id, row.producto_destino_id))
+        result[row.direccion].append({
+            'id': row.id,
+            'nivel': row.nivel,
+            'producto_origen_id': row.producto_origen_id,
+            'producto_destino_id': row.producto_destino_id,
+            'cantidad': float(row.cantidad) if row.cantidad else 0.0,
+            'tipo_transformacion': row.tipo_transformacion,
+            'created_at': row.created_at
+        })
+
+    return {
+        'producto_id': producto.id,
+        'profundidad': depth,
+        'truncado': truncado,
+        **result
+    }, producto_ids
+
+
+def genealogy(producto, depth):
+    """
+    Transformation graph around a product. The graph comes from the cache
+    when still valid; the products in it are read fresh.
+
+    Returns:
+        Tuple (payload, version); version changes whenever the payload
+        does (usable for an ETag)
+    """
+    key = (producto.id, depth)
+    entry = _cache.get(key)
+
+    if entry is not None and _latest_transformation(entry[2]) == entry[0]:
+        latest, graph, producto_ids = entry
+        with _cache_lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+    else:
+        graph, producto_ids = _build(producto, depth)
+        latest = _latest_transformation(producto_ids)
+        with _cache_lock:
+            _cache[key] = (latest, graph, producto_ids)
+            _cache.move_to_end(key)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    productos = db.session.query(
+        Producto.id, Producto.nombre, Producto.estado, Producto.medida, Producto.updated_at
+    ).filter(Producto.id.in_(producto_ids)).order_by(Producto.id).all()
+
+    payload = {
+        **graph,
+        'productos': [{
+            'id': row.id,
+            'nombre': row.nombre,
+            'estado': row.estado,
+            'medida': row.medida
+        } for row in productos]
+    }
+    version = (latest, max((row.updated_at for row in productos if row.updated_at), default=None))
+    return payload, version
@@ -0,0 +1,166 @@
+"""
+Point-in-time stock from the ledger.
+
+productos.cantidad only holds the current value. The ledger (movimientos
+and transformaciones) records every change, and stock_snapshots keeps the
+closing stock of each product per day. The stock at any instant is the
+latest snapshot before it plus the ledger entries since that snapshot, so a
+query reads one day of ledger (or the days since the last snapshot), never
+the whole history.
+
+Replay rules: 'entrada' adds, 'salida' subtracts, 'ajuste' sets the absolute
+quantity, and a transformation subtracts from its origin and adds to its
+destination.
+
+Months moved to the archive schema (see partition_service) leave a snapshot
+at their end, so instants after the archived months are still answered from
+the live tables; earlier instants are rejected.
+"""
+import heapq
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from sqlalchemy import select, func, or_
+from api.app import db
+from api.models import Producto, Movimiento, Transformacion, StockSnapshot
+from api.services.partition_service import archived_until
+
+SIGNS = {'entrada': 1, 'salida': -1}
+
+
+class HistoryArchivedError(Exception):
+    """Raised for instants whose ledger has been moved to the archive"""
+
+    def __init__(self, desde):
+        super().__init__(f"El historial anterior a {desde.isoformat()} está archivado")
+        self.desde = desde
+
+
+def closing_time(fecha):
+    """Instant a snapshot of `fecha` refers to: midnight (UTC) after that day"""
+    return datetime.combine(fecha + timedelta(days=1), time.min)
+
+
+def latest_checkpoint(hasta):
+    """Most recent snapshot date whose closing time is not after `hasta`, or None"""
+    return db.session.query(func.max(StockSnapshot.fecha)).filter(
+        StockSnapshot.fecha <= (hasta - timedelta(days=1)).date()
+    ).scalar()
+
+
+def _ledger_entries(desde, hasta, producto_ids=None):
+    """
+    Ledger entries in (desde, hasta], in time order.
+
+    Yields:
+        Tuples (created_at, producto_id, tipo, cantidad); a transformation
+        yields a 'salida' of its origin and an 'entrada' of its destination
+    """
+    movimientos = select(
+        Movimiento.created_at, Movimiento.producto_id, Movimiento.tipo, Movimiento.cantidad
+    ).where(Movimiento.created_at <= hasta).order_by(Movimiento.created_at, Movimiento.id)
+
+    transformaciones = select(
+        Transformacion.created_at, Transformacion.producto_origen_id,
+        Transformacion.producto_destino_id, Transformacion.cantidad
+    ).where(Transformacion.created_at <= hasta).order_by(Transformacion.created_at, Transformacion.id)
+
+    if desde is not None:
+        movimientos = movimientos.where(Movimiento.created_at > desde)
+        transformaciones = transformaciones.where(Transformacion.created_at > desde)
+
+    if producto_ids is not None:
+        movimientos = movimientos.where(Movimiento.producto_id.in_(producto_ids))
+        transformaciones = transformaciones.where(or_(
+            Transformacion.producto_origen_id.in_(producto_ids),
+            Transformacion.producto_destino_id.in_(producto_ids)
+        ))
+
+    def transformation_entries(rows):
+        for created_at, origen_id, destino_id, cantidad in rows:
+            yield created_at, origen_id, 'salida', cantidad
+            yield created_at, destino_id, 'entrada', cantidad
+
+    # Stream both tables; a first snapshot replays the full history
+    options = {'yield_per': 1000}
+    yield from heapq.merge(
+        db.session.execute(movimientos, execution_options=options),
+        transformation_entries(db.session.execute(transformaciones, execution_options=options)),
+        key=lambda entry: entry[0]
+    )
+
+
+def stock_at(hasta, producto_ids=None):
+    """
+    Stock per product at the instant `hasta` (naive UTC).
+
+    Args:
+        hasta: datetime
+        producto_ids: Optional list of product ids to restrict the query
+
+    Returns:
+        Tuple ({producto_id: Decimal}, checkpoint date or None); products
+        without stock history up to `hasta` are absent
+
+    Raises:
+        HistoryArchivedError: If `hasta` falls in an archived month
+    """
+    archivado = archived_until()
+    if archivado is not None and hasta < datetime.combine(archivado, time.min):
+        raise HistoryArchivedError(archivado)
+
+    checkpoint = latest_checkpoint(hasta)
+    stock = {}
+    desde = None
+
+    if checkpoint is not None:
+        query = db.session.query(StockSnapshot.producto_id, StockSnapshot.cantidad).filter(
+            StockSnapshot.fecha == checkpoint
+        )
+        if producto_ids is not None:
+            query = query.filter(StockSnapshot.producto_id.in_(producto_ids))
+        stock = {producto_id: cantidad for producto_id, cantidad in query}
+        desde = closing_time(checkpoint)
+
+    wanted = set(producto_ids) if producto_ids is not None else None
+
+    for _, producto_id, tipo, cantidad in _ledger_entries(desde, hasta, producto_ids):
+        if wanted is not None and producto_id not in wanted:
+            # The other side of a transformation of a requested product
+            continue
+        if tipo == 'ajuste':
+            stock[producto_id] = cantidad
+        elif tipo in SIGNS:
+            stock[producto_id] = stock.get(producto_id, Decimal('0')) + SIGNS[tipo] * cantidad
+
+    return stock, checkpoint
+
+
+def take_snapshot(fecha):
+    """
+    Write the closing stock of every product on `fecha`, replacing an
+    existing snapshot of that day. The caller commits.
+
+    Returns:
+        Number of products in the snapshot
+
+    Raises:
+        HistoryArchivedError: If the day is in (or closes) an archived month
+    """
+    archivado = archived_until()
+    if archivado is not None and closing_time(fecha) <= datetime.combine(archivado, time.min):
+        # Its replay would need the archived rows
+        raise HistoryArchivedError(archivado)
+
+    # Drop the old rows first, or they would be the checkpoint of the replay
+    db.session.query(StockSnapshot).filter_by(fecha=fecha).delete(synchronize_session=False)
+
+    stock, _ = stock_at(closing_time(fecha))
+    existing = {producto_id for (producto_id,) in db.session.query(Producto.id)}
+
+    snapshots = [
+        StockSnapshot(fecha=fecha, producto_id=producto_id, cantidad=cantidad)
+        for producto_id, cantidad in stock.items()
+        if producto_id in existing
+    ]
+    db.session.add_all(snapshots)
+    return len(snapshots)
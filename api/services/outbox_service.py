@@ -0,0 +1,295 @@
+"""
+Transactional outbox of inventory change events.
+
+Every path that changes stock (movements, transformations, product
+creation, manifest holds and state changes, reconciliation fixes) adds its
+events to eventos_outbox in the same transaction as the change, so an event
+exists if and only if the change committed. The relay (`flask
+publicar-eventos`) publishes pending events in id order, in batches, to a
+sink and then stamps publicado_at:
+
+- file: JSON lines appended to DATA_PATH/outbox/eventos_YYYYMMDD.jsonl
+- memory: kept in this process (MemorySink.eventos), for development and tests
+- webhook: the batch POSTed as JSON to OUTBOX_WEBHOOK_URL
+- 'module:Class': any class with a publish(eventos) method
+
+Delivery is at least once: a batch published but not yet stamped when the
+relay stops is published again, so consumers deduplicate by event id.
+Events of one product are in commit order, because every stock change
+holds the product's row lock while it writes its event.
+"""
+import json
+import logging
+import os
+import select
+import time
+import urllib.request
+from datetime import datetime, timedelta
+from importlib import import_module
+from flask import current_app
+from sqlalchemy import select as sql_select, update, delete
+from api.app import db
+from api.models import EventoOutbox
+
+CHANNEL = 'inventario_outbox'
+
+logger = logging.getLogger(__name__)
+
+
+def _number(value):
+    return round(float(value), 2) if value is not None else None
+
+
+def evento_row(tipo, clave, datos):
+    """Column values of an outbox row, for inserts outside the ORM session"""
+    return {
+        'tipo': tipo,
+        'clave': clave,
+        'datos': json.dumps(datos, separators=(',', ':'), default=str),
+        'created_at': datetime.utcnow(),
+        'intentos': 0,
+    }
+
+
+def record(tipo, clave, datos):
+    """Add an event to the current transaction. The caller commits."""
+    db.session.add(EventoOutbox(**evento_row(tipo, clave, datos)))
+
+
+def stock_changed(producto, delta, motivo, referencia_id=None):
+    """
+    Stock event of a product, with its new quantity.
+
+    Args:
+        motivo: alta, movimiento, transformacion, manifiesto or reconciliacion
+        referencia_id: Id of the movimiento, transformacion or manifiesto
+    """
+    record('stock', f"producto:{producto.id}", {
+        'producto_id': producto.id,
+        'cantidad': _number(producto.cantidad),
+        'delta': _number(delta),
+        'motivo': motivo,
+        'referencia_id': referencia_id,
+    })
+
+
+def reservation_changed(reserva, estado):
+    """Hold event: activa (placed), confirmada (stock left) or liberada"""
+    record('reserva', f"producto:{reserva.producto_id}", {
+        'producto_id': reserva.producto_id,
+        'manifiesto_id': reserva.manifiesto_id,
+        'cantidad': _number(reserva.cantidad),
+        'estado': estado,
+    })
+
+
+def manifest_changed(manifiesto, estado_anterior, estado=None):
+    """
+    Manifest state event; estado_anterior is None for a new manifest.
+    `estado` overrides manifiesto.estado ('descartado' for a deleted manifest).
+    """
+    record('manifiesto', f"manifiesto:{manifiesto.id}", {
+        'manifiesto_id': manifiesto.id,
+        'numero_manifiesto': manifiesto.numero_manifiesto,
+        'estado': estado or manifiesto.estado,
+        'estado_anterior': estado_anterior,
+    })
+
+
+# ========== SINKS ==========
+
+class FileSink:
+    """Appends events as JSON lines to one file per day (UTC)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def publish(self, eventos):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"eventos_{datetime.utcnow():%Y%m%d}.jsonl")
+        lines = ''.join(json.dumps(evento, separators=(',', ':')) + '\n' for evento in eventos)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class MemorySink:
+    """Keeps the published events in this process"""
+
+    def __init__(self):
+        self.eventos = []
+
+    def publish(self, eventos):
+        self.eventos.extend(eventos)
+
+
+class WebhookSink:
+    """POSTs each batch as {"eventos": [...]}; any non-2xx status fails the batch"""
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def publish(self, eventos):
+        body = json.dumps({'eventos': eventos}, separators=(',', ':')).encode('utf-8')
+        request = urllib.request.Request(
+            self.url, data=body, method='POST', headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass  # HTTPError is raised for error statuses
+
+
+def make_sink(name=None):
+    """Sink named by OUTBOX_SINK (or `name`): file, memory, webhook or 'module:Class'"""
+    config = current_app.config
+    name = name or config['OUTBOX_SINK']
+
+    if name == 'file':
+        return FileSink(os.path.join(config['DATA_PATH'], 'outbox'))
+    if name == 'memory':
+        return MemorySink()
+    if name == 'webhook':
+        if not config['OUTBOX_WEBHOOK_URL']:
+            raise ValueError("OUTBOX_WEBHOOK_URL no está configurado")
+        return WebhookSink(config['OUTBOX_WEBHOOK_URL'])
+    if ':' in name:
+        module, _, attr = name.partition(':')
+        return getattr(import_module(module), attr)()
+    raise ValueError(f"Destino de eventos desconocido: {name}")
+
+
+# ========== RELAY ==========
+
+def _envelope(evento):
+    return {
+        'id': evento.id,
+        'tipo': evento.tipo,
+        'clave': evento.clave,
+        'created_at': evento.created_at.isoformat() + 'Z',
+        'datos': json.loads(evento.datos),
+    }
+
+
+def relay_batch(sink, batch_size=500):
+    """
+    Publish the oldest pending events and stamp them, in one transaction.
+
+    On PostgreSQL the batch is claimed with FOR UPDATE SKIP LOCKED, so
+    several relays never publish the same events (a single relay per sink
+    keeps them in order). If the sink fails, the batch stays pending with
+    its attempt count and error, and is retried first next time.
+
+    Returns:
+        Number of events published
+    """
+    stmt = sql_select(EventoOutbox).where(
+        EventoOutbox.publicado_at.is_(None)
+    ).order_by(EventoOutbox.id).limit(batch_size)
+    if db.engine.dialect.name == 'postgresql':
+        stmt = stmt.with_for_update(skip_locked=True)
+
+    eventos = db.session.execute(stmt).scalars().all()
+    if not eventos:
+        db.session.rollback()
+        return 0
+
+    ids = [evento.id for evento in eventos]
+    try:
+        sink.publish([_envelope(evento) for evento in eventos])
+    except Exception as e:
+        db.session.execute(update(EventoOutbox).where(EventoOutbox.id.in_(ids)).values(
+            intentos=EventoOutbox.intentos + 1, ultimo_error=str(e)[:1000]
+        ))
+        db.session.commit()
+        raise
+
+    db.session.execute(update(EventoOutbox).where(EventoOutbox.id.in_(ids)).values(
+        publicado_at=datetime.utcnow(), intentos=EventoOutbox.intentos + 1, ultimo_error=None
+    ))
+    db.session.commit()
+    return len(eventos)
+
+
+def relay_pending(sink, batch_size=500):
+    """Publish batches until no events are pending. Returns the number published."""
+    total = 0
+    while True:
+        published = relay_batch(sink, batch_size)
+        total += published
+        if published < batch_size:
+            return total
+
+
+def purge_published(hours):
+    """Delete events published more than `hours` ago. Returns the number deleted."""
+    result = db.session.execute(delete(EventoOutbox).where(
+        EventoOutbox.publicado_at < datetime.utcnow() - timedelta(hours=hours)
+    ))
+    db.session.commit()
+    return result.rowcount
+
+
+class _Waiter:
+    """
+    Sleeps until the next relay round: on PostgreSQL, until a NOTIFY on
+    CHANNEL (sent when events commit) or the timeout; otherwise the timeout.
+    """
+
+    def __init__(self, engine):
+        self.connection = None
+        if engine.dialect.name != 'postgresql':
+            return
+        connection = engine.raw_connection()
+        connection.detach()
+        dbapi_connection = connection.driver_connection
+        dbapi_connection.autocommit = True
+        with dbapi_connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+        self.connection = connection
+
+    def wait(self, timeout):
+        if self.connection is None:
+            time.sleep(timeout)
+            return
+        dbapi_connection = self.connection.driver_connection
+        ready, _, _ = select.select([dbapi_connection], [], [], timeout)
+        if ready:
+            dbapi_connection.poll()
+            dbapi_connection.notifies.clear()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+def run_relay(sink, batch_size=500, poll_seconds=5.0, retention_hours=168):
+    """
+    Relay loop of `flask publicar-eventos --continuo`. Failed batches are
+    retried with a backoff up to poll_seconds; published events are purged
+    after retention_hours (0 keeps them).
+    """
+    waiter = _Waiter(db.engine)
+    backoff = 0.5
+    last_purge = 0.0
+    try:
+        while True:
+            try:
+                published = relay_pending(sink, batch_size)
+                if published:
+                    logger.info("%d eventos publicados", published)
+                backoff = 0.5
+            except Exception:
+                db.session.rollback()
+                logger.exception("Publicación de eventos fallida; reintentando")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, poll_seconds)
+                continue
+
+            if retention_hours and time.time() - last_purge > 3600:
+                purge_published(retention_hours)
+                last_purge = time.time()
+
+            waiter.wait(poll_seconds)
+    finally:
+        waiter.close()
@@ -0,0 +1,183 @@
+"""
+Monthly range partitions of the ledger tables (PostgreSQL only).
+
+movimientos and transformaciones are partitioned by created_at, one
+partition per month (movimientos_2026_03 holds March 2026) plus a DEFAULT
+partition that catches rows outside the created months. Partitions are
+created ahead of time by `flask crear-particiones`.
+
+Old partitions are detached and moved to the archive schema, where they are
+attached to archivo.movimientos / archivo.transformaciones so they remain
+queryable. Before a month leaves the live tables, the closing stock of its
+last day is saved in stock_snapshots: point-in-time queries and the
+reconciliation start from that snapshot and never need the archived rows.
+"""
+import re
+from datetime import date, timedelta
+from sqlalchemy import text
+from api.app import db
+from api.models import StockSnapshot, ParticionArchivada
+
+PARTITIONED_TABLES = ('movimientos', 'transformaciones')
+ARCHIVE_SCHEMA = 'archivo'
+
+_BOUND = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})[^']*'\) TO \('(\d{4}-\d{2}-\d{2})[^']*'\)")
+
+
+class PartitionError(Exception):
+    """Raised when the database does not support partition maintenance"""
+
+
+def add_months(fecha, months):
+    """First day of the month `months` after the month of `fecha`"""
+    year, month = divmod(fecha.month - 1 + months, 12)
+    return date(fecha.year + year, month + 1, 1)
+
+
+def partition_name(tabla, desde):
+    return f"{tabla}_{desde:%Y_%m}"
+
+
+def _check_dialect():
+    if db.engine.dialect.name != 'postgresql':
+        raise PartitionError("El particionado solo está disponible en PostgreSQL")
+
+
+def list_partitions(tabla, schema='public'):
+    """
+    Monthly partitions of a table, oldest first (the DEFAULT partition is excluded).
+
+    Returns:
+        List of (nombre, desde, hasta) tuples
+    """
+    rows = db.session.execute(text("""
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        JOIN pg_namespace ns ON ns.oid = parent.relnamespace
+        WHERE parent.relname = :tabla AND ns.nspname = :schema
+    """), {'tabla': tabla, 'schema': schema})
+
+    partitions = []
+    for nombre, bound in rows:
+        match = _BOUND.search(bound)
+        if match:
+            partitions.append((nombre, date.fromisoformat(match[1]), date.fromisoformat(match[2])))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(tabla, desde):
+    """
+    Create the partition of the month starting at `desde`. Rows of that
+    month already in the DEFAULT partition are moved into it. Commits.
+    """
+    hasta = add_months(desde, 1)
+    nombre = partition_name(tabla, desde)
+    default = f"{tabla}_default"
+    bounds = {'desde': desde, 'hasta': hasta}
+    in_month = "created_at >= :desde AND created_at < :hasta"
+    # Bound values are dates built here, not user input
+    create = f"CREATE TABLE {nombre} PARTITION OF {tabla} FOR VALUES FROM ('{desde}') TO ('{hasta}')"
+
+    pending = db.session.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_month})"), bounds
+    ).scalar()
+
+    if pending:
+        # A new partition cannot overlap rows held by DEFAULT: take DEFAULT
+        # out, create the month and route its rows through the parent
+        db.session.execute(text(f"ALTER TABLE {tabla} DETACH PARTITION {default}"))
+        db.session.execute(text(create))
+        db.session.execute(text(f"INSERT INTO {tabla} SELECT * FROM {default} WHERE {in_month}"), bounds)
+        db.session.execute(text(f"DELETE FROM {default} WHERE {in_month}"), bounds)
+        db.session.execute(text(f"ALTER TABLE {tabla} ATTACH PARTITION {default} DEFAULT"))
+    else:
+        db.session.execute(text(create))
+
+    db.session.commit()
+    return nombre
+
+
+def create_partitions(months_ahead, today=None):
+    """
+    Create the missing monthly partitions from the current month to
+    `months_ahead` months ahead, plus the months of any rows sitting in the
+    DEFAULT partitions (e.g. after loading old data).
+
+    Returns:
+        Names of the partitions created
+    """
+    _check_dialect()
+    current = add_months(today or date.today(), 0)
+    created = []
+
+    for tabla in PARTITIONED_TABLES:
+        existing = {desde for _, desde, _ in list_partitions(tabla)}
+        stray = db.session.execute(text(
+            f"SELECT DISTINCT date_trunc('month', created_at)::date FROM {tabla}_default "
+            "WHERE created_at IS NOT NULL"
+        )).scalars().all()
+
+        months = set(stray) | {add_months(current, offset) for offset in range(months_ahead + 1)}
+        archived = {desde for _, desde, _ in list_partitions(tabla, ARCHIVE_SCHEMA)}
+
+        for desde in sorted(months - existing - archived):
+            created.append(create_partition(tabla, desde))
+
+    return created
+
+
+def archived_until():
+    """
+    Start of the live ledger: the end of the newest archived month, or None
+    if nothing has been archived.
+    """
+    return db.session.query(db.func.max(ParticionArchivada.hasta)).scalar()
+
+
+def archive_partitions(after_months, today=None):
+    """
+    Move the monthly partitions that ended more than `after_months` months
+    ago to the archive schema, oldest first. The closing stock of each
+    month's last day is saved (if missing) before its rows leave.
+
+    Returns:
+        Names of the partitions archived
+    """
+    from api.services.ledger_service import take_snapshot
+
+    _check_dialect()
+    limit = add_months(today or date.today(), -after_months)
+
+    # Months to archive across both tables, so they leave together
+    months = sorted({
+        (desde, hasta)
+        for tabla in PARTITIONED_TABLES
+        for _, desde, hasta in list_partitions(tabla)
+        if hasta <= limit
+    })
+
+    archived = []
+    for desde, hasta in months:
+        fecha = hasta - timedelta(days=1)
+        if not db.session.query(StockSnapshot.query.filter_by(fecha=fecha).exists()).scalar():
+            take_snapshot(fecha)
+            db.session.commit()
+
+        for tabla in PARTITIONED_TABLES:
+            nombre = partition_name(tabla, desde)
+            if nombre not in {name for name, _, _ in list_partitions(tabla)}:
+                continue
+
+            db.session.execute(text(f"ALTER TABLE {tabla} DETACH PARTITION {nombre}"))
+            db.session.execute(text(f"ALTER TABLE {nombre} SET SCHEMA {ARCHIVE_SCHEMA}"))
+            db.session.execute(text(
+                f"ALTER TABLE {ARCHIVE_SCHEMA}.{tabla} ATTACH PARTITION {ARCHIVE_SCHEMA}.{nombre} "
+                f"FOR VALUES FROM ('{desde}') TO ('{hasta}')"
+            ))
+            db.session.add(ParticionArchivada(tabla=tabla, nombre=nombre, desde=desde, hasta=hasta))
+            db.session.commit()
+            archived.append(nombre)
+
+    return archived
@@ -1,13 +1,8 @@
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 import os
 import base64
 import io
 from datetime import datetime
+from api.utils.metrics import timed
 
 def decode_base64_image(base64_string):
     """
@@ -32,6 +27,7 @@ def decode_base64_image(base64_string):
         print(f"Error decoding base64 image: {e}")
         return None
 
+@timed('pdf')
 def generate_manifest_pdf(manifiesto, cliente, detalles, qr_code_path, output_path, is_final=False):
     """
     Generate PDF for delivery manifest.
@@ -47,6 +43,14 @@ def generate_manifest_pdf(manifiesto, cliente, detalles, qr_code_path, output_pa
     Returns:
         Boolean indicating success
     """
+    # reportlab is imported on first use to keep worker startup light
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+    from reportlab.lib.enums import TA_CENTER
+
     try:
         # Ensure directory exists
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -1,8 +1,8 @@
-import qrcode
 import json
 import os
 from datetime import datetime
 import secrets
+from api.utils.metrics import timed
 
 def generate_codigo_qr(prefix="PROD"):
     """
@@ -21,6 +21,7 @@ def generate_codigo_qr(prefix="PROD"):
     random_hex = secrets.token_hex(2).upper()  # 4 hex characters
     return f"{prefix}-{timestamp}-{random_hex}"
 
+@timed('qr')
 def generate_qr_image(content_data, file_path):
     """
     Generate QR code image and save to file.
@@ -32,6 +33,9 @@ def generate_qr_image(content_data, file_path):
     Returns:
         Boolean indicating success
     """
+    # Imported on first use to keep worker startup light
+    import qrcode
+
     try:
         # Ensure directory exists
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
@@ -0,0 +1,238 @@
+"""
+Stock reconciliation: productos.cantidad against the ledger.
+
+The expected stock of a product is its last 'ajuste' (or 0) plus the
+entradas and minus the salidas recorded after it, where a transformation is
+a salida of its origin and an entrada of its destination (the replay rules
+of ledger_service, aggregated in SQL over the full history).
+
+Once months of ledger have been archived (see partition_service), the
+replay starts from the stock snapshot saved at the end of the archived
+months instead of 0.
+
+Work is split in product id ranges, so each product's whole ledger falls in
+one chunk, and the chunks run in worker processes. Workers only import
+SQLAlchemy (not the Flask app) and open their own engine.
+"""
+import os
+from datetime import datetime, time, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from sqlalchemy import (
+    create_engine, select, update, func, case, literal, and_, or_, tuple_, bindparam,
+    table, column, union_all, Date, DateTime
+)
+from sqlalchemy.pool import NullPool
+
+TOLERANCE = 0.005
+
+productos = table('productos', column('id'), column('cantidad'), column('updated_at'))
+movimientos = table(
+    'movimientos', column('id'), column('producto_id'), column('tipo'),
+    column('cantidad'), column('created_at', DateTime)
+)
+transformaciones = table(
+    'transformaciones', column('id'), column('producto_origen_id'),
+    column('producto_destino_id'), column('cantidad'), column('created_at', DateTime)
+)
+stock_snapshots = table('stock_snapshots', column('fecha', Date), column('producto_id'), column('cantidad'))
+particiones_archivadas = table('particiones_archivadas', column('hasta', Date))
+eventos_outbox = table(
+    'eventos_outbox', column('tipo'), column('clave'), column('datos'),
+    column('created_at', DateTime), column('intentos')
+)
+
+_engines = {}
+
+
+def _engine(database_uri):
+    """One engine per worker process"""
+    if database_uri not in _engines:
+        _engines[database_uri] = create_engine(database_uri, poolclass=NullPool)
+    return _engines[database_uri]
+
+
+def _expected_stock(lo, hi, corte=None):
+    """
+    Statement returning (id, cantidad, esperado) for products with lo <= id < hi.
+    With `corte` (first day of the live ledger) only later entries are
+    replayed, on top of the snapshot of the day before.
+    """
+    def in_range(col, created_at):
+        condition = and_(col >= lo, col < hi)
+        if corte is not None:
+            condition = and_(condition, created_at > datetime.combine(corte, time.min))
+        return condition
+
+    # Ledger entries as signed quantities; fuente orders movements before
+    # transformations with the same timestamp, as the replay does
+    ledger = union_all(
+        select(
+            movimientos.c.producto_id, movimientos.c.created_at, literal(0).label('fuente'),
+            movimientos.c.id,
+            case(
+                (movimientos.c.tipo == 'entrada', movimientos.c.cantidad),
+                (movimientos.c.tipo == 'salida', -movimientos.c.cantidad),
+                else_=0
+            ).label('delta')
+        ).where(in_range(movimientos.c.producto_id, movimientos.c.created_at)),
+        select(
+            transformaciones.c.producto_origen_id, transformaciones.c.created_at,
+            literal(1), transformaciones.c.id, -transformaciones.c.cantidad
+        ).where(in_range(transformaciones.c.producto_origen_id, transformaciones.c.created_at)),
+        select(
+            transformaciones.c.producto_destino_id, transformaciones.c.created_at,
+            literal(1), transformaciones.c.id, transformaciones.c.cantidad
+        ).where(in_range(transformaciones.c.producto_destino_id, transformaciones.c.created_at)),
+    ).subquery('ledger')
+
+    ranked = select(
+        movimientos.c.producto_id, movimientos.c.created_at, movimientos.c.id, movimientos.c.cantidad,
+        func.row_number().over(
+            partition_by=movimientos.c.producto_id,
+            order_by=(movimientos.c.created_at.desc(), movimientos.c.id.desc())
+        ).label('rn')
+    ).where(
+        movimientos.c.tipo == 'ajuste', in_range(movimientos.c.producto_id, movimientos.c.created_at)
+    ).subquery('ajustes')
+    ajuste = select(ranked).where(ranked.c.rn == 1).subquery('ultimo_ajuste')
+
+    after_ajuste = or_(
+        ajuste.c.producto_id.is_(None),
+        tuple_(ledger.c.created_at, ledger.c.fuente, ledger.c.id)
+        > tuple_(ajuste.c.created_at, literal(0), ajuste.c.id)
+    )
+
+    if corte is None:
+        base = func.coalesce(ajuste.c.cantidad, 0)
+        source = productos.outerjoin(ajuste, ajuste.c.producto_id == productos.c.id)
+        group = (ajuste.c.cantidad,)
+    else:
+        snapshot = select(stock_snapshots).where(
+            stock_snapshots.c.fecha == corte - timedelta(days=1)
+        ).subquery('snapshot')
+        base = func.coalesce(ajuste.c.cantidad, snapshot.c.cantidad, 0)
+        source = productos.outerjoin(ajuste, ajuste.c.producto_id == productos.c.id).outerjoin(
+            snapshot, snapshot.c.producto_id == productos.c.id
+        )
+        group = (ajuste.c.cantidad, snapshot.c.cantidad)
+
+    esperado = base + func.coalesce(func.sum(ledger.c.delta), 0)
+
+    return select(
+        productos.c.id, productos.c.cantidad, esperado.label('esperado')
+    ).select_from(
+        source.outerjoin(ledger, and_(ledger.c.producto_id == productos.c.id, after_ajuste))
+    ).where(
+        productos.c.id >= lo, productos.c.id < hi
+    ).group_by(
+        productos.c.id, productos.c.cantidad, *group
+    ).order_by(productos.c.id)
+
+
+def reconcile_range(database_uri, lo, hi, corte=None):
+    """
+    Products with lo <= id < hi whose stock differs from the ledger
+    (from `corte` on, see _expected_stock).
+
+    Returns:
+        List of (producto_id, cantidad, esperado) tuples; cantidad is the
+        stored value as read, esperado is rounded to 2 decimals
+    """
+    with _engine(database_uri).connect() as connection:
+        rows = connection.execute(_expected_stock(lo, hi, corte)).all()
+
+    return [
+        (producto_id, cantidad, round(float(esperado), 2))
+        for producto_id, cantidad, esperado in rows
+        if abs(float(cantidad) - float(esperado)) > TOLERANCE
+    ]
+
+
+def find_drift(database_uri, workers=None, chunk_size=5000):
+    """
+    Compare every product with its ledger, chunk by chunk in parallel.
+
+    Args:
+        database_uri: URL of the database (with credentials)
+        workers: Number of worker processes (default: CPU count)
+        chunk_size: Product ids per chunk
+
+    Returns:
+        List of (producto_id, cantidad, esperado), ordered by producto_id
+    """
+    engine = _engine(database_uri)
+    with engine.connect() as connection:
+        first, last = connection.execute(select(func.min(productos.c.id), func.max(productos.c.id))).one()
+        corte = connection.execute(select(func.max(particiones_archivadas.c.hasta))).scalar()
+
+    if first is None:
+        return []
+
+    ranges = [(lo, min(lo + chunk_size, last + 1)) for lo in range(first, last + 1, chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+
+    if workers <= 1:
+        chunks = [reconcile_range(database_uri, lo, hi, corte) for lo, hi in ranges]
+    else:
+        # spawn: workers must not inherit the parent's open connections
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as executor:
+            chunks = list(executor.map(
+                reconcile_range, [database_uri] * len(ranges), *zip(*ranges), [corte] * len(ranges)
+            ))
+
+    return [drift for chunk in chunks for drift in chunk]
+
+
+def fix_drift(connection, drifts, batch_size=500):
+    """
+    Set drifted products to their ledger stock, in batched UPDATEs. A
+    product whose stock changed since it was read is left alone (it will
+    be checked again on the next run). Each fixed product gets its stock
+    event in the outbox, in the batch's transaction.
+
+    Args:
+        connection: SQLAlchemy connection; each batch is committed
+        drifts: Result of find_drift()
+
+    Returns:
+        Number of products fixed
+    """
+    stmt = update(productos).where(
+        productos.c.id == bindparam('b_id'),
+        productos.c.cantidad == bindparam('b_cantidad')
+    ).values(cantidad=bindparam('b_esperado'), updated_at=func.now())
+
+    # Runs in the CLI process, with the app loaded
+    from api.services.outbox_service import evento_row
+
+    fixed = 0
+    for start in range(0, len(drifts), batch_size):
+        batch = drifts[start:start + batch_size]
+        result = connection.execute(stmt, [
+            {'b_id': producto_id, 'b_cantidad': cantidad, 'b_esperado': esperado}
+            for producto_id, cantidad, esperado in batch
+        ])
+
+        # Rows now at the expected stock were fixed by this batch (or set
+        # to the same value by a concurrent change, which has its own event)
+        actual = dict(connection.execute(select(productos.c.id, productos.c.cantidad).where(
+            productos.c.id.in_([producto_id for producto_id, _, _ in batch])
+        )).all())
+        eventos = [
+            evento_row('stock', f"producto:{producto_id}", {
+                'producto_id': producto_id,
+                'cantidad': round(float(esperado), 2),
+                'delta': round(float(esperado) - float(cantidad), 2),
+                'motivo': 'reconciliacion',
+                'referencia_id': None,
+            })
+            for producto_id, cantidad, esperado in batch
+            if producto_id in actual and abs(float(actual[producto_id]) - float(esperado)) < TOLERANCE
+        ]
+        if eventos:
+            connection.execute(eventos_outbox.insert(), eventos)
+
+        connection.commit()
+        fixed += result.rowcount
+    return fixed
@@ -0,0 +1,206 @@
+"""
+Stock reservations for manifests.
+
+A manifest in 'en_proceso' holds its quantities (reservas_stock, estado
+'activa') without touching productos.cantidad. The stock leaves the
+warehouse, with its 'salida' movements, when the manifest goes to
+'en_transito' or 'entregado', and the holds are released on cancel.
+
+Available stock = productos.cantidad - active holds. Every check that
+consumes stock must use available_quantity() with the product rows locked
+by lock_products(), so that holds and stock changes are serialized. State
+changes of a manifest run with its row locked by lock_manifest(), so that
+concurrent requests cannot confirm or release the same holds twice.
+
+Every hold, stock change and state change also writes its outbox events
+(see outbox_service) in the caller's transaction.
+"""
+from sqlalchemy import func
+from api.app import db
+from api.models import Producto, Movimiento, ReservaStock, Manifiesto
+from api.services import outbox_service
+
+ESTADOS_FINALES = ('entregado', 'cancelado')
+
+
+class InsufficientStockError(Exception):
+    """Raised when a hold exceeds the available stock"""
+
+    def __init__(self, detalles):
+        super().__init__(f"Stock insuficiente para: {', '.join(detalles)}")
+        self.detalles = detalles
+
+
+class InvalidTransitionError(Exception):
+    """Raised when a manifest cannot move to the requested estado"""
+
+
+def lock_products(producto_ids):
+    """
+    Load products with row locks (FOR UPDATE), always in id order so that
+    concurrent requests cannot deadlock. Products already in the session
+    are refreshed, so their cantidad is the locked one.
+
+    Returns:
+        Dictionary {producto_id: Producto}; missing ids are absent
+    """
+    ids = sorted(set(producto_ids))
+    if not ids:
+        return {}
+    productos = db.session.query(Producto).filter(
+        Producto.id.in_(ids)
+    ).order_by(Producto.id).with_for_update().populate_existing().all()
+    return {producto.id: producto for producto in productos}
+
+
+def lock_manifest(manifiesto_id):
+    """
+    Load a manifest with a row lock (FOR UPDATE), refreshed if already in
+    the session. Lock it before the products it holds.
+
+    Returns:
+        Manifiesto, or None if it does not exist
+    """
+    return db.session.query(Manifiesto).filter(
+        Manifiesto.id == manifiesto_id
+    ).with_for_update().populate_existing().first()
+
+
+def reserved_quantities(producto_ids):
+    """
+    Quantities held by active reservations.
+
+    Returns:
+        Dictionary {producto_id: float}; products without holds are absent
+    """
+    ids = list(set(producto_ids))
+    if not ids:
+        return {}
+    rows = db.session.query(
+        ReservaStock.producto_id, func.sum(ReservaStock.cantidad)
+    ).filter(
+        ReservaStock.producto_id.in_(ids),
+        ReservaStock.estado == 'activa'
+    ).group_by(ReservaStock.producto_id).all()
+    return {producto_id: float(total) for producto_id, total in rows}
+
+
+def available_quantity(producto):
+    """Stock of a product not held by in-process manifests"""
+    reserved = reserved_quantities([producto.id]).get(producto.id, 0.0)
+    return float(producto.cantidad) - reserved
+
+
+def reserve_stock(manifiesto, items):
+    """
+    Place holds for a manifest. Products must be locked with lock_products().
+
+    Args:
+        manifiesto: Flushed Manifiesto
+        items: Sequence of (Producto, cantidad) tuples; a product may repeat
+
+    Raises:
+        InsufficientStockError: If any product lacks available stock
+    """
+    reserved = reserved_quantities(producto.id for producto, _ in items)
+    errors = []
+
+    for producto, cantidad in items:
+        available = float(producto.cantidad) - reserved.get(producto.id, 0.0)
+        if available < cantidad:
+            errors.append(f"{producto.nombre} (disponible: {available:.2f}, requerido: {cantidad})")
+            continue
+
+        reserved[producto.id] = reserved.get(producto.id, 0.0) + cantidad
+        reserva = ReservaStock(
+            producto_id=producto.id,
+            manifiesto_id=manifiesto.id,
+            cantidad=cantidad,
+            estado='activa'
+        )
+        db.session.add(reserva)
+        outbox_service.reservation_changed(reserva, 'activa')
+
+    if errors:
+        raise InsufficientStockError(errors)
+
+
+def confirm_reservations(manifiesto, usuario_id):
+    """
+    Turn the manifest's active holds into stock exits ('salida' movements).
+    The manifest must be locked with lock_manifest().
+    """
+    reservas = ReservaStock.query.filter_by(
+        manifiesto_id=manifiesto.id, estado='activa'
+    ).order_by(ReservaStock.id).all()
+    productos = lock_products(reserva.producto_id for reserva in reservas)
+
+    for reserva in reservas:
+        producto = productos[reserva.producto_id]
+        producto.cantidad = float(producto.cantidad) - float(reserva.cantidad)
+        db.session.add(Movimiento(
+            producto_id=producto.id,
+            tipo='salida',
+            cantidad=reserva.cantidad,
+            observaciones=f"Manifiesto {manifiesto.numero_manifiesto}",
+            usuario_id=usuario_id
+        ))
+        reserva.estado = 'confirmada'
+        outbox_service.stock_changed(producto, -float(reserva.cantidad), 'manifiesto', manifiesto.id)
+        outbox_service.reservation_changed(reserva, 'confirmada')
+
+
+def release_reservations(manifiesto, usuario_id):
+    """
+    Give a cancelled manifest's stock back: active holds are dropped, and
+    quantities already confirmed return with 'entrada' movements. The
+    manifest must be locked with lock_manifest().
+    """
+    reservas = ReservaStock.query.filter(
+        ReservaStock.manifiesto_id == manifiesto.id,
+        ReservaStock.estado.in_(['activa', 'confirmada'])
+    ).order_by(ReservaStock.id).all()
+    productos = lock_products(
+        reserva.producto_id for reserva in reservas if reserva.estado == 'confirmada'
+    )
+
+    for reserva in reservas:
+        if reserva.estado == 'confirmada':
+            producto = productos[reserva.producto_id]
+            producto.cantidad = float(producto.cantidad) + float(reserva.cantidad)
+            db.session.add(Movimiento(
+                producto_id=producto.id,
+                tipo='entrada',
+                cantidad=reserva.cantidad,
+                observaciones=f"Cancelación manifiesto {manifiesto.numero_manifiesto}",
+                usuario_id=usuario_id
+            ))
+            outbox_service.stock_changed(producto, float(reserva.cantidad), 'manifiesto', manifiesto.id)
+        reserva.estado = 'liberada'
+        outbox_service.reservation_changed(reserva, 'liberada')
+
+
+def change_manifest_status(manifiesto, estado, usuario_id):
+    """
+    Move a manifest, locked with lock_manifest(), to a new estado and apply
+    its effect on stock. The caller commits.
+
+    Raises:
+        InvalidTransitionError: If the manifest is already delivered or cancelled
+    """
+    if manifiesto.estado == estado:
+        return
+
+    if manifiesto.estado in ESTADOS_FINALES:
+        raise InvalidTransitionError(
+            f"No se puede cambiar el estado de un manifiesto {manifiesto.estado}"
+        )
+
+    estado_anterior = manifiesto.estado
+    manifiesto.estado = estado
+    outbox_service.manifest_changed(manifiesto, estado_anterior)
+
+    if estado in ('en_transito', 'entregado'):
+        confirm_reservations(manifiesto, usuario_id)
+    elif estado == 'cancelado':
+        release_reservations(manifiesto, usuario_id)
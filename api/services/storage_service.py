@@ -0,0 +1,194 @@
+"""
+Disk space management under DATA_PATH.
+
+Each storage area (generated reports, log backups, outbox event files) has a maximum age and a
+total size quota. Files older than the age limit are deleted; if the area is
+still over its quota, the least recently used files go next until it fits.
+Files touched in the last MIN_AGE are never evicted for size, so a report is
+not deleted while it is being sent. Database backups are only measured: they
+are pruned by whole chains in backup_service.
+
+In-process manifest files (manifiestos/en_proceso) are deleted once stale:
+their manifest was cancelled, delivered with its final PDF written, or no
+longer exists in manifiestos (archived manifests had their files bundled).
+
+Runs from `flask limpiar-almacenamiento` or periodically in the background
+(see api.utils.maintenance). Usage is published as Prometheus gauges.
+"""
+import os
+import time
+from collections import namedtuple
+from datetime import timedelta
+from flask import current_app
+from api.app import db
+from api.models import Manifiesto
+from api.utils.metrics import STORAGE_BYTES, STORAGE_FILES, STORAGE_EVICTED
+
+MIN_AGE = timedelta(minutes=15)
+
+Entry = namedtuple('Entry', ['path', 'size', 'last_used'])
+
+
+def areas():
+    """
+    Managed areas from the configuration.
+
+    Returns:
+        List of (name, directory, max_age, max_bytes); a limit of 0 or None disables it
+    """
+    config = current_app.config
+    data_path = config['DATA_PATH']
+    mb = 1024 * 1024
+    return [
+        ('reportes', os.path.join(data_path, 'reportes'),
+         timedelta(days=config['REPORTS_RETENTION_DAYS']), config['REPORTS_MAX_MB'] * mb),
+        ('respaldos', os.path.join(data_path, 'respaldos', 'logs'),
+         timedelta(days=config['BACKUPS_RETENTION_DAYS']), config['BACKUPS_MAX_MB'] * mb),
+        ('outbox', os.path.join(data_path, 'outbox'),
+         timedelta(days=config['OUTBOX_FILES_RETENTION_DAYS']), 0),
+        # Database backups are pruned by whole chains (backup_service); only measured here
+        ('respaldos_db', os.path.join(data_path, 'respaldos', 'db'), None, 0),
+    ]
+
+
+def scan(directory):
+    """Files under a directory, recursively"""
+    entries = []
+    if not os.path.isdir(directory):
+        return entries
+
+    stack = [directory]
+    while stack:
+        with os.scandir(stack.pop()) as iterator:
+            for item in iterator:
+                if item.is_dir(follow_symlinks=False):
+                    stack.append(item.path)
+                elif item.is_file(follow_symlinks=False):
+                    stat = item.stat(follow_symlinks=False)
+                    # atime is only updated once a day on relatime mounts,
+                    # enough to order files that are kept for days
+                    entries.append(Entry(item.path, stat.st_size, max(stat.st_atime, stat.st_mtime)))
+    return entries
+
+
+def plan_eviction(entries, max_age, max_bytes, now):
+    """
+    Files to delete to enforce the limits of an area.
+
+    Returns:
+        List of (entry, reason) with reason 'antiguedad' or 'cuota'
+    """
+    evicted = []
+    kept = []
+    for entry in entries:
+        if max_age and now - entry.last_used > max_age.total_seconds():
+            evicted.append((entry, 'antiguedad'))
+        else:
+            kept.append(entry)
+
+    total = sum(entry.size for entry in kept)
+    if max_bytes and total > max_bytes:
+        for entry in sorted(kept, key=lambda entry: entry.last_used):
+            if total <= max_bytes:
+                break
+            if now - entry.last_used < MIN_AGE.total_seconds():
+                continue
+            evicted.append((entry, 'cuota'))
+            total -= entry.size
+
+    return evicted
+
+
+def stale_manifest_files(min_age, now):
+    """
+    In-process manifest files (PDF and QR) no longer needed.
+
+    Returns:
+        List of (entry, reason) with reason 'obsoleto' or 'huerfano'
+    """
+    directory = os.path.join(current_app.config['DATA_PATH'], 'manifiestos', 'en_proceso')
+    by_numero = {}
+    for entry in scan(directory):
+        if now - entry.last_used < min_age.total_seconds():
+            continue
+        name = os.path.basename(entry.path)
+        numero = name.removeprefix('qr_').removesuffix('.png').removesuffix('.pdf')
+        by_numero.setdefault(numero, []).append(entry)
+
+    if not by_numero:
+        return []
+
+    estados = {}
+    numeros = list(by_numero)
+    for start in range(0, len(numeros), 1000):
+        rows = db.session.query(
+            Manifiesto.numero_manifiesto, Manifiesto.estado, Manifiesto.pdf_path_final
+        ).filter(Manifiesto.numero_manifiesto.in_(numeros[start:start + 1000]))
+        for numero, estado, pdf_final in rows:
+            estados[numero] = (estado, pdf_final)
+
+    stale = []
+    for numero, entries in by_numero.items():
+        if numero not in estados:
+            reason = 'huerfano'
+        else:
+            estado, pdf_final = estados[numero]
+            done = estado == 'entregado' and pdf_final and os.path.exists(pdf_final)
+            if estado != 'cancelado' and not done:
+                continue
+            reason = 'obsoleto'
+        stale.extend((entry, reason) for entry in entries)
+    return stale
+
+
+def _delete(evicted, area, dry_run):
+    freed = 0
+    for entry, reason in evicted:
+        if not dry_run:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            STORAGE_EVICTED.labels(area=area, reason=reason).inc()
+        freed += entry.size
+    return freed
+
+
+def clean_storage(dry_run=False):
+    """
+    Enforce the limits of every area and delete stale manifest files.
+
+    Returns:
+        Dict area -> {'archivos', 'bytes', 'eliminados', 'liberados'}: usage
+        after the cleanup, and files and bytes removed
+    """
+    now = time.time()
+    summary = {}
+
+    for name, directory, max_age, max_bytes in areas():
+        entries = scan(directory)
+        evicted = plan_eviction(entries, max_age, max_bytes, now)
+        freed = _delete(evicted, name, dry_run)
+        summary[name] = {
+            'archivos': len(entries) - len(evicted),
+            'bytes': sum(entry.size for entry in entries) - freed,
+            'eliminados': len(evicted),
+            'liberados': freed,
+        }
+
+    directory = os.path.join(current_app.config['DATA_PATH'], 'manifiestos', 'en_proceso')
+    evicted = stale_manifest_files(timedelta(hours=current_app.config['STALE_PDF_HOURS']), now)
+    freed = _delete(evicted, 'manifiestos_en_proceso', dry_run)
+    entries = scan(directory)
+    summary['manifiestos_en_proceso'] = {
+        'archivos': len(entries) - (len(evicted) if dry_run else 0),
+        'bytes': sum(entry.size for entry in entries) - (freed if dry_run else 0),
+        'eliminados': len(evicted),
+        'liberados': freed,
+    }
+
+    for name, usage in summary.items():
+        STORAGE_BYTES.labels(area=name).set(usage['bytes'])
+        STORAGE_FILES.labels(area=name).set(usage['archivos'])
+
+    return summary
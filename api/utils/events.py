@@ -0,0 +1,207 @@
+"""
+Live change events (stock levels and manifest states) for the SSE stream.
+
+Each worker process owns one EventBus that fans events out to the queues of
+its open streams. Events reach the bus from one of two sources:
+
+- postgres: a single LISTEN connection per worker receives the NOTIFY sent
+  by the database triggers in schema.sql, so writes from any process (or
+  from psql) are seen, and only once they are committed.
+- memory: SQLAlchemy session hooks publish the changes of this process after
+  each commit. Used with SQLite and in tests.
+"""
+import json
+import logging
+import os
+import queue
+import select
+import threading
+import time
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+CHANNEL = 'inventario_eventos'
+
+logger = logging.getLogger(__name__)
+
+
+class EventBus:
+    """In-process fan-out of change events to subscriber queues"""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, evento):
+        """
+        Deliver an event to every subscriber. A subscriber that fell behind
+        loses its backlog and gets a 'resync' event so it reloads instead.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(evento)
+            except queue.Full:
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait({'tipo': 'resync'})
+
+
+bus = EventBus()
+
+
+# ========== POSTGRES LISTEN/NOTIFY ==========
+
+class PostgresListener(threading.Thread):
+    """Receives NOTIFY payloads on CHANNEL and publishes them to the bus"""
+
+    def __init__(self, engine, bus, poll_interval=5.0):
+        super().__init__(daemon=True, name='eventos-listener')
+        self.engine = engine
+        self.bus = bus
+        self.poll_interval = poll_interval
+
+    def run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Conexión LISTEN perdida; reintentando")
+                # Subscribers may have missed events while disconnected
+                self.bus.publish({'tipo': 'resync'})
+                time.sleep(self.poll_interval)
+
+    def _listen(self):
+        # Dedicated connection, detached from the pool for the life of the worker
+        connection = self.engine.raw_connection()
+        connection.detach()
+        dbapi_connection = connection.driver_connection
+        dbapi_connection.autocommit = True
+
+        try:
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+
+            while True:
+                ready, _, _ = select.select([dbapi_connection], [], [], self.poll_interval)
+                if not ready:
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    notify = dbapi_connection.notifies.pop(0)
+                    try:
+                        self.bus.publish(json.loads(notify.payload))
+                    except ValueError:
+                        logger.warning("Evento con payload inválido: %s", notify.payload)
+        finally:
+            connection.close()
+
+
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def ensure_listener(app, db):
+    """Start this worker's LISTEN thread on first use (after gunicorn forks)"""
+    global _listener, _listener_pid
+
+    if app.config['EVENTS_BACKEND'] != 'postgres':
+        return
+
+    with _listener_lock:
+        if _listener is not None and _listener_pid == os.getpid() and _listener.is_alive():
+            return
+        with app.app_context():
+            engine = db.engine
+        _listener = PostgresListener(engine, bus)
+        _listener_pid = os.getpid()
+        _listener.start()
+
+
+# ========== IN-PROCESS SOURCE (SESSION HOOKS) ==========
+
+def _changed(history):
+    return bool(history.added) and history.added != history.deleted
+
+
+def _collect_changes(session, flush_context):
+    """Record stock and manifest state changes of the flush, published after commit"""
+    from api.models import Producto, Manifiesto
+
+    pending = session.info.setdefault('eventos_pendientes', [])
+
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Producto):
+            history = inspect(obj).attrs.cantidad.history
+            if _changed(history):
+                pending.append({
+                    'tipo': 'stock',
+                    'producto_id': obj.id,
+                    'cantidad': float(obj.cantidad)
+                })
+        elif isinstance(obj, Manifiesto):
+            history = inspect(obj).attrs.estado.history
+            if _changed(history):
+                pending.append({
+                    'tipo': 'manifiesto',
+                    'manifiesto_id': obj.id,
+                    'estado': obj.estado,
+                    'estado_anterior': history.deleted[0] if history.deleted else None
+                })
+
+
+def _publish_changes(session):
+    for evento in session.info.pop('eventos_pendientes', []):
+        bus.publish(evento)
+
+
+def _discard_changes(session):
+    session.info.pop('eventos_pendientes', None)
+
+
+_session_hooks_installed = False
+
+
+def _install_session_hooks():
+    global _session_hooks_installed
+    if _session_hooks_installed:
+        return
+    event.listen(Session, 'after_flush', _collect_changes)
+    event.listen(Session, 'after_commit', _publish_changes)
+    event.listen(Session, 'after_rollback', _discard_changes)
+    _session_hooks_installed = True
+
+
+def init_events(app, db):
+    """
+    Select the event source (EVENTS_BACKEND: auto, postgres or memory).
+    auto uses postgres on a PostgreSQL database outside tests, memory otherwise.
+    """
+    backend = app.config.get('EVENTS_BACKEND', 'auto')
+    if backend == 'auto':
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+        backend = 'postgres' if uri.startswith('postgresql') and not app.testing else 'memory'
+
+    app.config['EVENTS_BACKEND'] = backend
+    bus.queue_size = app.config.get('EVENTS_QUEUE_SIZE', bus.queue_size)
+
+    if backend == 'memory':
+        _install_session_hooks()
@@ -0,0 +1,87 @@
+"""
+Conditional GET (ETag / If-None-Match) and in-process caching of reference data.
+
+Reference tables (categorias, roles) carry a version counter in
+tabla_versiones, bumped on every write. The counter is shared by all
+workers, so each worker's cache knows its copy is stale without re-reading
+the table, and the version doubles as the ETag.
+"""
+import hashlib
+import threading
+from flask import request, jsonify, current_app
+from api.app import db
+from api.models import TablaVersion
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def table_version(tabla):
+    """Current version counter of a reference table (0 if never written)"""
+    version = db.session.query(TablaVersion.version).filter_by(tabla=tabla).scalar()
+    return version or 0
+
+
+def bump_version(tabla):
+    """
+    Increment the version of a reference table in the current transaction
+    and drop this worker's cached copy. Call before committing the write.
+    """
+    updated = db.session.query(TablaVersion).filter_by(tabla=tabla).update(
+        {TablaVersion.version: TablaVersion.version + 1}, synchronize_session=False
+    )
+    if not updated:
+        db.session.add(TablaVersion(tabla=tabla, version=1))
+
+    with _cache_lock:
+        _cache.pop(tabla, None)
+
+
+def cached_reference(tabla, loader):
+    """
+    Serialized contents of a reference table, reloaded only when its version changes.
+
+    Args:
+        tabla: Table name in tabla_versiones
+        loader: Function returning the JSON-serializable payload
+
+    Returns:
+        Tuple (payload, etag)
+    """
+    version = table_version(tabla)
+    entry = _cache.get(tabla)
+
+    if entry is None or entry[0] != version:
+        entry = (version, loader())
+        with _cache_lock:
+            _cache[tabla] = entry
+
+    return entry[1], f"{tabla}-{version}"
+
+
+def etag_from(*parts):
+    """Opaque ETag built from values that change whenever the resource does (ids, updated_at)"""
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+
+def conditional_json(etag, payload):
+    """
+    JSON response tagged with etag, or an empty 304 when the client's
+    If-None-Match already holds it.
+
+    Args:
+        etag: Weak ETag value (without quotes)
+        payload: JSON-serializable data, or a function returning it so that
+            nothing is built for a 304
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(payload() if callable(payload) else payload)
+
+    response.set_etag(etag, weak=True)
+    # Clients may store the response but must revalidate it on every use
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,132 @@
+"""
+Idempotency-Key support for write endpoints.
+
+The key is reserved in the same transaction as the endpoint's own writes:
+if the endpoint commits, the key commits with it; if it rolls back, the key
+disappears and a retry runs normally. A concurrent duplicate blocks on the
+unique (usuario_id, clave) index until the first request finishes.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, current_app
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+from api.app import db
+from api.models import ClaveIdempotencia
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def _fingerprint():
+    digest = hashlib.sha256()
+    digest.update(request.method.encode('utf-8'))
+    digest.update(request.path.encode('utf-8'))
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _find(usuario_id, clave):
+    return ClaveIdempotencia.query.filter_by(usuario_id=usuario_id, clave=clave).first()
+
+
+def _replay(registro, huella):
+    """Response for a key that was already used"""
+    if registro is not None and registro.huella != huella:
+        return jsonify({"error": f"{HEADER} ya fue usada con otra solicitud"}), 422
+
+    if registro is None or registro.estado != 'completado':
+        response = jsonify({"error": "Una solicitud con la misma Idempotency-Key está en proceso"})
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+
+    response = current_app.response_class(
+        registro.respuesta, status=registro.status_code, mimetype='application/json'
+    )
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(fn):
+    """
+    Decorator for write endpoints that accept an Idempotency-Key header.
+    Must be applied after @jwt_required(). Requests without the header are
+    not affected.
+
+    Usage:
+        @jwt_required()
+        @role_required(1, 2)
+        @idempotent
+        def create_movement():
+            ...
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        clave = request.headers.get(HEADER)
+        if not clave:
+            return fn(*args, **kwargs)
+
+        if len(clave) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{HEADER} no puede exceder {MAX_KEY_LENGTH} caracteres"}), 400
+
+        usuario_id = get_jwt_identity()['user_id']
+        huella = _fingerprint()
+        now = datetime.utcnow()
+
+        registro = _find(usuario_id, clave)
+        if registro and registro.expires_at <= now:
+            # Expired but not purged yet: the key can be used again
+            db.session.delete(registro)
+            db.session.commit()
+            registro = None
+
+        if registro:
+            return _replay(registro, huella)
+
+        # Reserve the key inside the transaction the endpoint is about to commit
+        registro = ClaveIdempotencia(
+            usuario_id=usuario_id,
+            clave=clave,
+            huella=huella,
+            estado='en_proceso',
+            expires_at=now + timedelta(hours=current_app.config['IDEMPOTENCY_TTL_HOURS'])
+        )
+        db.session.add(registro)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # A concurrent request with the same key committed first
+            db.session.rollback()
+            return _replay(_find(usuario_id, clave), huella)
+
+        transaction = db.session().get_transaction()
+        rv = fn(*args, **kwargs)
+        response = current_app.make_response(rv)
+
+        if db.session().get_transaction() is transaction:
+            # The endpoint returned without committing (e.g. validation
+            # error): drop the reservation, a retry will run again
+            db.session.rollback()
+            return response
+
+        if not inspect(registro).persistent:
+            # Rolled back together with the endpoint's writes
+            return response
+
+        if response.status_code >= 500:
+            # Endpoints undo their writes before failing (e.g. a manifest
+            # whose PDF could not be built is discarded): let a retry run
+            db.session.delete(registro)
+            db.session.commit()
+            return response
+
+        registro.estado = 'completado'
+        registro.status_code = response.status_code
+        registro.respuesta = response.get_data(as_text=True)
+        db.session.commit()
+        return response
+
+    return wrapper
@@ -0,0 +1,70 @@
+import decimal
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def _default(o):
+    """
+    Encode types that JSON does not support natively.
+    datetime/date use ISO 8601 and Decimal becomes a float, matching what the
+    models' to_dict() produced, so values need no conversion beforehand.
+    """
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, decimal.Decimal):
+        return float(o)
+    return DefaultJSONProvider.default(o)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's default provider with the same datetime/Decimal encoding as OrjsonProvider"""
+
+    default = staticmethod(_default)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson (C encoder)"""
+
+    default = staticmethod(_default)
+
+    def _options(self, pretty=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self._options()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=_default, option=self._options(pretty))
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+def init_json_provider(app):
+    """
+    Install the JSON provider selected by JSON_PROVIDER ('orjson' or 'default').
+    Falls back to the standard library encoder when orjson is not installed.
+    """
+    provider = app.config.get('JSON_PROVIDER', 'orjson')
+
+    if provider == 'orjson' and orjson is None:
+        app.logger.warning("orjson no está instalado; usando el codificador JSON estándar")
+        provider = 'default'
+
+    if provider == 'orjson':
+        app.json = OrjsonProvider(app)
+    else:
+        app.json = StdlibJSONProvider(app)
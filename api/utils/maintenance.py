@@ -0,0 +1,107 @@
+"""
+Periodic maintenance tasks run in the background of the web workers.
+
+Every worker process starts one scheduler thread on its first request
+(after gunicorn forks). A due task runs in only one of them: the worker
+that takes the task's lock file under DATA_PATH runs it and stamps the
+file, and the others see the fresh stamp and skip that round. The same
+tasks can be scheduled with cron through the CLI instead; set their
+interval to 0 to disable them here.
+"""
+import fcntl
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 60
+
+
+def _tasks(app):
+    """(name, interval in seconds, function) of the enabled tasks"""
+    from api.services.storage_service import clean_storage
+    from api.services.backup_service import run_scheduled_backup
+
+    tasks = [
+        ('almacenamiento', app.config['STORAGE_CLEANUP_INTERVAL_MINUTES'] * 60, clean_storage),
+        ('respaldo_db', app.config['BACKUP_INTERVAL_MINUTES'] * 60, run_scheduled_backup),
+    ]
+    return [task for task in tasks if task[1] > 0]
+
+
+def _run_if_due(app, name, interval, fn):
+    lock_path = os.path.join(app.config['DATA_PATH'], f".mantenimiento_{name}.lock")
+
+    with open(lock_path, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # Running in another worker
+
+        try:
+            # The stamp is the lock file's mtime, shared by all workers
+            if time.time() - os.stat(lock_path).st_mtime < interval and os.path.getsize(lock_path):
+                return
+
+            with app.app_context():
+                try:
+                    fn()
+                finally:
+                    from api.app import db
+                    db.session.remove()
+
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(f"{os.getpid()} {time.time()}\n")
+            lock_file.flush()
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class MaintenanceScheduler(threading.Thread):
+    """Runs the due maintenance tasks every POLL_SECONDS"""
+
+    def __init__(self, app, tasks):
+        super().__init__(daemon=True, name='mantenimiento')
+        self.app = app
+        self.tasks = tasks
+
+    def run(self):
+        while True:
+            time.sleep(POLL_SECONDS)
+            for name, interval, fn in self.tasks:
+                try:
+                    _run_if_due(self.app, name, interval, fn)
+                except Exception:
+                    logger.exception("Tarea de mantenimiento '%s' fallida", name)
+
+
+_scheduler = None
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+
+def init_maintenance(app):
+    """Start this worker's scheduler thread on its first request (not in tests)"""
+    if app.testing:
+        return
+
+    tasks = _tasks(app)
+    if not tasks:
+        return
+
+    @app.before_request
+    def ensure_scheduler():
+        global _scheduler, _scheduler_pid
+
+        if _scheduler is not None and _scheduler_pid == os.getpid():
+            return
+
+        with _scheduler_lock:
+            if _scheduler is not None and _scheduler_pid == os.getpid():
+                return
+            _scheduler = MaintenanceScheduler(app, tasks)
+            _scheduler_pid = os.getpid()
+            _scheduler.start()
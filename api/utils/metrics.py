@@ -0,0 +1,195 @@
+import os
+import shutil
+import time
+from functools import wraps
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+
+# Metric definitions.
+# Under gunicorn, PROMETHEUS_MULTIPROC_DIR must be set before this module is
+# imported so every worker writes its samples to the shared directory.
+REQUEST_COUNT = Counter(
+    'inventario_http_requests_total',
+    'HTTP requests processed',
+    ['blueprint', 'route', 'method', 'status']
+)
+
+REQUEST_LATENCY = Histogram(
+    'inventario_http_request_duration_seconds',
+    'HTTP request latency',
+    ['blueprint', 'route', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+REQUESTS_IN_PROGRESS = Gauge(
+    'inventario_http_requests_in_progress',
+    'HTTP requests currently being processed',
+    ['blueprint', 'route'],
+    multiprocess_mode='livesum'
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    'inventario_db_pool_checked_out',
+    'Database connections currently checked out of the pool',
+    multiprocess_mode='livesum'
+)
+
+DB_POOL_OVERFLOW = Gauge(
+    'inventario_db_pool_overflow',
+    'Database connections opened beyond the pool size',
+    multiprocess_mode='livesum'
+)
+
+DOCUMENT_GENERATION_LATENCY = Histogram(
+    'inventario_document_generation_seconds',
+    'Time spent generating PDF, QR and Excel documents',
+    ['kind', 'function'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+
+# Disk usage under DATA_PATH. Area gauges are set by the storage manager
+# (api.services.storage_service); volume gauges are read on each scrape
+STORAGE_BYTES = Gauge(
+    'inventario_storage_bytes',
+    'Bytes used per storage area under DATA_PATH',
+    ['area'],
+    multiprocess_mode='mostrecent'
+)
+
+STORAGE_FILES = Gauge(
+    'inventario_storage_files',
+    'Files per storage area under DATA_PATH',
+    ['area'],
+    multiprocess_mode='mostrecent'
+)
+
+STORAGE_EVICTED = Counter(
+    'inventario_storage_evicted_files_total',
+    'Files deleted by the storage manager',
+    ['area', 'reason']
+)
+
+DISK_FREE = Gauge(
+    'inventario_disk_free_bytes',
+    'Free bytes on the DATA_PATH volume',
+    multiprocess_mode='mostrecent'
+)
+
+DISK_TOTAL = Gauge(
+    'inventario_disk_total_bytes',
+    'Size of the DATA_PATH volume',
+    multiprocess_mode='mostrecent'
+)
+
+
+def timed(kind):
+    """
+    Decorator to record the duration of a document generation function.
+
+    Usage:
+        @timed('pdf')
+        def generate_manifest_pdf(...):
+            ...
+    """
+    def decorator(fn):
+        histogram = DOCUMENT_GENERATION_LATENCY.labels(kind=kind, function=fn.__name__)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def _route_labels():
+    """Blueprint and route template of the current request"""
+    blueprint = request.blueprint or 'app'
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    return blueprint, route
+
+
+def _update_pool_gauges(db):
+    pool = db.engine.pool
+    if hasattr(pool, 'checkedout'):
+        DB_POOL_CHECKED_OUT.set(pool.checkedout())
+    if hasattr(pool, 'overflow'):
+        DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+def _update_disk_gauges(data_path):
+    usage = shutil.disk_usage(data_path)
+    DISK_FREE.set(usage.free)
+    DISK_TOTAL.set(usage.total)
+
+
+def _registry():
+    """Aggregate samples from all workers when running in multiprocess mode"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def init_metrics(app, db):
+    """
+    Instrument requests and expose the /metrics endpoint.
+
+    Args:
+        app: Flask application
+        db: SQLAlchemy extension, used to read connection pool state
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    @app.before_request
+    def start_request_metrics():
+        blueprint, route = _route_labels()
+        g.metrics_start = time.perf_counter()
+        g.metrics_labels = (blueprint, route)
+        REQUESTS_IN_PROGRESS.labels(blueprint=blueprint, route=route).inc()
+
+        # Sampled before this request takes a connection of its own
+        try:
+            _update_pool_gauges(db)
+        except Exception as e:
+            app.logger.debug(f"Could not read pool state: {e}")
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.get('metrics_start')
+        if start is None:
+            return response
+
+        blueprint, route = g.metrics_labels
+        REQUEST_LATENCY.labels(
+            blueprint=blueprint, route=route, method=request.method
+        ).observe(time.perf_counter() - start)
+        REQUEST_COUNT.labels(
+            blueprint=blueprint, route=route, method=request.method, status=response.status_code
+        ).inc()
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        labels = g.pop('metrics_labels', None)
+        if labels is None:
+            return
+
+        blueprint, route = labels
+        REQUESTS_IN_PROGRESS.labels(blueprint=blueprint, route=route).dec()
+
+    @app.route('/metrics')
+    def metrics():
+        try:
+            _update_disk_gauges(app.config['DATA_PATH'])
+        except OSError as e:
+            app.logger.debug(f"Could not read disk usage: {e}")
+        return Response(generate_latest(_registry()), mimetype=CONTENT_TYPE_LATEST)
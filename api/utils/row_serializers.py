@@ -0,0 +1,449 @@
+"""
+Core-row serializers for read-only list endpoints.
+
+List endpoints select only the columns they render with SQLAlchemy Core
+and turn each result row (a named tuple) into the same dictionary the
+model's to_dict() returns, without loading ORM entities into the session.
+Clients can narrow the projection with ?fields= and ?expand= (see
+RowSerializer.project), which drops both the columns and the joins.
+"""
+from math import ceil
+from flask import request
+from sqlalchemy import select, func, and_
+from sqlalchemy.orm import aliased
+from api.app import db
+from api.models import (
+    Movimiento, Transformacion, Producto, Usuario, Role, Manifiesto, Cliente, DetalleManifiesto, Categoria,
+    Etiqueta, ReservaStock
+)
+
+
+# ========== VALUE CONVERTERS (same rules as to_dict) ==========
+# datetime values and non-null Decimals are passed through untouched: the
+# app's JSON provider encodes them as ISO 8601 strings and floats.
+
+def float_or_zero(value):
+    return float(value) if value else 0.0
+
+
+def float_or_none(value):
+    return float(value) if value else None
+
+
+class RowSerializer:
+    """
+    Precompiled serializer for a fixed list of selected columns.
+
+    Args:
+        fields: Sequence of (key, column, converter) tuples; converter may be None.
+            The first field is the row identifier and is always kept by project().
+        relations: Sequence of (key, RowSerializer, join) nested objects, where
+            join is the (target, onclause) outer join that brings its columns.
+            A nested object is omitted when its first column is NULL, like the
+            "if self.relation" checks in to_dict().
+        extra_fields: Names the endpoint fills in itself after serializing
+            (e.g. computed counts), accepted by project()
+        extra_relations: Same, for relations the endpoint loads itself
+    """
+
+    __slots__ = ('columns', 'extras', '_spec', '_fields', '_relations', '_joins')
+
+    def __init__(self, fields, relations=(), extra_fields=(), extra_relations=()):
+        self._spec = (list(fields), list(relations), tuple(extra_fields), tuple(extra_relations))
+        self.extras = set(extra_fields) | set(extra_relations)
+        self.columns = [column for _, column, _ in fields]
+        self._fields = [(key, index, converter) for index, (key, _, converter) in enumerate(fields)]
+        self._relations = []
+        self._joins = []
+
+        for key, serializer, join in relations:
+            self._relations.append((key, len(self.columns), serializer))
+            self.columns.extend(serializer.columns)
+            self._joins.append(join)
+
+    def __call__(self, row, start=0):
+        result = {
+            key: row[start + index] if converter is None else converter(row[start + index])
+            for key, index, converter in self._fields
+        }
+        for key, offset, serializer in self._relations:
+            if row[start + offset] is not None:
+                result[key] = serializer(row, start + offset)
+        return result
+
+    def wants(self, name):
+        """Whether an extra field or relation is part of this projection"""
+        return name in self.extras
+
+    def select(self, base, *leading):
+        """
+        Select of this serializer's columns from base with the joins of its relations.
+
+        Args:
+            base: Model the row comes from
+            leading: Columns selected before the serializer's (pass start=len(leading))
+        """
+        stmt = select(*leading, *self.columns).select_from(base)
+        for target, onclause in self._joins:
+            stmt = stmt.outerjoin(target, onclause)
+        return stmt
+
+    def project(self, fields=None, expand=None):
+        """
+        Narrow the serializer to the requested fields and relations.
+
+        Args:
+            fields: Comma-separated field names, None for all of them.
+                "relation.field" narrows an expanded relation (and expands it).
+            expand: Comma-separated relation names, None for all of them, '' for none
+
+        Returns:
+            RowSerializer selecting only the requested columns and joins
+
+        Raises:
+            ValueError: If a field or relation does not exist
+        """
+        all_fields, all_relations, extra_fields, extra_relations = self._spec
+        field_names = [key for key, _, _ in all_fields]
+        relation_names = [key for key, _, _ in all_relations]
+
+        wanted_fields = None
+        nested = {}
+        if fields is not None:
+            wanted_fields = {field_names[0]}
+            for name in _split(fields):
+                relation, _, subfield = name.partition('.')
+                if subfield:
+                    if relation not in relation_names:
+                        raise ValueError(f"Relación desconocida: {relation}")
+                    nested.setdefault(relation, []).append(subfield)
+                elif name in field_names or name in extra_fields:
+                    wanted_fields.add(name)
+                else:
+                    raise ValueError(f"Campo desconocido: {name}")
+
+        if expand is None:
+            wanted_relations = set(relation_names) | set(extra_relations)
+        else:
+            wanted_relations = set(_split(expand))
+            for name in wanted_relations:
+                if name not in relation_names and name not in extra_relations:
+                    raise ValueError(f"Relación desconocida: {name}")
+        wanted_relations |= set(nested)
+
+        return RowSerializer(
+            [field for field in all_fields if wanted_fields is None or field[0] in wanted_fields],
+            [
+                (key, serializer.project(','.join(nested[key]) if key in nested else None, ''), join)
+                for key, serializer, join in all_relations if key in wanted_relations
+            ],
+            [name for name in extra_fields if wanted_fields is None or name in wanted_fields],
+            [name for name in extra_relations if name in wanted_relations]
+        )
+
+
+def _split(names):
+    return [name.strip() for name in names.split(',') if name.strip()]
+
+
+def project_from_request(serializer):
+    """
+    Projection requested with the ?fields= and ?expand= query parameters
+    (comma-separated, may be repeated).
+
+    Raises:
+        ValueError: If a field or relation does not exist
+    """
+    fields, expand = request.args.getlist('fields'), request.args.getlist('expand')
+    return serializer.project(
+        ','.join(fields) if fields else None,
+        ','.join(expand) if expand else None
+    )
+
+
+def paginate_rows(count_stmt, page_stmt, page, per_page, serializer):
+    """
+    Paginate a Core select the way Flask-SQLAlchemy's paginate(error_out=False) does.
+
+    Args:
+        count_stmt: Select returning the total number of matching rows
+        page_stmt: Ordered select of serializer.columns with filters applied
+        page: Requested page (values below 1 are treated as 1)
+        per_page: Page size
+        serializer: RowSerializer for page_stmt rows
+
+    Returns:
+        Tuple (items, total, pages)
+    """
+    offset = (max(page, 1) - 1) * per_page
+    total = db.session.execute(count_stmt).scalar() or 0
+    rows = db.session.execute(page_stmt.limit(per_page).offset(offset))
+    items = [serializer(row) for row in rows]
+    pages = ceil(total / per_page) if total else 0
+    return items, total, pages
+
+
+# ========== MOVIMIENTOS ==========
+
+_MOV_PRODUCTO = aliased(Producto, name='mov_producto')
+_MOV_USUARIO = aliased(Usuario, name='mov_usuario')
+
+MOVIMIENTO_ROW = RowSerializer(
+    [
+        ('id', Movimiento.id, None),
+        ('tipo', Movimiento.tipo, None),
+        ('cantidad', Movimiento.cantidad, None),
+        ('observaciones', Movimiento.observaciones, None),
+        ('created_at', Movimiento.created_at, None),
+    ],
+    relations=[
+        ('producto',
+         RowSerializer([('id', _MOV_PRODUCTO.id, None), ('nombre', _MOV_PRODUCTO.nombre, None)]),
+         (_MOV_PRODUCTO, Movimiento.producto_id == _MOV_PRODUCTO.id)),
+        ('usuario',
+         RowSerializer([('id', _MOV_USUARIO.id, None), ('nombre', _MOV_USUARIO.nombre, None)]),
+         (_MOV_USUARIO, Movimiento.usuario_id == _MOV_USUARIO.id)),
+    ]
+)
+
+
+# ========== TRANSFORMACIONES ==========
+
+_TRA_ORIGEN = aliased(Producto, name='tra_origen')
+_TRA_DESTINO = aliased(Producto, name='tra_destino')
+_TRA_USUARIO = aliased(Usuario, name='tra_usuario')
+
+TRANSFORMACION_ROW = RowSerializer(
+    [
+        ('id', Transformacion.id, None),
+        ('cantidad', Transformacion.cantidad, None),
+        ('tipo_transformacion', Transformacion.tipo_transformacion, None),
+        ('observaciones', Transformacion.observaciones, None),
+        ('created_at', Transformacion.created_at, None),
+    ],
+    relations=[
+        ('producto_origen',
+         RowSerializer([
+             ('id', _TRA_ORIGEN.id, None),
+             ('nombre', _TRA_ORIGEN.nombre, None),
+             ('cantidad_actual', _TRA_ORIGEN.cantidad, None),
+         ]),
+         (_TRA_ORIGEN, Transformacion.producto_origen_id == _TRA_ORIGEN.id)),
+        ('producto_destino',
+         RowSerializer([
+             ('id', _TRA_DESTINO.id, None),
+             ('nombre', _TRA_DESTINO.nombre, None),
+             ('cantidad_actual', _TRA_DESTINO.cantidad, None),
+         ]),
+         (_TRA_DESTINO, Transformacion.producto_destino_id == _TRA_DESTINO.id)),
+        ('usuario',
+         RowSerializer([('id', _TRA_USUARIO.id, None), ('nombre', _TRA_USUARIO.nombre, None)]),
+         (_TRA_USUARIO, Transformacion.usuario_id == _TRA_USUARIO.id)),
+    ]
+)
+
+
+# ========== USUARIOS ==========
+
+USUARIO_ROW = RowSerializer(
+    [
+        ('id', Usuario.id, None),
+        ('nombre', Usuario.nombre, None),
+        ('email', Usuario.email, None),
+        ('activo', Usuario.activo, None),
+        ('created_at', Usuario.created_at, None),
+        ('updated_at', Usuario.updated_at, None),
+    ],
+    relations=[
+        ('role', RowSerializer([
+            ('id', Role.id, None),
+            ('nombre', Role.nombre, None),
+            ('descripcion', Role.descripcion, None),
+            ('created_at', Role.created_at, None),
+        ]), (Role, Usuario.role_id == Role.id)),
+    ]
+)
+
+
+# ========== CLIENTES ==========
+
+CLIENTE_ROW = RowSerializer([
+    ('id', Cliente.id, None),
+    ('nombre', Cliente.nombre, None),
+    ('email', Cliente.email, None),
+    ('telefono', Cliente.telefono, None),
+    ('direccion', Cliente.direccion, None),
+    ('ruc_dni', Cliente.ruc_dni, None),
+    ('created_at', Cliente.created_at, None),
+    ('updated_at', Cliente.updated_at, None),
+])
+
+
+# ========== PRODUCTOS ==========
+
+PRODUCTO_ROW = RowSerializer(
+    [
+        ('id', Producto.id, None),
+        ('nombre', Producto.nombre, None),
+        ('medida', Producto.medida, None),
+        ('estado', Producto.estado, None),
+        ('cantidad', Producto.cantidad, None),
+        ('codigo_qr', Producto.codigo_qr, None),
+        ('created_at', Producto.created_at, None),
+        ('updated_at', Producto.updated_at, None),
+    ],
+    relations=[
+        ('categoria', RowSerializer([
+            ('id', Categoria.id, None),
+            ('nombre', Categoria.nombre, None),
+            ('descripcion', Categoria.descripcion, None),
+            ('created_at', Categoria.created_at, None),
+        ]), (Categoria, Producto.categoria_id == Categoria.id)),
+        ('cliente', CLIENTE_ROW, (Cliente, Producto.cliente_id == Cliente.id)),
+        ('etiqueta', RowSerializer([
+            ('id', Etiqueta.id, None),
+            ('tipo', Etiqueta.tipo, None),
+            ('ruta_archivo', Etiqueta.ruta_archivo, None),
+            ('formato', Etiqueta.formato, None),
+            ('created_at', Etiqueta.created_at, None),
+        ]), (Etiqueta, Etiqueta.producto_id == Producto.id)),
+    ],
+    # Filled in by attach_reservas()
+    extra_fields=['cantidad_reservada', 'cantidad_disponible']
+)
+
+RESERVA_FIELDS = ('cantidad_reservada', 'cantidad_disponible')
+
+
+def attach_reservas(productos, fields=RESERVA_FIELDS):
+    """
+    Set the stock held by active reservations and the available stock on a
+    page of serialized products with one query.
+
+    Args:
+        productos: List of PRODUCTO_ROW dictionaries, updated in place
+        fields: Which of RESERVA_FIELDS to set
+    """
+    if not productos or not fields:
+        return
+
+    stmt = select(
+        Producto.id, Producto.cantidad, func.coalesce(func.sum(ReservaStock.cantidad), 0)
+    ).select_from(Producto).outerjoin(
+        ReservaStock, and_(ReservaStock.producto_id == Producto.id, ReservaStock.estado == 'activa')
+    ).where(
+        Producto.id.in_([producto['id'] for producto in productos])
+    ).group_by(Producto.id, Producto.cantidad)
+
+    stock = {row[0]: (float(row[1]), float(row[2])) for row in db.session.execute(stmt)}
+
+    for producto in productos:
+        cantidad, reservada = stock[producto['id']]
+        if 'cantidad_reservada' in fields:
+            producto['cantidad_reservada'] = reservada
+        if 'cantidad_disponible' in fields:
+            producto['cantidad_disponible'] = cantidad - reservada
+
+
+# ========== MANIFIESTOS ==========
+
+_MAN_CREADOR = aliased(Usuario, name='man_creador')
+_MAN_ENTREGA = aliased(Usuario, name='man_entrega')
+
+MANIFIESTO_ROW = RowSerializer(
+    [
+        ('id', Manifiesto.id, None),
+        ('numero_manifiesto', Manifiesto.numero_manifiesto, None),
+        ('estado', Manifiesto.estado, None),
+        ('fecha_creacion', Manifiesto.fecha_creacion, None),
+        ('fecha_entrega', Manifiesto.fecha_entrega, None),
+        ('codigo_qr', Manifiesto.codigo_qr, None),
+        ('firma_operador', Manifiesto.firma_operador, None),
+        ('firma_cliente', Manifiesto.firma_cliente, None),
+        ('pdf_path_proceso', Manifiesto.pdf_path_proceso, None),
+        ('pdf_path_final', Manifiesto.pdf_path_final, None),
+        ('created_at', Manifiesto.created_at, None),
+        ('updated_at', Manifiesto.updated_at, None),
+    ],
+    relations=[
+        ('cliente', CLIENTE_ROW, (Cliente, Manifiesto.cliente_id == Cliente.id)),
+        ('usuario_creador',
+         RowSerializer([('id', _MAN_CREADOR.id, None), ('nombre', _MAN_CREADOR.nombre, None)]),
+         (_MAN_CREADOR, Manifiesto.usuario_creador_id == _MAN_CREADOR.id)),
+        ('usuario_entrega',
+         RowSerializer([('id', _MAN_ENTREGA.id, None), ('nombre', _MAN_ENTREGA.nombre, None)]),
+         (_MAN_ENTREGA, Manifiesto.usuario_entrega_id == _MAN_ENTREGA.id)),
+    ],
+    # Filled in by attach_detalles() / attach_detalle_counts()
+    extra_fields=['total_productos'],
+    extra_relations=['detalles']
+)
+
+DETALLE_ROW = RowSerializer(
+    [
+        ('id', DetalleManifiesto.id, None),
+        ('cantidad', DetalleManifiesto.cantidad, None),
+        ('precio_unitario', DetalleManifiesto.precio_unitario, float_or_none),
+        ('subtotal', DetalleManifiesto.subtotal, float_or_none),
+    ],
+    relations=[
+        ('producto', RowSerializer([
+            ('id', Producto.id, None),
+            ('nombre', Producto.nombre, None),
+            ('medida', Producto.medida, None),
+            ('estado', Producto.estado, None),
+        ]), (Producto, DetalleManifiesto.producto_id == Producto.id)),
+    ]
+)
+
+
+def attach_detalles(manifiestos, count=True):
+    """
+    Load the detalles of a page of serialized manifests with one query.
+
+    Args:
+        manifiestos: List of MANIFIESTO_ROW dictionaries, updated in place
+        count: Also set total_productos
+    """
+    if not manifiestos:
+        return
+
+    by_id = {}
+    for manifiesto in manifiestos:
+        manifiesto['detalles'] = []
+        by_id[manifiesto['id']] = manifiesto
+
+    stmt = DETALLE_ROW.select(DetalleManifiesto, DetalleManifiesto.manifiesto_id).where(
+        DetalleManifiesto.manifiesto_id.in_(list(by_id))
+    ).order_by(DetalleManifiesto.id)
+
+    for row in db.session.execute(stmt):
+        by_id[row[0]]['detalles'].append(DETALLE_ROW(row, start=1))
+
+    if count:
+        for manifiesto in manifiestos:
+            manifiesto['total_productos'] = len(manifiesto['detalles'])
+
+
+def attach_detalle_counts(manifiestos):
+    """
+    Set total_productos on a page of serialized manifests without loading detalles.
+
+    Args:
+        manifiestos: List of MANIFIESTO_ROW dictionaries, updated in place
+    """
+    if not manifiestos:
+        return
+
+    stmt = select(DetalleManifiesto.manifiesto_id, func.count()).where(
+        DetalleManifiesto.manifiesto_id.in_([manifiesto['id'] for manifiesto in manifiestos])
+    ).group_by(DetalleManifiesto.manifiesto_id)
+    counts = dict(db.session.execute(stmt).all())
+
+    for manifiesto in manifiestos:
+        manifiesto['total_productos'] = counts.get(manifiesto['id'], 0)
+
+
+def count_of(model, conditions):
+    """Count select over one table with the given filter conditions"""
+    return select(func.count()).select_from(model).where(*conditions)
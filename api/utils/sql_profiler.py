@@ -0,0 +1,141 @@
+import re
+import time
+import warnings
+from collections import Counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Literals and bind placeholders are stripped so that queries differing only
+# in their parameters share the same "shape"
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+|:\w+|\?")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_listeners_installed = False
+
+
+class NPlusOneError(Exception):
+    """Raised when an endpoint repeats the same statement shape too often"""
+
+
+class NPlusOneWarning(UserWarning):
+    """Emitted when an endpoint repeats the same statement shape too often"""
+
+
+def statement_shape(statement):
+    """
+    Normalize a SQL statement to its shape.
+
+    Args:
+        statement: SQL string as sent to the DBAPI cursor
+
+    Returns:
+        Statement with literals and bind parameters replaced by '?'
+    """
+    shape = _STRING_LITERAL.sub('?', statement)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('(?)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_stats' in g:
+        conn.info.setdefault('sql_profiler_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not (has_request_context() and 'sql_stats' in g):
+        return
+
+    starts = conn.info.get('sql_profiler_start')
+    if not starts:
+        return
+
+    elapsed = time.perf_counter() - starts.pop()
+    stats = g.sql_stats
+    stats['count'] += 1
+    stats['time'] += elapsed
+    stats['shapes'][statement_shape(statement)] += 1
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start
+    # so it does not stay on the pooled connection
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('sql_profiler_start'):
+        conn.info['sql_profiler_start'].pop()
+
+
+def _install_listeners():
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    _listeners_installed = True
+
+
+def _detection_mode(app):
+    """Resolve N+1 handling: explicit config, else raise in tests and warn in debug"""
+    mode = app.config.get('SQL_N_PLUS_ONE_MODE')
+    if mode:
+        return mode.lower()
+    if app.testing:
+        return 'raise'
+    if app.debug:
+        return 'warn'
+    return 'off'
+
+
+def init_sql_profiler(app):
+    """
+    Enable per-request SQL instrumentation.
+
+    Every request gets its statement count and total database time in the
+    Server-Timing header. In test/debug mode, statement shapes repeated more
+    than SQL_N_PLUS_ONE_THRESHOLD times raise NPlusOneError or warn.
+
+    Args:
+        app: Flask application
+    """
+    if not app.config.get('SQL_INSTRUMENTATION', True):
+        return
+
+    _install_listeners()
+
+    @app.before_request
+    def start_sql_stats():
+        g.sql_stats = {'count': 0, 'time': 0.0, 'shapes': Counter()}
+
+    @app.after_request
+    def report_sql_stats(response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+
+        timing = f'db;dur={stats["time"] * 1000:.2f};desc="{stats["count"]} queries"'
+        existing = response.headers.get('Server-Timing')
+        response.headers['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+        mode = _detection_mode(app)
+        if mode == 'off' or not stats['shapes']:
+            return response
+
+        threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 10)
+        shape, repeats = stats['shapes'].most_common(1)[0]
+        if repeats > threshold:
+            message = (
+                f"Possible N+1 in {request.endpoint}: statement executed {repeats} times "
+                f"(threshold {threshold}): {shape[:300]}"
+            )
+            if mode == 'raise':
+                raise NPlusOneError(message)
+            app.logger.warning(message)
+            warnings.warn(message, NPlusOneWarning, stacklevel=2)
+
+        return response
@@ -1,4 +1,5 @@
 import re
+from datetime import date, datetime, time, timedelta, timezone
 
 def validate_required_fields(data, required_fields):
     """
@@ -93,3 +94,31 @@ def validate_non_negative_number(value, field_name="cantidad"):
         return True, None
     except (ValueError, TypeError):
         return False, f"{field_name} debe ser un número válido"
+
+def parse_date_filter(value, field_name="fecha", end=False):
+    """
+    Parse an ISO date or timestamp used as a date range filter.
+
+    Upper bounds (end=True) are returned exclusive, to compare with <: a
+    date covers that whole day, a timestamp is included. Bounds on the
+    partition key in this form let PostgreSQL prune partitions.
+
+    Args:
+        value: ISO date (YYYY-MM-DD) or timestamp; UTC unless it carries an offset
+        field_name: Name of the field for error messages
+        end: Whether the value is the upper bound of the range
+
+    Returns:
+        Tuple (naive UTC datetime, error_message)
+    """
+    try:
+        if len(value) == 10:
+            parsed = datetime.combine(date.fromisoformat(value), time.min)
+            return (parsed + timedelta(days=1) if end else parsed), None
+
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return (parsed + timedelta(microseconds=1) if end else parsed), None
+    except (ValueError, TypeError):
+        return None, f"{field_name} debe ser una fecha válida (AAAA-MM-DD o AAAA-MM-DDTHH:MM:SS)"
@@ -0,0 +1,63 @@
+import os
+from api.app import create_app, db
+from api.config import Config
+
+
+def make_config(database_url):
+    """
+    Build a configuration class pointing at the benchmark database.
+
+    Args:
+        database_url: SQLAlchemy URL (PostgreSQL or SQLite)
+
+    Returns:
+        Config subclass
+    """
+    engine_options = dict(Config.SQLALCHEMY_ENGINE_OPTIONS)
+    if database_url.startswith('sqlite'):
+        engine_options = {}
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_ENGINE_OPTIONS = engine_options
+        SQL_N_PLUS_ONE_MODE = 'off'
+
+    return BenchmarkConfig
+
+
+def make_app(database_url=None):
+    """
+    Create a Flask app bound to the benchmark database.
+
+    Args:
+        database_url: SQLAlchemy URL, defaults to BENCHMARK_DATABASE_URL or a local SQLite file
+
+    Returns:
+        Flask application
+    """
+    database_url = database_url or os.getenv('BENCHMARK_DATABASE_URL', 'sqlite:///benchmarks.db')
+    return create_app(make_config(database_url))
+
+
+def auth_headers(user_id, role_id=1):
+    """
+    Build Authorization headers for a benchmark user.
+    Must be called inside an application context.
+    """
+    from flask_jwt_extended import create_access_token
+
+    token = create_access_token(identity={"user_id": user_id, "role_id": role_id})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def dataset_counts():
+    """Row counts of the main tables (inside an application context)"""
+    from api.models import Producto, Movimiento, Transformacion, Manifiesto, Cliente
+
+    return {
+        'productos': db.session.query(Producto).count(),
+        'movimientos': db.session.query(Movimiento).count(),
+        'transformaciones': db.session.query(Transformacion).count(),
+        'manifiestos': db.session.query(Manifiesto).count(),
+        'clientes': db.session.query(Cliente).count()
+    }
@@ -0,0 +1,317 @@
+"""
+Seeded synthetic data generator for benchmarks.
+
+The same seed and scale always produce the same dataset, so results of
+different runs (and different branches) can be compared.
+"""
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import insert, update, text
+from api.app import db
+from api.models import (
+    Role, Usuario, Categoria, Cliente, Producto, Movimiento, Transformacion,
+    Manifiesto, DetalleManifiesto
+)
+
+# Dataset sizes per scale preset
+SCALES = {
+    'tiny': {'productos': 500, 'clientes': 50, 'movimientos': 20000, 'manifiestos_por_dia': 2, 'anios': 1},
+    'small': {'productos': 5000, 'clientes': 300, 'movimientos': 200000, 'manifiestos_por_dia': 10, 'anios': 1},
+    'medium': {'productos': 50000, 'clientes': 2000, 'movimientos': 1000000, 'manifiestos_por_dia': 40, 'anios': 2},
+    'large': {'productos': 300000, 'clientes': 10000, 'movimientos': 5000000, 'manifiestos_por_dia': 120, 'anios': 3},
+}
+
+ROLES = ['Administrador', 'Oficina', 'Operario', 'Delivery', 'Cliente']
+CATEGORIAS = ['Madera', 'Metal', 'Plástico', 'Químico', 'Textil', 'Vidrio', 'Papel', 'Caucho']
+ESTADOS_PRODUCTO = ['No terminado', 'Terminado', 'Tratado', 'No tratado']
+MEDIDAS = ['unidades', 'kg', 'm3', 'litros', 'cajas']
+TIPOS_TRANSFORMACION = ['Tratamiento', 'Secado', 'Corte', 'Ensamblaje']
+
+# Fixed anchor so generated timestamps do not depend on the current date
+DEFAULT_END_DATE = datetime(2025, 12, 31, 23, 0, 0)
+
+BATCH_SIZE = 10000
+
+# bcrypt hash of "benchmark"; hashing per user would dominate generation time
+PASSWORD_HASH = '$2b$12$U2yH4bq8fBRoEVDwHhEMjOrTc4QfQ7.UvPsr92E0/LaKqnXyleBmO'
+
+
+def _insert_batches(model, rows):
+    """Insert rows in executemany batches"""
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(model), rows[start:start + BATCH_SIZE])
+
+
+def _money(rng, low, high):
+    return Decimal(rng.randint(int(low * 100), int(high * 100))) / 100
+
+
+def _seed_reference_data(rng, sizes, start_date):
+    """Roles, one user per role, categories and clients"""
+    _insert_batches(Role, [
+        {'id': idx, 'nombre': nombre, 'descripcion': f'Rol {nombre}', 'created_at': start_date}
+        for idx, nombre in enumerate(ROLES, start=1)
+    ])
+    _insert_batches(Usuario, [
+        {
+            'id': idx,
+            'nombre': f'Usuario {nombre}',
+            'email': f'{nombre.lower()}@benchmark.local',
+            'password_hash': PASSWORD_HASH,
+            'role_id': idx,
+            'activo': True,
+            'created_at': start_date,
+            'updated_at': start_date
+        }
+        for idx, nombre in enumerate(ROLES, start=1)
+    ])
+    _insert_batches(Categoria, [
+        {'id': idx, 'nombre': nombre, 'descripcion': f'Productos de {nombre.lower()}', 'created_at': start_date}
+        for idx, nombre in enumerate(CATEGORIAS, start=1)
+    ])
+    _insert_batches(Cliente, [
+        {
+            'id': idx,
+            'nombre': f'Cliente {idx:05d}',
+            'email': f'cliente{idx}@benchmark.local',
+            'telefono': f'555-{rng.randint(0, 9999):04d}',
+            'direccion': f'Av. Industrial {rng.randint(1, 999)}',
+            'ruc_dni': f'20{rng.randint(0, 999999999):09d}',
+            'created_at': start_date,
+            'updated_at': start_date
+        }
+        for idx in range(1, sizes['clientes'] + 1)
+    ])
+
+
+def _seed_productos(rng, sizes, start_date):
+    rows = []
+    for idx in range(1, sizes['productos'] + 1):
+        rows.append({
+            'id': idx,
+            'nombre': f'{rng.choice(CATEGORIAS)} {rng.choice(ESTADOS_PRODUCTO).lower()} {idx:06d}',
+            'categoria_id': rng.randint(1, len(CATEGORIAS)),
+            'medida': rng.choice(MEDIDAS),
+            'estado': rng.choice(ESTADOS_PRODUCTO),
+            'cantidad': Decimal('0'),
+            'cliente_id': rng.randint(1, sizes['clientes']) if rng.random() < 0.3 else None,
+            'codigo_qr': f'PROD-BENCH-{idx:08d}',
+            'created_by': 1,
+            'created_at': start_date,
+            'updated_at': start_date
+        })
+    _insert_batches(Producto, rows)
+
+
+def _seed_ledger(rng, sizes, start_date, end_date):
+    """
+    Chronological stream of movimientos and transformaciones.
+    Keeps a running stock per product so stock never goes negative and
+    productos.cantidad matches the ledger at the end.
+    """
+    n_productos = sizes['productos']
+    total_events = sizes['movimientos']
+    stock = [Decimal('0')] * (n_productos + 1)
+    span = (end_date - start_date).total_seconds()
+
+    movimientos = []
+    transformaciones = []
+
+    # Initial stock, one entrada per product
+    for producto_id in range(1, n_productos + 1):
+        cantidad = _money(rng, 10, 500)
+        stock[producto_id] = cantidad
+        movimientos.append({
+            'producto_id': producto_id,
+            'tipo': 'entrada',
+            'cantidad': cantidad,
+            'observaciones': 'Stock inicial',
+            'usuario_id': 2,
+            'created_at': start_date
+        })
+
+    # Events are generated in time slices so timestamps stay sorted
+    # without holding the whole stream in memory
+    slice_size = BATCH_SIZE
+    for slice_start in range(0, total_events, slice_size):
+        count = min(slice_size, total_events - slice_start)
+        offset_start = span * slice_start / total_events
+        offset_end = span * (slice_start + count) / total_events
+        offsets = sorted(rng.uniform(offset_start, offset_end) for _ in range(count))
+
+        for offset in offsets:
+            created_at = start_date + timedelta(seconds=offset)
+            producto_id = rng.randint(1, n_productos)
+            roll = rng.random()
+
+            if roll < 0.05:
+                # Transformation into another product
+                destino_id = rng.randint(1, n_productos)
+                if destino_id == producto_id or stock[producto_id] <= 0:
+                    continue
+                cantidad = min(stock[producto_id], _money(rng, 1, 50))
+                stock[producto_id] -= cantidad
+                stock[destino_id] += cantidad
+                transformaciones.append({
+                    'producto_origen_id': producto_id,
+                    'producto_destino_id': destino_id,
+                    'cantidad': cantidad,
+                    'tipo_transformacion': rng.choice(TIPOS_TRANSFORMACION),
+                    'observaciones': None,
+                    'usuario_id': 3,
+                    'created_at': created_at
+                })
+                continue
+
+            if roll < 0.07:
+                tipo = 'ajuste'
+                cantidad = _money(rng, 1, 500)
+                stock[producto_id] = cantidad
+            elif roll < 0.55 or stock[producto_id] <= 0:
+                tipo = 'entrada'
+                cantidad = _money(rng, 1, 100)
+                stock[producto_id] += cantidad
+            else:
+                tipo = 'salida'
+                cantidad = min(stock[producto_id], _money(rng, 1, 100))
+                stock[producto_id] -= cantidad
+
+            movimientos.append({
+                'producto_id': producto_id,
+                'tipo': tipo,
+                'cantidad': cantidad,
+                'observaciones': None,
+                'usuario_id': 2,
+                'created_at': created_at
+            })
+
+        if len(movimientos) >= BATCH_SIZE:
+            _insert_batches(Movimiento, movimientos)
+            movimientos = []
+        if len(transformaciones) >= BATCH_SIZE:
+            _insert_batches(Transformacion, transformaciones)
+            transformaciones = []
+        db.session.commit()
+
+    _insert_batches(Movimiento, movimientos)
+    _insert_batches(Transformacion, transformaciones)
+
+    # Final stock matches the ledger
+    stock_rows = [
+        {'id': producto_id, 'cantidad': stock[producto_id]}
+        for producto_id in range(1, n_productos + 1)
+    ]
+    for start in range(0, len(stock_rows), BATCH_SIZE):
+        db.session.execute(update(Producto), stock_rows[start:start + BATCH_SIZE])
+    db.session.commit()
+
+
+def _seed_manifiestos(rng, sizes, start_date, end_date):
+    """Manifests spread over the whole period, older ones delivered"""
+    manifiesto_id = 0
+    manifiestos = []
+    detalles = []
+    day = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    recent_cutoff = end_date - timedelta(days=7)
+
+    while day <= end_date:
+        for sequence in range(1, rng.randint(0, sizes['manifiestos_por_dia'] * 2) + 1):
+            manifiesto_id += 1
+            fecha_creacion = day + timedelta(seconds=rng.randint(8 * 3600, 18 * 3600))
+            numero = f"MAN-{day.strftime('%Y%m%d')}-{sequence:04d}"
+
+            if fecha_creacion < recent_cutoff:
+                estado = 'entregado' if rng.random() < 0.95 else 'cancelado'
+            else:
+                estado = rng.choice(['en_proceso', 'en_transito', 'entregado'])
+            entregado = estado == 'entregado'
+            fecha_entrega = fecha_creacion + timedelta(hours=rng.randint(2, 72)) if entregado else None
+
+            manifiestos.append({
+                'id': manifiesto_id,
+                'numero_manifiesto': numero,
+                'cliente_id': rng.randint(1, sizes['clientes']),
+                'estado': estado,
+                'fecha_creacion': fecha_creacion,
+                'fecha_entrega': fecha_entrega,
+                'codigo_qr': f'MAN-QR-BENCH-{manifiesto_id:08d}',
+                'firma_operador': None,
+                'firma_cliente': None,
+                'pdf_path_proceso': f'/data/manifiestos/en_proceso/{numero}.pdf',
+                'pdf_path_final': f'/data/manifiestos/finalizados/{numero}_final.pdf' if entregado else None,
+                'usuario_creador_id': 2,
+                'usuario_entrega_id': 4 if estado != 'en_proceso' else None,
+                'created_at': fecha_creacion,
+                'updated_at': fecha_entrega or fecha_creacion
+            })
+
+            for _ in range(rng.randint(1, 6)):
+                cantidad = _money(rng, 1, 40)
+                precio = _money(rng, 1, 200)
+                detalles.append({
+                    'manifiesto_id': manifiesto_id,
+                    'producto_id': rng.randint(1, sizes['productos']),
+                    'cantidad': cantidad,
+                    'precio_unitario': precio,
+                    'subtotal': (cantidad * precio).quantize(Decimal('0.01'))
+                })
+
+        if len(detalles) >= BATCH_SIZE:
+            _insert_batches(Manifiesto, manifiestos)
+            _insert_batches(DetalleManifiesto, detalles)
+            db.session.commit()
+            manifiestos = []
+            detalles = []
+
+        day += timedelta(days=1)
+
+    _insert_batches(Manifiesto, manifiestos)
+    _insert_batches(DetalleManifiesto, detalles)
+    db.session.commit()
+
+
+def _reset_sequences():
+    """Move PostgreSQL serial sequences past the explicitly inserted ids"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for table in ['roles', 'usuarios', 'categorias', 'clientes', 'productos', 'manifiestos',
+                  'movimientos', 'transformaciones', 'detalle_manifiesto']:
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+    db.session.commit()
+
+
+def generate_dataset(scale='small', seed=42, end_date=DEFAULT_END_DATE, overrides=None, create_schema=True):
+    """
+    Populate the database bound to the current app context.
+
+    Args:
+        scale: Preset name from SCALES
+        seed: Random seed; same seed and scale produce the same dataset
+        end_date: Timestamp of the most recent generated row
+        overrides: Optional dict overriding preset sizes
+        create_schema: Create missing tables from the models first
+
+    Returns:
+        Dictionary with the sizes used
+    """
+    sizes = dict(SCALES[scale])
+    sizes.update(overrides or {})
+    rng = random.Random(seed)
+    start_date = end_date - timedelta(days=365 * sizes['anios'])
+
+    if create_schema:
+        db.create_all()
+
+    _seed_reference_data(rng, sizes, start_date)
+    _seed_productos(rng, sizes, start_date)
+    db.session.commit()
+
+    _seed_ledger(rng, sizes, start_date, end_date)
+    _seed_manifiestos(rng, sizes, start_date, end_date)
+    _reset_sequences()
+
+    return sizes
@@ -0,0 +1,331 @@
+"""
+Concurrency load harness simulating a warehouse shift.
+
+Many simulated users hit the app at once with a mix of transformations,
+manual movements, manifest creation and client signatures over a small
+set of hot products, then the ledger invariants are checked.
+"""
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from sqlalchemy import func, text, case
+from api.app import db
+from api.models import Producto, Movimiento, Transformacion, Manifiesto
+
+# Operation mix (weights)
+DEFAULT_MIX = {
+    'transform_product': 30,
+    'create_movement': 35,
+    'create_manifest': 20,
+    'add_client_signature': 15,
+}
+
+# 1x1 transparent PNG used as signature
+SIGNATURE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk'
+    '+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+
+
+class LockWaitSampler(threading.Thread):
+    """
+    Periodically samples backends waiting on locks (PostgreSQL only).
+    Lock-wait time is estimated as waiting backends x sampling interval.
+    """
+
+    def __init__(self, app, interval=0.05):
+        super().__init__(daemon=True)
+        self.app = app
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.lock_wait_seconds = 0.0
+        self.max_waiting = 0
+        self.samples = 0
+
+    def run(self):
+        with self.app.app_context():
+            with db.engine.connect() as conn:
+                while not self.stop_event.is_set():
+                    waiting = conn.execute(text(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE wait_event_type = 'Lock' AND datname = current_database()"
+                    )).scalar()
+                    conn.rollback()
+                    self.samples += 1
+                    self.max_waiting = max(self.max_waiting, waiting)
+                    self.lock_wait_seconds += waiting * self.interval
+                    self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+
+class Shift:
+    """Shared state of one simulated shift"""
+
+    def __init__(self, app, users, duration, hot_products, mix, seed):
+        self.app = app
+        self.users = users
+        self.duration = duration
+        self.mix = mix
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.pending_manifests = []
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.error_messages = Counter()
+
+        with app.app_context():
+            self.hot_products = [
+                row.id for row in db.session.query(Producto.id)
+                .order_by(Producto.id).limit(hot_products).all()
+            ]
+            self.cliente_id = db.session.execute(text('SELECT MIN(id) FROM clientes')).scalar()
+            self.baseline = self._snapshot()
+            db.session.remove()
+
+        if len(self.hot_products) < 2 or not self.cliente_id:
+            raise RuntimeError('Se requieren al menos 2 productos y 1 cliente (ejecute generate primero)')
+
+    def _snapshot(self):
+        """Stock of the hot products and ledger high-water marks"""
+        stock = dict(
+            db.session.query(Producto.id, Producto.cantidad)
+            .filter(Producto.id.in_(self.hot_products)).all()
+        )
+        return {
+            'stock': stock,
+            'max_movimiento_id': db.session.query(func.max(Movimiento.id)).scalar() or 0,
+            'max_transformacion_id': db.session.query(func.max(Transformacion.id)).scalar() or 0,
+            'max_manifiesto_id': db.session.query(func.max(Manifiesto.id)).scalar() or 0,
+        }
+
+    def record(self, operation, elapsed, response):
+        with self.lock:
+            self.latencies[operation].append(elapsed)
+            self.statuses[operation][response.status_code] += 1
+            if response.status_code >= 500:
+                body = response.get_json(silent=True) or {}
+                self.error_messages[f"{operation}: {str(body.get('error', ''))[:120]}"] += 1
+
+
+def _user_loop(shift, user_index, headers, deadline):
+    rng = random.Random(shift.seed + user_index)
+    client = shift.app.test_client()
+    operations = list(shift.mix)
+    weights = [shift.mix[op] for op in operations]
+
+    while time.perf_counter() < deadline:
+        operation = rng.choices(operations, weights)[0]
+        origen, destino = rng.sample(shift.hot_products, 2)
+
+        if operation == 'transform_product':
+            call = lambda: client.post('/api/productos/transformar', headers=headers['operario'], json={
+                'producto_origen_id': origen,
+                'producto_destino_id': destino,
+                'cantidad': rng.randint(1, 5),
+                'tipo_transformacion': 'Tratamiento'
+            })
+        elif operation == 'create_movement':
+            tipo = rng.choice(['entrada', 'salida'])
+            call = lambda: client.post('/api/movimientos', headers=headers['oficina'], json={
+                'producto_id': origen,
+                'tipo': tipo,
+                'cantidad': rng.randint(1, 5)
+            })
+        elif operation == 'create_manifest':
+            call = lambda: client.post('/api/manifiestos', headers=headers['oficina'], json={
+                'cliente_id': shift.cliente_id,
+                'detalles': [
+                    {'producto_id': origen, 'cantidad': rng.randint(1, 3)},
+                    {'producto_id': destino, 'cantidad': rng.randint(1, 3)}
+                ]
+            })
+        else:
+            with shift.lock:
+                pending = shift.pending_manifests.pop() if shift.pending_manifests else None
+            if pending is None:
+                continue
+            manifiesto_id, codigo_qr = pending
+            call = lambda: client.put(
+                f'/api/manifiestos/{manifiesto_id}/firma-cliente?codigo_qr={codigo_qr}',
+                json={'firma_cliente': SIGNATURE}
+            )
+
+        start = time.perf_counter()
+        response = call()
+        shift.record(operation, time.perf_counter() - start, response)
+
+        if operation == 'create_manifest' and response.status_code == 201:
+            manifiesto = response.get_json()['manifiesto']
+            with shift.lock:
+                shift.pending_manifests.append((manifiesto['id'], manifiesto['codigo_qr']))
+
+
+def check_invariants(shift):
+    """
+    Verify ledger invariants after the shift.
+
+    Returns:
+        List of (name, passed, detail) tuples
+    """
+    baseline = shift.baseline
+    results = []
+
+    with shift.app.app_context():
+        final_stock = dict(
+            db.session.query(Producto.id, Producto.cantidad)
+            .filter(Producto.id.in_(shift.hot_products)).all()
+        )
+
+        movement_delta = dict(
+            db.session.query(
+                Movimiento.producto_id,
+                func.sum(case(
+                    (Movimiento.tipo == 'entrada', Movimiento.cantidad),
+                    (Movimiento.tipo == 'salida', -Movimiento.cantidad),
+                    else_=0
+                ))
+            ).filter(Movimiento.id > baseline['max_movimiento_id'])
+            .group_by(Movimiento.producto_id).all()
+        )
+        ajustes = db.session.query(func.count(Movimiento.id)).filter(
+            Movimiento.id > baseline['max_movimiento_id'], Movimiento.tipo == 'ajuste'
+        ).scalar()
+
+        new_transformations = Transformacion.id > baseline['max_transformacion_id']
+        salidas_transf = dict(
+            db.session.query(Transformacion.producto_origen_id, func.sum(Transformacion.cantidad))
+            .filter(new_transformations).group_by(Transformacion.producto_origen_id).all()
+        )
+        entradas_transf = dict(
+            db.session.query(Transformacion.producto_destino_id, func.sum(Transformacion.cantidad))
+            .filter(new_transformations).group_by(Transformacion.producto_destino_id).all()
+        )
+
+        drifted = []
+        for producto_id in shift.hot_products:
+            expected = (
+                float(baseline['stock'][producto_id])
+                + float(movement_delta.get(producto_id) or 0)
+                - float(salidas_transf.get(producto_id) or 0)
+                + float(entradas_transf.get(producto_id) or 0)
+            )
+            actual = float(final_stock[producto_id])
+            if abs(expected - actual) > 0.005:
+                drifted.append(f"producto {producto_id}: esperado {expected:.2f}, actual {actual:.2f}")
+
+        results.append((
+            'stock_equals_initial_plus_ledger',
+            not drifted and ajustes == 0,
+            '; '.join(drifted[:10]) or ('ajustes in the ledger' if ajustes else 'ok')
+        ))
+
+        negatives = [pid for pid, qty in final_stock.items() if qty < 0]
+        results.append(('no_negative_stock', not negatives, f"productos: {negatives}" if negatives else 'ok'))
+
+        numeros = db.session.query(
+            func.count(Manifiesto.id), func.count(func.distinct(Manifiesto.numero_manifiesto))
+        ).filter(Manifiesto.id > baseline['max_manifiesto_id']).one()
+        results.append(('unique_numero_manifiesto', numeros[0] == numeros[1], f"{numeros[0]} manifests, {numeros[1]} distinct numbers"))
+
+        db.session.remove()
+
+    return results
+
+
+def run_shift(app, users=16, duration=30, hot_products=10, mix=None, seed=42):
+    """
+    Run the simulated shift and check invariants.
+
+    Args:
+        app: Flask application bound to the target database
+        users: Number of concurrent simulated users
+        duration: Shift length in seconds
+        hot_products: Number of products all users compete for
+        mix: Operation weights, defaults to DEFAULT_MIX
+        seed: Random seed for the users
+
+    Returns:
+        Dictionary with throughput, latencies, error rates, lock waits and invariants
+    """
+    from benchmarks.context import auth_headers
+    from benchmarks.runner import summarize
+
+    shift = Shift(app, users, duration, hot_products, mix or DEFAULT_MIX, seed)
+
+    with app.app_context():
+        headers = {
+            'oficina': auth_headers(user_id=2, role_id=2),
+            'operario': auth_headers(user_id=3, role_id=3),
+        }
+        dialect = db.engine.dialect.name
+        deadlocks_before = _deadlocks(dialect)
+
+    sampler = LockWaitSampler(app) if dialect == 'postgresql' else None
+    if sampler:
+        sampler.start()
+
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=_user_loop, args=(shift, idx, headers, deadline))
+        for idx in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if sampler:
+        sampler.stop()
+
+    with app.app_context():
+        deadlocks = _deadlocks(dialect)
+        if deadlocks is not None and deadlocks_before is not None:
+            deadlocks -= deadlocks_before
+
+    operations = {}
+    total_requests = 0
+    total_errors = 0
+    for operation, latencies in shift.latencies.items():
+        statuses = shift.statuses[operation]
+        errors = sum(count for status, count in statuses.items() if status >= 500)
+        conflicts = sum(count for status, count in statuses.items() if 400 <= status < 500)
+        total_requests += len(latencies)
+        total_errors += errors
+        summary = summarize(latencies, elapsed, errors)
+        summary['rejected_4xx'] = conflicts
+        summary['error_rate'] = round(errors / len(latencies), 4) if latencies else 0
+        summary['status_codes'] = {str(status): count for status, count in sorted(statuses.items())}
+        operations[operation] = summary
+
+    invariants = check_invariants(shift)
+
+    return {
+        'users': users,
+        'duration_s': round(elapsed, 2),
+        'requests': total_requests,
+        'throughput_per_s': round(total_requests / elapsed, 2) if elapsed else None,
+        'error_rate': round(total_errors / total_requests, 4) if total_requests else 0,
+        'lock_wait_s': round(sampler.lock_wait_seconds, 3) if sampler else None,
+        'max_waiting_backends': sampler.max_waiting if sampler else None,
+        'deadlocks': deadlocks,
+        'operations': operations,
+        'top_errors': dict(shift.error_messages.most_common(10)),
+        'invariants': [
+            {'name': name, 'passed': passed, 'detail': detail}
+            for name, passed, detail in invariants
+        ]
+    }
+
+
+def _deadlocks(dialect):
+    if dialect != 'postgresql':
+        return None
+    return db.session.execute(text(
+        "SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()"
+    )).scalar()
@@ -0,0 +1,267 @@
+"""
+Benchmark runner.
+
+Usage:
+    python -m benchmarks generate --scale small --seed 42
+    python -m benchmarks run --output results/base.json
+    python -m benchmarks compare results/base.json results/branch.json
+    python -m benchmarks shift --users 32 --duration 60
+    python -m benchmarks startup
+"""
+import argparse
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, elapsed, errors):
+    """
+    Summarize latencies of one scenario.
+
+    Args:
+        latencies: List of per-iteration durations in seconds
+        elapsed: Wall time of the measured loop in seconds
+        errors: Number of failed iterations
+
+    Returns:
+        Dictionary with milliseconds percentiles and throughput
+    """
+    values = sorted(latencies)
+    to_ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        'iterations': len(values),
+        'errors': errors,
+        'p50_ms': to_ms(percentile(values, 50)),
+        'p95_ms': to_ms(percentile(values, 95)),
+        'p99_ms': to_ms(percentile(values, 99)),
+        'mean_ms': to_ms(sum(values) / len(values)) if values else None,
+        'min_ms': to_ms(values[0]) if values else None,
+        'max_ms': to_ms(values[-1]) if values else None,
+        'throughput_per_s': round(len(values) / elapsed, 2) if elapsed > 0 else None
+    }
+
+
+def run_scenario(ctx, name, iterations=None, warmup=5):
+    """Run one registered scenario and return its summary"""
+    from benchmarks.scenarios import SCENARIOS
+
+    spec = SCENARIOS[name]
+    iterations = iterations or spec['iterations']
+    fn = spec['fn']
+
+    for _ in range(warmup):
+        fn(ctx)
+
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        ok = fn(ctx)
+        latencies.append(time.perf_counter() - start)
+        if not ok:
+            errors += 1
+    elapsed = time.perf_counter() - started
+
+    return summarize(latencies, elapsed, errors)
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except Exception:
+        return None
+
+
+def cmd_generate(args):
+    from benchmarks.context import make_app
+    from benchmarks.datagen import generate_dataset
+
+    overrides = {}
+    for key in ('productos', 'clientes', 'movimientos', 'anios'):
+        value = getattr(args, key)
+        if value is not None:
+            overrides[key] = value
+
+    app = make_app(args.database_url)
+    with app.app_context():
+        started = time.perf_counter()
+        sizes = generate_dataset(scale=args.scale, seed=args.seed, overrides=overrides)
+        print(f"Dataset generated in {time.perf_counter() - started:.1f}s: {sizes}")
+
+
+def cmd_run(args):
+    from benchmarks.context import make_app, dataset_counts
+    from benchmarks.scenarios import SCENARIOS, BenchmarkContext
+
+    names = args.scenarios.split(',') if args.scenarios else [
+        name for name, spec in SCENARIOS.items() if args.include_writes or not spec['writes']
+    ]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    app = make_app(args.database_url)
+    ctx = BenchmarkContext(app, seed=args.seed)
+    with app.app_context():
+        counts = dataset_counts()
+        dialect = app.extensions['sqlalchemy'].engine.dialect.name
+
+    results = {}
+    for name in names:
+        summary = run_scenario(ctx, name, iterations=args.iterations, warmup=args.warmup)
+        results[name] = summary
+        print(f"{name:32s} p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms "
+              f"p99={summary['p99_ms']}ms {summary['throughput_per_s']}/s errors={summary['errors']}")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': dialect,
+            'seed': args.seed,
+            'dataset': counts
+        },
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+def cmd_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(args.candidate) as f:
+        candidate = json.load(f)['results']
+
+    print(f"{'scenario':32s} {'p50 base':>10s} {'p50 new':>10s} {'Δp50':>8s} {'p95 base':>10s} {'p95 new':>10s} {'Δp95':>8s}")
+    for name in sorted(set(baseline) & set(candidate)):
+        row = [name]
+        for key in ('p50_ms', 'p95_ms'):
+            old, new = baseline[name][key], candidate[name][key]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else 'n/a'
+            row += [old, new, change]
+        print(f"{row[0]:32s} {row[1]:>10} {row[2]:>10} {row[3]:>8s} {row[4]:>10} {row[5]:>10} {row[6]:>8s}")
+    return 0
+
+
+def cmd_shift(args):
+    from benchmarks.context import make_app
+    from benchmarks.load_shift import run_shift
+
+    app = make_app(args.database_url)
+    report = run_shift(app, users=args.users, duration=args.duration,
+                       hot_products=args.hot_products, seed=args.seed)
+
+    lock_wait = f"{report['lock_wait_s']}s" if report['lock_wait_s'] is not None else 'n/a'
+    print(f"{report['requests']} requests in {report['duration_s']}s "
+          f"({report['throughput_per_s']}/s), error rate {report['error_rate']:.2%}, "
+          f"lock wait {lock_wait}, deadlocks {report['deadlocks']}")
+    for name, summary in report['operations'].items():
+        print(f"  {name:24s} p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms "
+              f"p99={summary['p99_ms']}ms errors={summary['errors']} rejected={summary['rejected_4xx']}")
+    for message, count in report['top_errors'].items():
+        print(f"  ! {count}x {message}")
+
+    failed = [inv for inv in report['invariants'] if not inv['passed']]
+    for inv in report['invariants']:
+        print(f"  [{'OK' if inv['passed'] else 'FAIL'}] {inv['name']}: {inv['detail']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 1 if failed else 0
+
+
+def cmd_startup(args):
+    from benchmarks.startup import run_startup_benchmark
+
+    report = run_startup_benchmark(repeats=args.repeats, workers=args.workers,
+                                   include_gunicorn=not args.skip_gunicorn)
+    for name, values in report.items():
+        print(f"{name:22s} {values}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+def cmd_list(args):
+    from benchmarks.scenarios import SCENARIOS
+
+    for name, spec in SCENARIOS.items():
+        flag = ' [writes]' if spec['writes'] else ''
+        print(f"{name:32s} {spec['iterations']:>5d}  {spec['doc']}{flag}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Inventory API benchmarks')
+    parser.add_argument('--database-url', help='SQLAlchemy URL (default: BENCHMARK_DATABASE_URL or sqlite:///benchmarks.db)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    gen = sub.add_parser('generate', help='Populate the database with a seeded synthetic dataset')
+    gen.add_argument('--scale', default='small', choices=['tiny', 'small', 'medium', 'large'])
+    gen.add_argument('--seed', type=int, default=42)
+    gen.add_argument('--productos', type=int)
+    gen.add_argument('--clientes', type=int)
+    gen.add_argument('--movimientos', type=int)
+    gen.add_argument('--anios', type=int, help='Years of manifests and ledger history')
+    gen.set_defaults(func=cmd_generate)
+
+    run = sub.add_parser('run', help='Run scenarios and report p50/p95/p99 latency and throughput')
+    run.add_argument('--scenarios', help='Comma-separated scenario names (default: all read scenarios)')
+    run.add_argument('--include-writes', action='store_true', help='Also run scenarios that modify data')
+    run.add_argument('--iterations', type=int, help='Override iterations of every scenario')
+    run.add_argument('--warmup', type=int, default=5)
+    run.add_argument('--seed', type=int, default=42)
+    run.add_argument('--output', help='Write results to this JSON file')
+    run.set_defaults(func=cmd_run)
+
+    cmp_ = sub.add_parser('compare', help='Compare two result files')
+    cmp_.add_argument('baseline')
+    cmp_.add_argument('candidate')
+    cmp_.set_defaults(func=cmd_compare)
+
+    shift = sub.add_parser('shift', help='Concurrent warehouse shift load test with invariant checks')
+    shift.add_argument('--users', type=int, default=16)
+    shift.add_argument('--duration', type=int, default=30, help='Seconds')
+    shift.add_argument('--hot-products', type=int, default=10, help='Products all users compete for')
+    shift.add_argument('--seed', type=int, default=42)
+    shift.add_argument('--output', help='Write results to this JSON file')
+    shift.set_defaults(func=cmd_shift)
+
+    startup = sub.add_parser('startup', help='Import time and memory of the app and gunicorn workers')
+    startup.add_argument('--repeats', type=int, default=5)
+    startup.add_argument('--workers', type=int, default=4)
+    startup.add_argument('--skip-gunicorn', action='store_true')
+    startup.add_argument('--output', help='Write results to this JSON file')
+    startup.set_defaults(func=cmd_startup)
+
+    lst = sub.add_parser('list', help='List available scenarios')
+    lst.set_defaults(func=cmd_list)
+
+    args = parser.parse_args(argv)
+    return args.func(args) or 0
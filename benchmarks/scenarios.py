@@ -0,0 +1,260 @@
+"""
+Benchmark scenarios for the hot endpoints and service functions.
+
+Each scenario is called once per iteration with a BenchmarkContext and
+returns True when the operation succeeded.
+"""
+import os
+import random
+import tempfile
+from datetime import timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from api.app import db
+from api.models import Producto, Manifiesto, DetalleManifiesto, Cliente, Movimiento
+
+SCENARIOS = {}
+
+
+def scenario(name, iterations=200, writes=False):
+    """
+    Register a benchmark scenario.
+
+    Args:
+        name: Scenario name used on the command line
+        iterations: Default number of measured iterations
+        writes: True if the scenario modifies the database
+    """
+    def decorator(fn):
+        SCENARIOS[name] = {'fn': fn, 'iterations': iterations, 'writes': writes, 'doc': (fn.__doc__ or '').strip()}
+        return fn
+    return decorator
+
+
+class BenchmarkContext:
+    """Shared state for scenarios: test client, auth headers and dataset bounds"""
+
+    def __init__(self, app, seed=42):
+        from benchmarks.context import auth_headers
+
+        self.app = app
+        self.client = app.test_client()
+        self.rng = random.Random(seed)
+        self.output_dir = tempfile.mkdtemp(prefix='bench_')
+
+        with app.app_context():
+            self.headers = auth_headers(user_id=1, role_id=1)
+            self.operario_headers = auth_headers(user_id=3, role_id=3)
+            self.max_producto_id = db.session.query(func.max(Producto.id)).scalar() or 0
+            self.max_cliente_id = db.session.query(func.max(Cliente.id)).scalar() or 0
+            self.max_manifiesto_id = db.session.query(func.max(Manifiesto.id)).scalar() or 0
+            self.fecha_min = db.session.query(func.min(Movimiento.created_at)).scalar()
+            self.fecha_max = db.session.query(func.max(Movimiento.created_at)).scalar()
+            self.manifiesto = self._load_manifest()
+
+    def _load_manifest(self):
+        """Fully loaded, detached manifest for the service benchmarks"""
+        manifiesto = Manifiesto.query.order_by(Manifiesto.id.desc()).first()
+        if not manifiesto:
+            return None
+        detalles = DetalleManifiesto.query.options(
+            joinedload(DetalleManifiesto.producto)
+        ).filter_by(manifiesto_id=manifiesto.id).all()
+        cliente = manifiesto.cliente
+        db.session.expunge_all()
+        return {'manifiesto': manifiesto, 'cliente': cliente, 'detalles': detalles}
+
+    def random_producto_id(self):
+        return self.rng.randint(1, self.max_producto_id)
+
+    def random_window(self, days):
+        """Random [desde, hasta] window of the given length inside the dataset"""
+        span = (self.fecha_max - self.fecha_min).days - days
+        start = self.fecha_min + timedelta(days=self.rng.randint(0, max(span, 0)))
+        return start.strftime('%Y-%m-%d'), (start + timedelta(days=days)).strftime('%Y-%m-%d')
+
+    def get(self, url, headers=None):
+        return self.client.get(url, headers=headers or self.headers)
+
+    def post(self, url, payload, headers=None):
+        return self.client.post(url, json=payload, headers=headers or self.headers)
+
+
+def _ok(response):
+    return response.status_code < 400
+
+
+# ========== READ ENDPOINTS ==========
+
+@scenario('list_products')
+def list_products(ctx):
+    """GET /api/productos, random page"""
+    page = ctx.rng.randint(1, 50)
+    return _ok(ctx.get(f'/api/productos?page={page}&per_page=100'))
+
+
+@scenario('list_products_search')
+def list_products_search(ctx):
+    """GET /api/productos with a name search"""
+    term = ctx.rng.choice(['madera', 'metal', 'tratado', 'terminado', '0001'])
+    return _ok(ctx.get(f'/api/productos?search={term}&per_page=100'))
+
+
+@scenario('list_products_sparse')
+def list_products_sparse(ctx):
+    """GET /api/productos with only the columns of the stock table view"""
+    page = ctx.rng.randint(1, 50)
+    return _ok(ctx.get(f'/api/productos?page={page}&per_page=100&fields=nombre,estado,cantidad,categoria.nombre'))
+
+
+@scenario('get_product', iterations=500)
+def get_product(ctx):
+    """GET /api/productos/<id>"""
+    return _ok(ctx.get(f'/api/productos/{ctx.random_producto_id()}'))
+
+
+@scenario('list_movements')
+def list_movements(ctx):
+    """GET /api/movimientos filtered by a 30 day window"""
+    desde, hasta = ctx.random_window(30)
+    return _ok(ctx.get(f'/api/movimientos?fecha_desde={desde}&fecha_hasta={hasta}&per_page=100'))
+
+
+@scenario('list_movements_by_product')
+def list_movements_by_product(ctx):
+    """GET /api/movimientos filtered by product"""
+    return _ok(ctx.get(f'/api/movimientos?producto_id={ctx.random_producto_id()}&per_page=100'))
+
+
+@scenario('list_manifests')
+def list_manifests(ctx):
+    """GET /api/manifiestos, pending manifests as the dashboard does"""
+    return _ok(ctx.get('/api/manifiestos?estado=en_proceso,en_transito&per_page=100'))
+
+
+@scenario('list_manifests_history')
+def list_manifests_history(ctx):
+    """GET /api/manifiestos, random page of the full history"""
+    page = ctx.rng.randint(1, 20)
+    return _ok(ctx.get(f'/api/manifiestos?page={page}&per_page=100'))
+
+
+@scenario('list_manifests_sparse')
+def list_manifests_sparse(ctx):
+    """GET /api/manifiestos with the dashboard columns and no detalles"""
+    return _ok(ctx.get('/api/manifiestos?estado=en_proceso,en_transito&per_page=100'
+                       '&fields=numero_manifiesto,estado,fecha_creacion,total_productos,cliente.nombre'))
+
+
+@scenario('get_manifest', iterations=500)
+def get_manifest(ctx):
+    """GET /api/manifiestos/<id>"""
+    return _ok(ctx.get(f'/api/manifiestos/{ctx.rng.randint(1, ctx.max_manifiesto_id)}'))
+
+
+@scenario('list_clients')
+def list_clients(ctx):
+    """GET /api/clientes"""
+    return _ok(ctx.get(f'/api/clientes?page={ctx.rng.randint(1, 5)}&per_page=100'))
+
+
+# ========== REPORTS ==========
+
+@scenario('report_movements', iterations=10)
+def report_movements(ctx):
+    """GET /api/reportes/movimientos for one month"""
+    desde, hasta = ctx.random_window(30)
+    return _ok(ctx.get(f'/api/reportes/movimientos?fecha_desde={desde}&fecha_hasta={hasta}'))
+
+
+@scenario('report_deliveries', iterations=10)
+def report_deliveries(ctx):
+    """GET /api/reportes/entregas for one quarter"""
+    desde, hasta = ctx.random_window(90)
+    return _ok(ctx.get(f'/api/reportes/entregas?fecha_desde={desde}&fecha_hasta={hasta}'))
+
+
+@scenario('report_inventory', iterations=5)
+def report_inventory(ctx):
+    """GET /api/reportes/inventario (all products)"""
+    return _ok(ctx.get('/api/reportes/inventario'))
+
+
+# ========== WRITE ENDPOINTS ==========
+
+@scenario('create_movement', iterations=200, writes=True)
+def create_movement(ctx):
+    """POST /api/movimientos (entrada)"""
+    return _ok(ctx.post('/api/movimientos', {
+        'producto_id': ctx.random_producto_id(),
+        'tipo': 'entrada',
+        'cantidad': ctx.rng.randint(1, 20),
+        'observaciones': 'benchmark'
+    }))
+
+
+@scenario('transform_product', iterations=200, writes=True)
+def transform_product(ctx):
+    """POST /api/productos/transformar"""
+    return _ok(ctx.post('/api/productos/transformar', {
+        'producto_origen_id': ctx.random_producto_id(),
+        'producto_destino_id': ctx.random_producto_id(),
+        'cantidad': 0.5,
+        'tipo_transformacion': 'Tratamiento'
+    }, headers=ctx.operario_headers))
+
+
+@scenario('create_manifest', iterations=50, writes=True)
+def create_manifest(ctx):
+    """POST /api/manifiestos with 3 products (includes QR and PDF generation)"""
+    detalles = [
+        {'producto_id': ctx.random_producto_id(), 'cantidad': 0.1, 'precio_unitario': 10, 'subtotal': 1}
+        for _ in range(3)
+    ]
+    return _ok(ctx.post('/api/manifiestos', {
+        'cliente_id': ctx.rng.randint(1, ctx.max_cliente_id),
+        'detalles': detalles
+    }))
+
+
+# ========== SERVICE FUNCTIONS ==========
+
+@scenario('service_manifest_pdf', iterations=50)
+def service_manifest_pdf(ctx):
+    """pdf_service.generate_manifest_pdf"""
+    from api.services.pdf_service import generate_manifest_pdf
+
+    data = ctx.manifiesto
+    return generate_manifest_pdf(
+        manifiesto=data['manifiesto'],
+        cliente=data['cliente'],
+        detalles=data['detalles'],
+        qr_code_path=os.path.join(ctx.output_dir, 'missing_qr.png'),
+        output_path=os.path.join(ctx.output_dir, 'manifest.pdf'),
+        is_final=False
+    )
+
+
+@scenario('service_qr_image', iterations=200)
+def service_qr_image(ctx):
+    """qr_service.generate_qr_image"""
+    from api.services.qr_service import generate_qr_image
+
+    content = {'type': 'producto', 'id': ctx.random_producto_id(), 'codigo': 'PROD-BENCH'}
+    return generate_qr_image(content, os.path.join(ctx.output_dir, 'qr.png'))
+
+
+@scenario('service_movements_excel', iterations=10)
+def service_movements_excel(ctx):
+    """excel_service.generate_movements_excel with 10,000 rows"""
+    from api.services.excel_service import generate_movements_excel
+
+    if not hasattr(ctx, 'excel_rows'):
+        ctx.excel_rows = [
+            {
+                'Fecha': '2025-01-01 10:00:00', 'Producto': f'Producto {i}', 'Categoría': 'Madera',
+                'Tipo': 'entrada', 'Cantidad': float(i % 100), 'Usuario': 'Oficina', 'Observaciones': ''
+            }
+            for i in range(10000)
+        ]
+    return generate_movements_excel(ctx.excel_rows, os.path.join(ctx.output_dir, 'movimientos.xlsx'))
@@ -0,0 +1,164 @@
+"""
+Worker startup time and memory benchmark.
+
+Compares importing the app with lazy service imports against importing
+pandas/reportlab/qrcode eagerly (the previous behaviour), and measures a
+real gunicorn master plus workers with and without --preload.
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import json
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['pandas', 'numpy', 'openpyxl', 'reportlab', 'qrcode', 'PIL']
+
+_IMPORT_PROBE = """
+import json, resource, sys, time
+eager = sys.argv[1] == 'eager'
+start = time.perf_counter()
+if eager:
+    import pandas, reportlab.platypus, qrcode
+import api.app
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'import_s': elapsed,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_modules_loaded': sorted(m for m in %r if m in sys.modules)
+}))
+""" % (HEAVY_MODULES,)
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault('DATA_PATH', tempfile.mkdtemp(prefix='startup_data_'))
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'startup_bench.db'))
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    return env
+
+
+def measure_import(eager=False, repeats=5):
+    """
+    Import api.app in fresh interpreters.
+
+    Returns:
+        Median import time, median peak RSS and the heavy modules loaded
+    """
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.check_output(
+            [sys.executable, '-c', _IMPORT_PROBE, 'eager' if eager else 'lazy'],
+            cwd=REPO_ROOT, env=_env(), text=True
+        )
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {
+        'import_s': round(statistics.median(r['import_s'] for r in runs), 3),
+        'max_rss_mb': round(statistics.median(r['max_rss_mb'] for r in runs), 1),
+        'heavy_modules_loaded': runs[-1]['heavy_modules_loaded']
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            if int(fields[1]) == pid:
+                children.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return children
+
+
+def _memory_kb(pid):
+    """RSS and PSS (proportional set size, counts shared pages once) of a process"""
+    rss = pss = 0
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            if line.startswith('Rss:'):
+                rss = int(line.split()[1])
+            elif line.startswith('Pss:'):
+                pss = int(line.split()[1])
+    return rss, pss
+
+
+def measure_gunicorn(preload=True, workers=4, timeout=60):
+    """
+    Start gunicorn with the repository config and measure it once ready.
+
+    Returns:
+        Time until /health answers and total RSS/PSS of master plus workers
+    """
+    port = _free_port()
+    env = _env()
+    env['GUNICORN_PRELOAD'] = 'true' if preload else 'false'
+    env['GUNICORN_WORKERS'] = str(workers)
+    env['GUNICORN_BIND'] = f'127.0.0.1:{port}'
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'api.app:app'],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        ready_s = None
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1) as response:
+                    if response.status == 200 and len(_children(process.pid)) >= workers:
+                        ready_s = time.perf_counter() - start
+                        break
+            except OSError:
+                pass
+            time.sleep(0.05)
+
+        if ready_s is None:
+            raise RuntimeError('gunicorn did not become ready')
+
+        # Let the remaining workers finish booting
+        time.sleep(1)
+        pids = [process.pid] + _children(process.pid)
+        rss = pss = 0
+        for pid in pids:
+            proc_rss, proc_pss = _memory_kb(pid)
+            rss += proc_rss
+            pss += proc_pss
+
+        return {
+            'preload': preload,
+            'workers': workers,
+            'ready_s': round(ready_s, 3),
+            'total_rss_mb': round(rss / 1024, 1),
+            'total_pss_mb': round(pss / 1024, 1)
+        }
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def run_startup_benchmark(repeats=5, workers=4, include_gunicorn=True):
+    """Run all startup measurements and return them as a dictionary"""
+    report = {
+        'import_lazy': measure_import(eager=False, repeats=repeats),
+        'import_eager': measure_import(eager=True, repeats=repeats),
+    }
+    if include_gunicorn:
+        report['gunicorn_preload'] = measure_gunicorn(preload=True, workers=workers)
+        report['gunicorn_no_preload'] = measure_gunicorn(preload=False, workers=workers)
+    return report
@@ -1,8 +1,22 @@
 -- Sistema de Inventario Web - Nova
 -- Database Schema
 -- PostgreSQL 14+
+--
+-- After loading, create the monthly partitions of the ledger tables:
+--     flask --app api.app crear-particiones
 
 -- Drop tables if they exist (for clean initialization)
+DROP SCHEMA IF EXISTS archivo CASCADE;
+DROP TABLE IF EXISTS eventos_outbox CASCADE;
+DROP TABLE IF EXISTS movimientos_resumen_diario CASCADE;
+DROP TABLE IF EXISTS detalle_manifiesto_archivo CASCADE;
+DROP TABLE IF EXISTS manifiestos_archivo CASCADE;
+DROP TABLE IF EXISTS particiones_archivadas CASCADE;
+DROP TABLE IF EXISTS stock_snapshots CASCADE;
+DROP TABLE IF EXISTS reservas_stock CASCADE;
+DROP TABLE IF EXISTS claves_idempotencia CASCADE;
+DROP TABLE IF EXISTS eliminaciones CASCADE;
+DROP TABLE IF EXISTS tabla_versiones CASCADE;
 DROP TABLE IF EXISTS etiquetas CASCADE;
 DROP TABLE IF EXISTS detalle_manifiesto CASCADE;
 DROP TABLE IF EXISTS manifiestos CASCADE;
@@ -59,6 +73,7 @@ CREATE TABLE clientes (
 
 CREATE INDEX idx_clientes_email ON clientes(email);
 CREATE INDEX idx_clientes_ruc_dni ON clientes(ruc_dni);
+CREATE INDEX idx_clientes_updated_at ON clientes(updated_at, id);
 
 -- Table 5: productos
 CREATE TABLE productos (
@@ -79,36 +94,50 @@ CREATE INDEX idx_productos_categoria_id ON productos(categoria_id);
 CREATE INDEX idx_productos_estado ON productos(estado);
 CREATE UNIQUE INDEX idx_productos_codigo_qr ON productos(codigo_qr);
 CREATE INDEX idx_productos_cliente_id ON productos(cliente_id);
+CREATE INDEX idx_productos_updated_at ON productos(updated_at, id);
 
 -- Table 6: movimientos
+-- Partitioned by month on created_at (movimientos_AAAA_MM), created ahead
+-- by `flask crear-particiones`; the primary key must include the partition key
 CREATE TABLE movimientos (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     producto_id INTEGER NOT NULL REFERENCES productos(id),
     tipo VARCHAR(20) NOT NULL,
     cantidad DECIMAL(10,2) NOT NULL,
     observaciones TEXT,
     usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
-    created_at TIMESTAMP DEFAULT NOW()
-);
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Rows outside the created months; moved to their month when it is created
+CREATE TABLE movimientos_default PARTITION OF movimientos DEFAULT;
 
 CREATE INDEX idx_movimientos_producto_id ON movimientos(producto_id);
 CREATE INDEX idx_movimientos_tipo ON movimientos(tipo);
-CREATE INDEX idx_movimientos_created_at ON movimientos(created_at);
+-- Covers the aggregates of GET /api/movimientos/aggregate (index-only scan)
+CREATE INDEX idx_movimientos_created_at ON movimientos(created_at) INCLUDE (producto_id, tipo, usuario_id, cantidad);
 
 -- Table 7: transformaciones
+-- Partitioned like movimientos (transformaciones_AAAA_MM)
 CREATE TABLE transformaciones (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     producto_origen_id INTEGER NOT NULL REFERENCES productos(id),
     producto_destino_id INTEGER NOT NULL REFERENCES productos(id),
     cantidad DECIMAL(10,2) NOT NULL,
     tipo_transformacion VARCHAR(100) NOT NULL,
     observaciones TEXT,
     usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
-    created_at TIMESTAMP DEFAULT NOW()
-);
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
 
-CREATE INDEX idx_transformaciones_producto_origen_id ON transformaciones(producto_origen_id);
-CREATE INDEX idx_transformaciones_producto_destino_id ON transformaciones(producto_destino_id);
+CREATE TABLE transformaciones_default PARTITION OF transformaciones DEFAULT;
+
+-- Product history, newest first (also serve plain lookups by product)
+CREATE INDEX idx_transformaciones_origen_created_at ON transformaciones(producto_origen_id, created_at);
+CREATE INDEX idx_transformaciones_destino_created_at ON transformaciones(producto_destino_id, created_at);
+CREATE INDEX idx_transformaciones_usuario_id ON transformaciones(usuario_id);
 CREATE INDEX idx_transformaciones_created_at ON transformaciones(created_at);
 
 -- Table 8: manifiestos
@@ -134,6 +163,7 @@ CREATE UNIQUE INDEX idx_manifiestos_numero_manifiesto ON manifiestos(numero_mani
 CREATE INDEX idx_manifiestos_cliente_id ON manifiestos(cliente_id);
 CREATE INDEX idx_manifiestos_estado ON manifiestos(estado);
 CREATE INDEX idx_manifiestos_fecha_creacion ON manifiestos(fecha_creacion);
+CREATE INDEX idx_manifiestos_updated_at ON manifiestos(updated_at, id);
 
 -- Table 9: detalle_manifiesto
 CREATE TABLE detalle_manifiesto (
@@ -160,6 +190,169 @@ CREATE TABLE etiquetas (
 
 CREATE UNIQUE INDEX idx_etiquetas_producto_id ON etiquetas(producto_id);
 
+-- Table 11: tabla_versiones
+-- Per-table version counters of cached reference data (categorias, roles),
+-- used to build ETags and to invalidate the API's in-process caches
+CREATE TABLE tabla_versiones (
+    tabla VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+-- Table 12: eliminaciones
+-- Tombstones of deleted rows for the delta-sync API (/api/sync)
+CREATE TABLE eliminaciones (
+    id SERIAL PRIMARY KEY,
+    tabla VARCHAR(50) NOT NULL,
+    registro_id INTEGER NOT NULL,
+    deleted_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX idx_eliminaciones_deleted_at ON eliminaciones(deleted_at, id);
+
+-- Table 13: claves_idempotencia
+-- Responses of write requests sent with an Idempotency-Key header, replayed
+-- on retries until expires_at (purged by "flask limpiar-idempotencia")
+CREATE TABLE claves_idempotencia (
+    id SERIAL PRIMARY KEY,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+    clave VARCHAR(255) NOT NULL,
+    huella VARCHAR(64) NOT NULL,
+    estado VARCHAR(20) NOT NULL DEFAULT 'en_proceso',
+    status_code INTEGER,
+    respuesta TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE UNIQUE INDEX idx_claves_idempotencia_usuario_clave ON claves_idempotencia(usuario_id, clave);
+CREATE INDEX idx_claves_idempotencia_expires_at ON claves_idempotencia(expires_at);
+
+-- Table 14: reservas_stock
+-- Stock held by in-process manifests: activa until the manifest leaves
+-- (confirmada, stock decremented) or is cancelled (liberada)
+CREATE TABLE reservas_stock (
+    id SERIAL PRIMARY KEY,
+    producto_id INTEGER NOT NULL REFERENCES productos(id),
+    manifiesto_id INTEGER NOT NULL REFERENCES manifiestos(id),
+    cantidad DECIMAL(10,2) NOT NULL,
+    estado VARCHAR(20) NOT NULL DEFAULT 'activa',
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Available stock sums the active holds of a product
+CREATE INDEX idx_reservas_stock_producto_activa ON reservas_stock(producto_id) INCLUDE (cantidad) WHERE estado = 'activa';
+CREATE INDEX idx_reservas_stock_manifiesto_id ON reservas_stock(manifiesto_id);
+
+-- Table 15: stock_snapshots
+-- Closing stock of every product per day (UTC), written by
+-- `flask snapshot-stock`; point-in-time queries replay the ledger
+-- (movimientos, transformaciones) from the latest snapshot
+CREATE TABLE stock_snapshots (
+    id SERIAL PRIMARY KEY,
+    fecha DATE NOT NULL,
+    producto_id INTEGER NOT NULL REFERENCES productos(id) ON DELETE CASCADE,
+    cantidad DECIMAL(10,2) NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW(),
+    CONSTRAINT uq_stock_snapshots_fecha_producto UNIQUE (fecha, producto_id)
+);
+
+-- Table 16: particiones_archivadas
+-- Months of movimientos/transformaciones moved to the archivo schema by
+-- `flask archivar-particiones`; the live ledger starts at MAX(hasta)
+CREATE TABLE particiones_archivadas (
+    id SERIAL PRIMARY KEY,
+    tabla VARCHAR(50) NOT NULL,
+    nombre VARCHAR(100) NOT NULL,
+    desde DATE NOT NULL,
+    hasta DATE NOT NULL,
+    archived_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Archive schema: detached monthly partitions are attached here, so old
+-- ledger rows stay queryable without weighing on the live tables
+CREATE SCHEMA archivo;
+
+CREATE TABLE archivo.movimientos (
+    LIKE movimientos INCLUDING DEFAULTS
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE archivo.transformaciones (
+    LIKE transformaciones INCLUDING DEFAULTS
+) PARTITION BY RANGE (created_at);
+
+-- Table 17: manifiestos_archivo
+-- Delivered manifests moved out of manifiestos (same ids) by
+-- `flask archivar-manifiestos`; paquete is the ZIP bundle with their PDFs
+CREATE TABLE manifiestos_archivo (
+    id INTEGER PRIMARY KEY,
+    numero_manifiesto VARCHAR(50) NOT NULL,
+    cliente_id INTEGER NOT NULL REFERENCES clientes(id),
+    estado VARCHAR(20) NOT NULL,
+    fecha_creacion TIMESTAMP,
+    fecha_entrega TIMESTAMP,
+    codigo_qr VARCHAR(255),
+    firma_operador TEXT,
+    firma_cliente TEXT,
+    pdf_path_proceso VARCHAR(500),
+    pdf_path_final VARCHAR(500),
+    usuario_creador_id INTEGER NOT NULL REFERENCES usuarios(id),
+    usuario_entrega_id INTEGER REFERENCES usuarios(id),
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    paquete VARCHAR(500),
+    archived_at TIMESTAMP NOT NULL
+);
+
+CREATE UNIQUE INDEX idx_manifiestos_archivo_numero_manifiesto ON manifiestos_archivo(numero_manifiesto);
+CREATE UNIQUE INDEX idx_manifiestos_archivo_codigo_qr ON manifiestos_archivo(codigo_qr);
+CREATE INDEX idx_manifiestos_archivo_cliente_id ON manifiestos_archivo(cliente_id);
+
+-- Table 18: detalle_manifiesto_archivo
+CREATE TABLE detalle_manifiesto_archivo (
+    id INTEGER PRIMARY KEY,
+    manifiesto_id INTEGER NOT NULL REFERENCES manifiestos_archivo(id),
+    producto_id INTEGER NOT NULL REFERENCES productos(id),
+    cantidad DECIMAL(10,2) NOT NULL,
+    precio_unitario DECIMAL(10,2),
+    subtotal DECIMAL(10,2)
+);
+
+CREATE INDEX idx_detalle_manifiesto_archivo_manifiesto_id ON detalle_manifiesto_archivo(manifiesto_id);
+
+-- Table 19: movimientos_resumen_diario
+-- Daily totals of movimientos for closed days, written by
+-- `flask resumir-movimientos`; aggregates read these days from here and the
+-- rest from movimientos. Kept when the month's partition is archived
+CREATE TABLE movimientos_resumen_diario (
+    fecha DATE NOT NULL,
+    producto_id INTEGER NOT NULL,
+    tipo VARCHAR(20) NOT NULL,
+    usuario_id INTEGER NOT NULL,
+    cantidad DECIMAL(14,2) NOT NULL,
+    movimientos INTEGER NOT NULL,
+    PRIMARY KEY (fecha, producto_id, tipo, usuario_id)
+);
+
+-- Table 20: eventos_outbox
+-- Inventory change events written in the same transaction as the change
+-- (transactional outbox); `flask publicar-eventos` publishes them in id
+-- order to the configured sink and stamps publicado_at
+CREATE TABLE eventos_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    tipo VARCHAR(20) NOT NULL,
+    clave VARCHAR(50) NOT NULL,
+    datos TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW(),
+    publicado_at TIMESTAMP,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    ultimo_error TEXT
+);
+
+-- The relay only scans pending events; published ones are purged by age
+CREATE INDEX idx_eventos_outbox_pendientes ON eventos_outbox(id) WHERE publicado_at IS NULL;
+CREATE INDEX idx_eventos_outbox_publicado_at ON eventos_outbox(publicado_at) WHERE publicado_at IS NOT NULL;
+
 -- SEED DATA
 
 -- Insert roles
@@ -176,6 +369,11 @@ INSERT INTO roles (nombre, descripcion) VALUES
 INSERT INTO usuarios (nombre, email, password_hash, role_id, activo) VALUES
     ('Administrador', 'admin@greenriver.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewY5GyWUIvdgXN9i', 1, TRUE);
 
+-- Version counters of cached reference tables
+INSERT INTO tabla_versiones (tabla, version) VALUES
+    ('categorias', 0),
+    ('roles', 0);
+
 -- Insert sample categories
 INSERT INTO categorias (nombre, descripcion) VALUES
     ('Madera', 'Productos de madera y derivados'),
@@ -211,3 +409,94 @@ CREATE TRIGGER update_productos_updated_at BEFORE UPDATE ON productos
 
 CREATE TRIGGER update_manifiestos_updated_at BEFORE UPDATE ON manifiestos
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+CREATE TRIGGER update_reservas_stock_updated_at BEFORE UPDATE ON reservas_stock
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Bump the version of cached reference tables on any write, including
+-- changes made outside the API
+CREATE OR REPLACE FUNCTION bump_tabla_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE tabla_versiones SET version = version + 1 WHERE tabla = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER bump_categorias_version AFTER INSERT OR UPDATE OR DELETE ON categorias
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_tabla_version();
+
+CREATE TRIGGER bump_roles_version AFTER INSERT OR UPDATE OR DELETE ON roles
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_tabla_version();
+
+-- Record tombstones of synced tables for the delta-sync API
+CREATE OR REPLACE FUNCTION record_eliminacion()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO eliminaciones (tabla, registro_id) VALUES (TG_TABLE_NAME, OLD.id);
+    RETURN OLD;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER record_productos_eliminacion AFTER DELETE ON productos
+    FOR EACH ROW EXECUTE FUNCTION record_eliminacion();
+
+CREATE TRIGGER record_clientes_eliminacion AFTER DELETE ON clientes
+    FOR EACH ROW EXECUTE FUNCTION record_eliminacion();
+
+CREATE TRIGGER record_manifiestos_eliminacion AFTER DELETE ON manifiestos
+    FOR EACH ROW EXECUTE FUNCTION record_eliminacion();
+
+-- Live change events: NOTIFY the API workers (channel inventario_eventos)
+-- when a product's stock changes or a manifest changes state
+CREATE OR REPLACE FUNCTION notify_cambio_stock()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('inventario_eventos', json_build_object(
+        'tipo', 'stock',
+        'producto_id', NEW.id,
+        'cantidad', NEW.cantidad
+    )::text);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION notify_cambio_estado_manifiesto()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('inventario_eventos', json_build_object(
+        'tipo', 'manifiesto',
+        'manifiesto_id', NEW.id,
+        'estado', NEW.estado,
+        'estado_anterior', CASE WHEN TG_OP = 'UPDATE' THEN OLD.estado END
+    )::text);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_productos_stock_insert AFTER INSERT ON productos
+    FOR EACH ROW EXECUTE FUNCTION notify_cambio_stock();
+
+CREATE TRIGGER notify_productos_stock_update AFTER UPDATE OF cantidad ON productos
+    FOR EACH ROW WHEN (OLD.cantidad IS DISTINCT FROM NEW.cantidad)
+    EXECUTE FUNCTION notify_cambio_stock();
+
+CREATE TRIGGER notify_manifiestos_estado_insert AFTER INSERT ON manifiestos
+    FOR EACH ROW EXECUTE FUNCTION notify_cambio_estado_manifiesto();
+
+CREATE TRIGGER notify_manifiestos_estado_update AFTER UPDATE OF estado ON manifiestos
+    FOR EACH ROW WHEN (OLD.estado IS DISTINCT FROM NEW.estado)
+    EXECUTE FUNCTION notify_cambio_estado_manifiesto();
+
+-- Outbox relay wake-up (channel inventario_outbox): sent once per
+-- transaction that wrote events, delivered on commit
+CREATE OR REPLACE FUNCTION notify_outbox()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('inventario_outbox', '');
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER notify_eventos_outbox_insert AFTER INSERT ON eventos_outbox
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_outbox();
@@ -0,0 +1,59 @@
+# Gunicorn configuration - Sistema de Inventario Web - Nova
+import gc
+import glob
+import importlib
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+
+# Threaded workers: an open event stream (/api/eventos/stream) holds one
+# thread, not a whole worker. At most EVENTS_MAX_STREAMS threads per worker
+# go to streams; raise it together with GUNICORN_THREADS
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# Load the app once in the master and fork workers from it, so the imported
+# code is shared copy-on-write instead of being loaded again by every worker
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Optional comma-separated modules imported in the master before forking
+# (e.g. "pandas,reportlab.platypus,qrcode"). Services import them lazily
+# otherwise, on first use inside each worker.
+WARM_IMPORTS = [name.strip() for name in os.getenv('GUNICORN_WARM_IMPORTS', '').split(',') if name.strip()]
+
+
+def on_starting(server):
+    """Clear metric files left over from a previous run"""
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(multiproc_dir, '*.db')):
+            os.remove(path)
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded, before any worker is forked"""
+    for name in WARM_IMPORTS:
+        importlib.import_module(name)
+
+    # Move every object allocated so far to the permanent generation: the
+    # collector no longer touches them, so their pages stay shared after fork
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Do not reuse database connections inherited from the master"""
+    from api.app import app, db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    """Drop live gauges of a worker that exited"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)